@@ -1,13 +1,21 @@
 """btu-py.__init__.py"""
 
 import contextvars
-import importlib.metadata
-
-__version__ = importlib.metadata.version("btu_py")  # read the version from pyproject.toml
 
 shared_config = contextvars.ContextVar("config")
 
 
+def __getattr__(name):
+	"""
+	Computes '__version__' on first use: reading package metadata is slow, and most commands never need it.
+	"""
+	if name == "__version__":
+		import importlib.metadata
+
+		return importlib.metadata.version("btu_py")  # read the version from pyproject.toml
+	raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def get_config():
 	# If the context variable has not been initialized, do so now.
 	if isinstance(shared_config.get("config"), str):
@@ -1,7 +1,6 @@
 """btu_py/cli.py"""
 
 # Standard Library
-import asyncio
 import logging
 import os
 import subprocess
@@ -11,7 +10,6 @@ import click
 
 # Package
 import btu_py
-from btu_py import __version__
 
 VERBOSE_MODE = False
 logging.basicConfig(level=logging.ERROR)
@@ -21,7 +19,7 @@ logging.basicConfig(level=logging.ERROR)
 # Click Group and the starting point for the CLI
 # ========
 @click.group(context_settings={"help_option_names": ["-h", "--help"]})
-@click.version_option(version=__version__)
+@click.version_option(package_name="btu_py")
 @click.option(
 	"--verbose",
 	"-vb",
@@ -49,7 +47,7 @@ def cmd_about():
 	"""
 	About the btu-py application.
 	"""
-	print(f"btu-py version {__version__}")
+	print(f"btu-py version {btu_py.__version__}")
 	print("Copyright (C) 2025")
 	print("A Python-based alternative to the original BTU Scheduler.")
 
@@ -99,9 +97,126 @@ def cli_list_scheduled_tasks():
 	rq_print_scheduled_tasks(to_stdout=True)
 
 
+@entry_point.command("migrate-layout")
+@click.argument("layout", type=click.Choice(["single", "hourly", "daily"], case_sensitive=False))
+@click.option("--site", default=None, help="In multi-site mode, the site whose scheduled tasks are moved.")
+def cli_migrate_layout(layout, site):
+	"""
+	Move the scheduled tasks in Redis to another layout (stop the daemon first).
+	"""
+	from btu_py.lib.btu_rq import create_connection
+	from btu_py.lib.sites import site_context
+	from btu_py.lib.task_store import migrate_layout
+
+	def migrate():
+		namespace = btu_py.get_config_data().get("redis_key_namespace")
+		moved = migrate_layout(create_connection(), layout.lower(), namespace=namespace)
+		for each_layout, count in moved.items():
+			if count:
+				print(f"Moved {count} scheduled tasks from the '{each_layout}' layout.")
+		print(f"All scheduled tasks are now in the '{layout.lower()}' layout.")
+		configured = btu_py.get_config_data().get("scheduled_tasks_layout", "single")
+		if configured != layout.lower():
+			print(f"Now set scheduled_tasks_layout = \"{layout.lower()}\" in the configuration (it is '{configured}').")
+
+	site_context(btu_py.get_config(), site).run(migrate)
+
+
+@entry_point.command("reconcile")
+@click.option("--dry-run", is_flag=True, default=False, help="Report the differences, without modifying Redis.")
+@click.option("--site", default=None, help="In multi-site mode, the site to reconcile.")
+def cli_reconcile(dry_run, site):
+	"""
+	Repair differences between SQL and the scheduled tasks in Redis.
+	"""
+	import asyncio
+
+	from btu_py.lib.reconcile import reconcile_scheduled_tasks
+	from btu_py.lib.sites import site_context
+
+	report = site_context(btu_py.get_config(), site).run(asyncio.run, reconcile_scheduled_tasks(dry_run=dry_run))
+	verb = "Found" if dry_run else "Repaired"
+	print(f"Compared {report.enabled_schedules} enabled Task Schedules with {report.scanned} scheduled instances.")
+	print(f"{verb}: {report.orphans} orphaned, {report.stale} stale, {report.missing} missing.")
+	print(f"{verb}: {report.retry_orphans} orphaned retries.")
+
+
+@entry_point.command("lateness")
+@click.option(
+	"--metric",
+	type=click.Choice(["lateness", "sql", "frappe", "end_to_end"], case_sensitive=False),
+	default="lateness",
+	help="Which phase of dispatch to rank by.",
+)
+@click.option(
+	"--statistic",
+	type=click.Choice(["max", "mean", "p50", "p95", "p99", "count"], case_sensitive=False),
+	default="p95",
+	help="Statistic used for ranking (daemon source only).",
+)
+@click.option("--limit", type=int, default=10, help="Number of Task Schedules to show.")
+@click.option(
+	"--source",
+	type=click.Choice(["daemon", "redis"], case_sensitive=False),
+	default="daemon",
+	help="Ask the running daemon over TCP, or read the optional Redis sink.",
+)
+def cli_lateness(metric, statistic, limit, source):
+	"""
+	Show the Task Schedules with the worst dispatch lateness.
+	"""
+	if source == "redis":
+		from btu_py.lib.btu_rq import create_connection
+		from btu_py.lib.lateness import RedisLatenessSink
+
+		window_secs = int(btu_py.get_config_data().get("lateness_window_secs", 3600))
+		offenders = RedisLatenessSink(create_connection(), window_secs).worst_offenders(metric, limit)
+		statistic = "max"  # the Redis sink only retains the worst value per schedule
+	else:
+		from btu_py.lib.control_client import send_tcp_request
+
+		try:
+			response = send_tcp_request(
+				"lateness_report", {"metric": metric, "statistic": statistic, "limit": limit}
+			)
+		except OSError as ex:
+			print(f"Error: Unable to reach the BTU daemon over TCP: {ex}")
+			return
+		if response.get("status") != "ok":
+			print(f"Error: {response.get('error')}")
+			return
+		offenders = response["data"]
+
+	if not offenders:
+		print("No dispatches have been recorded yet.")
+		return
+
+	print(f"{'Task Schedule':<20} {metric + ' ' + statistic + ' (secs)':>28}   Other metrics ({statistic})")
+	for each in offenders:
+		others = ", ".join(
+			f"{each_metric}={values[statistic]}"
+			for each_metric, values in each.items()
+			if each_metric not in ("task_schedule_id", metric) and statistic in values
+		)
+		print(f"{each['task_schedule_id']:<20} {each[metric][statistic]:>28}   {others}")
+
+
 @entry_point.command("run-daemon")
 @click.option("--debug", is_flag=True, default=False, help="Throw exceptions to help debugging.")
-def cli_run_daemon(debug):
+@click.option(
+	"--loop",
+	"loop_name",
+	type=click.Choice(["asyncio", "uvloop"], case_sensitive=False),
+	default=None,
+	help="Event loop; defaults to the 'event_loop' setting, else asyncio.  uvloop must be installed.",
+)
+@click.option(
+	"--executor-workers",
+	type=click.IntRange(min=1),
+	default=None,
+	help="Threads in the default executor; defaults to the 'executor_workers' setting, else Python's default.",
+)
+def cli_run_daemon(debug, loop_name, executor_workers):
 	"""
 	Run the BTU scheduler daemon.
 	"""
@@ -109,8 +224,43 @@ def cli_run_daemon(debug):
 		print("TODO: Change the logger to Debug Mode.")
 
 	from btu_py.daemon import main
+	from btu_py.lib import event_loop
+
+	event_loop.run(
+		main(),
+		event_loop.resolve_loop_name(loop_name),
+		executor_workers or btu_py.get_config_data().get("executor_workers"),
+	)
 
-	asyncio.run(main())
+
+@entry_point.command("benchmark-loop")
+@click.option("--connections", type=click.IntRange(min=1), default=8, help="Concurrent connections (and callers).")
+@click.option("--requests", type=click.IntRange(min=1), default=1000, help="Requests per connection (and caller).")
+@click.option("--executor-workers", type=click.IntRange(min=1), default=None, help="Threads in the default executor.")
+def cli_benchmark_loop(connections, requests, executor_workers):
+	"""
+	Compare the throughput of the asyncio and uvloop event loops.
+	"""
+	from btu_py.lib import event_loop
+
+	loop_names = [event_loop.LOOP_ASYNCIO]
+	if event_loop.uvloop_available():
+		loop_names.append(event_loop.LOOP_UVLOOP)
+	else:
+		print("uvloop is not installed ('pip install btu_py[uvloop]'); measuring asyncio only.")
+
+	results = [
+		event_loop.benchmark_loop(each_name, connections, requests, executor_workers) for each_name in loop_names
+	]
+	print(f"{'Loop':<10}{'TCP requests/sec':>20}{'Executor calls/sec':>22}")
+	for each in results:
+		print(f"{each['loop']:<10}{each['tcp_requests_per_sec']:>20,.0f}{each['executor_calls_per_sec']:>22,.0f}")
+	if len(results) == 2:
+		baseline, other = results
+		print(
+			f"uvloop vs asyncio: {other['tcp_requests_per_sec'] / baseline['tcp_requests_per_sec']:.2f}x TCP, "
+			f"{other['executor_calls_per_sec'] / baseline['executor_calls_per_sec']:.2f}x executor."
+		)
 
 
 test_choices: list = [
@@ -174,6 +324,8 @@ def cli_test(command, task_schedule_id):
 			test_slack()
 
 		case "sql":
+			import asyncio
+
 			from btu_py.lib.tests import test_sql
 
 			asyncio.run(test_sql(quiet=False))
@@ -214,6 +366,8 @@ def cli_test(command, task_schedule_id):
 			test_rq_hello_world()
 
 		case "unix-socket-async":
+			import asyncio
+
 			from btu_py.lib.tests import test_unix_socket_async
 
 			asyncio.run(test_unix_socket_async())
@@ -228,6 +382,33 @@ def cli_test(command, task_schedule_id):
 			print(f"Unhandled subcommand '{command}'.  Please choose one of:\n    {test_choices_string}\n")
 
 
+@entry_point.command("status")
+@click.option(
+	"--transport",
+	type=click.Choice(["unix", "tcp"], case_sensitive=False),
+	default="unix",
+	help="Ask the running daemon over its Unix socket, or over TCP.",
+)
+def cli_status(transport):
+	"""
+	Show the status of the running daemon.
+	"""
+	from btu_py.lib.config import AppConfig
+	from btu_py.lib.control_client import send_tcp_request, send_unix_request
+
+	btu_py.shared_config.set(AppConfig())
+	try:
+		response = send_unix_request("status") if transport == "unix" else send_tcp_request("status")
+	except OSError as ex:
+		print(f"Error: Unable to reach the BTU daemon over {transport}: {ex}")
+		return
+	if response.get("status") != "ok":
+		print(f"Error: {response.get('error')}")
+		return
+	for key, value in response["data"].items():
+		print(f"{key:<24} {value}")
+
+
 @entry_point.command("service-status")
 def cli_service_status():
 	"""
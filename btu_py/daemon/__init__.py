@@ -1,35 +1,65 @@
 """btu_py/daemon/__init__.py"""
 
 import asyncio
+import signal
 
 import btu_py
-from btu_py.lib import config
+from btu_py.lib import config, refresh_offload, sites
+from btu_py.lib.internal_queue import CoalescingQueue
 from btu_py.lib.scheduler import queue_full_refill
 from btu_py.lib.tests import test_redis, test_sql
 from btu_py.lib.utils import is_port_in_use
 
 
+def reload_configuration() -> None:
+	"""
+	Reload the configuration file.  Settings read on each use (e.g. dispatch and retry behavior, the web server address,
+	the SQL and Redis connections) take effect immediately; socket and RPC listeners keep their original settings.
+	"""
+	changed = btu_py.get_config().reload()
+	if changed is not None:
+		site_name = sites.current_site_name()
+		btu_py.get_logger().info(
+			f"Reloaded the configuration file{f' for site {site_name}' if site_name else ''}.  "
+			f"Changed settings: {', '.join(changed) or 'none'}"
+		)
+
+
 async def main():
 	"""
 	Main coroutine for the daemon.
 	"""
 	# NOTE : To start daemon call 'asyncio.run(main()'
+	from .control_protocol import set_tcp_internal_queue
 	from .coroutines import (
 		get_tcp_socket_port,
 		internal_queue_consumer,
 		internal_queue_producer,
+		reconcile_scheduled_tasks_periodically,
 		redis_command_listener,
 		review_next_execution_times,
-		set_tcp_internal_queue,
 		tcp_socket_listener,
 		unix_domain_socket_listener,
 	)
+	from .snapshot import (
+		DaemonShutdown,
+		read_snapshot,
+		restore_snapshot,
+		save_snapshot,
+		verify_snapshot_against_sql,
+		wait_for_shutdown_signal,
+	)
 
-	btu_py.shared_config.set(config.AppConfig())
+	app_config = config.AppConfig()
+	btu_py.shared_config.set(app_config)
 	btu_py.get_logger().debug("Initialized configuration in Main Thread.")
-	unix_socket_enabled = not bool(btu_py.get_config().as_dictionary().get("disable_unix_socket", False))
-	tcp_socket_enabled = not bool(btu_py.get_config().as_dictionary().get("disable_tcp_socket", False))
-	redis_rpc_enabled = not bool(btu_py.get_config().as_dictionary().get("disable_redis_rpc", False))
+	# One context per site (see btu_py/lib/sites.py); a single "default" context when there is no [sites] table.
+	site_contexts = sites.create_site_contexts(app_config)
+	listener_context = next(iter(site_contexts.values()))  # listeners serve the first site, unless a request names one
+	unix_socket_enabled = not bool(btu_py.get_config_data().get("disable_unix_socket", False))
+	tcp_socket_enabled = not bool(btu_py.get_config_data().get("disable_tcp_socket", False))
+	redis_rpc_enabled = not bool(btu_py.get_config_data().get("disable_redis_rpc", False))
+	redis_rpc_transport = btu_py.get_config_data().get("redis_rpc_transport", "list")
 
 	# Make sure Redis is available.
 	try:
@@ -38,15 +68,37 @@ async def main():
 		btu_py.get_logger().error(f"Unable to connect to Frappe Redis queue: {ex}")
 		return
 
-	await test_sql(quiet=True)
+	for each_context in site_contexts.values():
+		await asyncio.create_task(test_sql(quiet=True), context=each_context)
 
 	# Make sure port 8888 is available
 	if tcp_socket_enabled and is_port_in_use(get_tcp_socket_port()):
 		btu_py.get_logger().error(f"Port {get_tcp_socket_port()} is already in use.")
 		return
 
-	internal_queue = asyncio.Queue()
-	set_tcp_internal_queue(internal_queue)
+	def prepare_site() -> tuple[CoalescingQueue, dict | None]:
+		# Pending Task Schedule IDs; duplicates are coalesced, and refills wait when the queue is at capacity.
+		internal_queue = CoalescingQueue(capacity=btu_py.get_config_data().get("internal_queue_capacity", 50000))
+		set_tcp_internal_queue(internal_queue)
+
+		# Warm restart: restore the state saved at the last shutdown, if any (see snapshot.py).
+		snapshot = read_snapshot(max_age_secs=btu_py.get_config_data().get("snapshot_max_age_secs", 86400))
+		if snapshot:
+			restore_snapshot(snapshot, internal_queue)
+		return internal_queue, snapshot
+
+	site_state = {site_name: each_context.run(prepare_site) for site_name, each_context in site_contexts.items()}
+
+	def reload_every_site() -> None:
+		for each_context in site_contexts.values():
+			each_context.run(reload_configuration)
+
+	# On SIGTERM (or Ctrl+C), stop every task and save a snapshot.
+	shutdown_requested = asyncio.Event()
+	for each_signal in (signal.SIGTERM, signal.SIGINT):
+		asyncio.get_running_loop().add_signal_handler(each_signal, shutdown_requested.set)
+	# On SIGHUP, reload the configuration file without restarting.
+	asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, reload_every_site)
 
 	print("-------------------------------------")
 	print("BTU Scheduler: by Datahenge LLC")
@@ -58,10 +110,12 @@ async def main():
 	print(
 		f"* Performs a full-refresh of BTU Task Schedules every {btu_py.get_config_data().full_refresh_internal_secs} seconds."
 	)
+	if app_config.site_names():
+		print(f"* Serves {len(site_contexts)} sites: {', '.join(site_contexts)}.")
 
 	# Redis RPC (primary control-plane)
 	if redis_rpc_enabled:
-		print("* Listens for commands via Redis RPC (primary control channel).")
+		print(f"* Listens for commands via Redis RPC (primary control channel, '{redis_rpc_transport}' transport).")
 	else:
 		print("Warning: Redis RPC command listener is disabled.")
 
@@ -77,35 +131,67 @@ async def main():
 	else:
 		print("Warning: TCP Socket is disabled.")
 
-	# Immediately on startup, Scheduler daemon should populate its internal queue with all BTU Task Schedule identifiers.
-	_ = await queue_full_refill(internal_queue)
-
 	# handle the failure of any tasks in the group
 	try:
 		# create a taskgroup
 		async with asyncio.TaskGroup() as group:
-			task1 = group.create_task(
-				internal_queue_consumer(internal_queue),
-				name="Internal Queue - Consumer",
-			)
-			task2 = group.create_task(
-				internal_queue_producer(internal_queue),
-				name="Internal Queue - Producer",
-			)
-			task3 = group.create_task(
-				review_next_execution_times(internal_queue),
-				name="Review Next Execution Times",
-			)
-			if redis_rpc_enabled:
-				group.create_task(redis_command_listener(), name="Redis RPC Command Listener")
+			group.create_task(wait_for_shutdown_signal(shutdown_requested), name="Shutdown Signal")
+			# Each site runs its own scheduler pipeline, in its own context.
+			for site_name, each_context in site_contexts.items():
+				internal_queue, snapshot = site_state[site_name]
+				prefix = f"{site_name}: " if app_config.site_names() else ""
+				if snapshot:
+					# Only Task Schedules that changed while the daemon was stopped are rebuilt.
+					group.create_task(
+						verify_snapshot_against_sql(internal_queue),
+						name=f"{prefix}Verify Snapshot",
+						context=each_context,
+					)
+				else:
+					# Immediately on startup, populate the internal queue with all BTU Task Schedule identifiers.
+					# This runs alongside the consumer, because the queue's capacity may be smaller than the refill.
+					group.create_task(
+						queue_full_refill(internal_queue), name=f"{prefix}Initial Refill", context=each_context
+					)
+				group.create_task(
+					internal_queue_consumer(internal_queue),
+					name=f"{prefix}Internal Queue - Consumer",
+					context=each_context,
+				)
+				group.create_task(
+					internal_queue_producer(internal_queue),
+					name=f"{prefix}Internal Queue - Producer",
+					context=each_context,
+				)
+				group.create_task(
+					review_next_execution_times(internal_queue),
+					name=f"{prefix}Review Next Execution Times",
+					context=each_context,
+				)
+				if each_context.run(btu_py.get_config_data).get("reconcile_interval_secs", 3600):
+					group.create_task(
+						reconcile_scheduled_tasks_periodically(),
+						name=f"{prefix}Reconcile Scheduled Tasks",
+						context=each_context,
+					)
+			if redis_rpc_enabled and redis_rpc_transport == "stream":
+				from .stream_listener import redis_stream_command_listener
+
+				group.create_task(
+					redis_stream_command_listener(), name="Redis Streams Command Listener", context=listener_context
+				)
+			elif redis_rpc_enabled:
+				group.create_task(redis_command_listener(), name="Redis RPC Command Listener", context=listener_context)
 			if unix_socket_enabled:
-				group.create_task(unix_domain_socket_listener(), name="Unix Socket Listener")
+				group.create_task(unix_domain_socket_listener(), name="Unix Socket Listener", context=listener_context)
 			if tcp_socket_enabled:
-				group.create_task(tcp_socket_listener(), name="TCP Socket Listener")
+				group.create_task(tcp_socket_listener(), name="TCP Socket Listener", context=listener_context)
 
 		# Wait until all tasks are concluded (forever)
-		btu_py.get_logger().info(
-			f"All tasks have completed now: {task1.result()}, {task2.result()}, {task3.result()}, {task4.result()}"
-		)
-	except Exception as ex:
-		raise ex
+		btu_py.get_logger().info("All tasks have completed now.")
+	except* DaemonShutdown:
+		btu_py.get_logger().info("Shutdown requested; saving a snapshot of the daemon's state.")
+		for site_name, each_context in site_contexts.items():
+			each_context.run(save_snapshot, site_state[site_name][0])
+	finally:
+		refresh_offload.shutdown()
@@ -0,0 +1,95 @@
+"""btu_py/daemon/command_pool.py"""
+
+import asyncio
+import zlib
+
+from btu_py import get_logger
+
+
+class _Barrier:
+	"""
+	A command queued on every worker; see CommandWorkerPool.submit_exclusive().
+	"""
+
+	def __init__(self, args: tuple, on_done):
+		self.args = args
+		self.on_done = on_done
+		self.arrivals = 0
+		self.executed = asyncio.Event()
+
+
+class CommandWorkerPool:
+	"""
+	Executes control-plane commands concurrently on a fixed number of worker coroutines.
+
+	Every command carries an 'ordering key' (normally a Task Schedule ID).  Commands with the same key are always
+	routed to the same worker, so they execute in the order received.  Commands with different keys run in parallel.
+	"""
+
+	def __init__(self, handler, worker_count: int = 4, queue_size: int = 1000, name: str = "Command Pool"):
+		self.handler = handler  # coroutine function, awaited as: handler(*args)
+		self.worker_count = max(1, int(worker_count))
+		self.name = name
+		self._queues = [asyncio.Queue(maxsize=queue_size) for _ in range(self.worker_count)]
+
+	def _worker_index(self, ordering_key) -> int:
+		# crc32 rather than hash(), so routing does not depend on PYTHONHASHSEED.
+		return zlib.crc32(str(ordering_key).encode("utf-8")) % self.worker_count
+
+	async def submit(self, ordering_key, *args, on_done=None) -> None:
+		"""
+		Queue a command for execution.  'on_done' (optional) is called with the handler's result, or the exception.
+		Waits only if the selected worker's queue is full.
+		"""
+		await self._queues[self._worker_index(ordering_key)].put((args, on_done))
+
+	async def submit_exclusive(self, *args, on_done=None) -> None:
+		"""
+		Queue a command that touches many ordering keys at once (e.g. a bulk request).
+
+		A barrier is queued on every worker.  Each worker finishes what it already has, then waits at the barrier; the
+		last one to arrive executes the command, and every worker resumes once it is done.  So ordering is preserved
+		relative to all other commands, and the caller does not wait for the command to execute.
+		"""
+		barrier = _Barrier(args, on_done)
+		for each_queue in self._queues:
+			await each_queue.put(barrier)
+
+	def pending(self) -> int:
+		return sum(each_queue.qsize() for each_queue in self._queues)
+
+	async def _execute(self, args: tuple, on_done) -> None:
+		try:
+			result = await self.handler(*args)
+		except Exception as ex:
+			get_logger().error("%s: unhandled error while executing command %r: %s", self.name, args, ex)
+			result = ex
+		if on_done:
+			try:
+				on_done(result)
+			except Exception as ex:
+				get_logger().error("%s: error in completion callback: %s", self.name, ex)
+
+	async def _worker(self, worker_queue: asyncio.Queue) -> None:
+		while True:
+			item = await worker_queue.get()
+			try:
+				if isinstance(item, _Barrier):
+					item.arrivals += 1
+					if item.arrivals == self.worker_count:
+						await self._execute(item.args, item.on_done)
+						item.executed.set()
+					else:
+						await item.executed.wait()
+				else:
+					await self._execute(*item)
+			finally:
+				worker_queue.task_done()
+
+	async def run(self) -> None:
+		"""
+		Run all workers until cancelled.
+		"""
+		async with asyncio.TaskGroup() as group:
+			for index, worker_queue in enumerate(self._queues):
+				group.create_task(self._worker(worker_queue), name=f"{self.name} Worker {index}")
@@ -0,0 +1,411 @@
+"""btu_py/daemon/control_protocol.py"""
+
+# The control protocol served by the daemon's socket listeners.
+#
+# Framing is newline-delimited JSON: one request object per line.  Length-prefixed msgpack frames are also accepted
+# (see btu_py/lib/codec.py), and each response is encoded the same way as its request.
+#
+# A client may keep its connection open and send many requests without waiting for responses ("pipelining").  Requests
+# are processed concurrently, so responses may arrive out of order; a request may include a "request_id", which is
+# echoed back in its response.
+#
+# In multi-site mode (see btu_py/lib/sites.py), a request may include a "site", naming the site it applies to.  Without
+# one, it applies to the site whose context runs the listener: the first configured site.
+#
+# For backward compatibility, a single JSON object sent *without* a trailing newline is also accepted, once the client
+# closes its side of the connection or sends nothing more for LEGACY_REQUEST_WAIT_SECS.  The connection is then closed
+# after the response, exactly as the original one-request-per-connection protocol did.
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass
+
+import btu_py
+from btu_py import get_logger
+from btu_py.lib import codec, scheduler
+from btu_py.lib.internal_queue import LANE_INTERACTIVE, CoalescingQueue
+from btu_py.lib.lateness import get_lateness_tracker
+from btu_py.lib.metrics import get_metrics
+from btu_py.lib.sites import current_site_name, get_site_context
+
+CONTROL_REQUEST_TYPES = (
+	"echo",
+	"ping",
+	"status",
+	"create_task_schedule",
+	"cancel_task_schedule",
+	"create_task_schedules",
+	"cancel_task_schedules",
+	"lateness_report",
+)
+
+_CONNECTION_ERRORS = (ConnectionResetError, ConnectionError, BrokenPipeError, OSError)
+
+_tcp_internal_queues: dict[str | None, CoalescingQueue] = {}  # per site (see btu_py/lib/sites.py)
+_started_monotonic = time.monotonic()
+
+
+def set_tcp_internal_queue(shared_queue: CoalescingQueue) -> None:
+	"""
+	Register the site's internal queue so TCP requests can enqueue Task Schedule IDs.
+	"""
+	_tcp_internal_queues[current_site_name()] = shared_queue
+
+
+def _get_tcp_internal_queue() -> CoalescingQueue | None:
+	"""
+	Return the site's internal queue used by the TCP handler, if available.
+	"""
+	return _tcp_internal_queues.get(current_site_name())
+
+
+def _validate_task_schedule_id_list(request_content) -> list[str] | None:
+	"""
+	Bulk requests carry a list of Task Schedule IDs.  Returns the cleaned list, or None if it is not valid.
+	Duplicates are removed, preserving the original order.
+	"""
+	if not isinstance(request_content, list) or not request_content:
+		return None
+	if not all(isinstance(each, str) and each.strip() for each in request_content):
+		return None
+	return list(dict.fromkeys(each.strip() for each in request_content))
+
+
+async def _execute_bulk_request(request_type: str, task_schedule_ids: list[str]) -> dict:
+	"""
+	Execute a bulk create/cancel request, shared by the socket and Redis RPC listeners.
+	Returns a dictionary of per-ID results.
+	"""
+	if request_type == "create_task_schedules":
+		return await scheduler.rq_create_scheduled_tasks(task_schedule_ids)
+
+	if request_type == "cancel_task_schedules":
+		removed_counts = scheduler.rq_cancel_scheduled_tasks(task_schedule_ids)
+		return {
+			each_id: {"status": "ok", "removed": count} if count else {"status": "not_found", "removed": 0}
+			for each_id, count in removed_counts.items()
+		}
+
+	raise ValueError(f"Not a bulk request type: '{request_type}'")
+
+
+def _error(message: str) -> dict:
+	return {"status": "error", "error": message}
+
+
+async def _daemon_status() -> dict:
+	"""
+	A snapshot of the daemon's state, for the "status" request type.
+	"""
+	internal_queue = _get_tcp_internal_queue()
+	try:
+		scheduled_tasks = await asyncio.to_thread(scheduler.rq_count_scheduled_tasks)  # keeps the site context
+	except Exception as ex:
+		get_logger().warning(f"Unable to count scheduled tasks for a status request: {ex}")
+		scheduled_tasks = None
+	if internal_queue is not None:
+		internal_queue.publish_metrics(get_metrics())
+	return {
+		"pid": os.getpid(),
+		"site": current_site_name(),
+		"uptime_secs": round(time.monotonic() - _started_monotonic, 1),
+		"internal_queue_depth": internal_queue.qsize() if internal_queue is not None else None,
+		"internal_queue_lanes": internal_queue.lane_depths() if internal_queue is not None else None,
+		"internal_queue_coalesced": internal_queue.coalesced if internal_queue is not None else None,
+		"scheduled_tasks": scheduled_tasks,
+		"metrics": get_metrics().snapshot(),
+	}
+
+
+async def process_control_request(request_obj, transport_name: str = "TCP Socket") -> dict:
+	"""
+	Validate and execute one decoded control request, returning the response payload.
+
+	Expected request JSON:
+	{
+		"request_type": "echo" | "ping" | "status" | "create_task_schedule" | "cancel_task_schedule"
+						| "create_task_schedules" | "cancel_task_schedules" | "lateness_report",
+		"request_content": ...,
+		"request_id": ...  (optional; echoed back in the response)
+		"site": ...  (optional; multi-site mode only)
+	}
+
+	The bulk request types ("create_task_schedules", "cancel_task_schedules") take a list of Task Schedule IDs,
+	and respond with a dictionary of per-ID results.
+	"""
+	site_name = request_obj.get("site") if isinstance(request_obj, dict) else None
+	if site_name is not None and site_name != current_site_name():
+		context = get_site_context(site_name) if isinstance(site_name, str) else None
+		if context is None:
+			return _error(f"Unknown site '{site_name}'.")
+		# Run the request as a task in the site's own context, so it reads that site's configuration and objects.
+		return await asyncio.create_task(_process_site_request(request_obj, transport_name), context=context)
+	return await _process_site_request(request_obj, transport_name)
+
+
+async def _process_site_request(request_obj, transport_name: str) -> dict:
+	if not isinstance(request_obj, dict):
+		return _error("Request body must be a JSON object with keys 'request_type' and 'request_content'.")
+
+	request_type = request_obj.get("request_type")
+	if request_type is None:
+		return _error("Missing 'request_type' in request.")
+
+	request_content = request_obj.get("request_content")
+	if "request_content" not in request_obj:
+		return _error("Missing 'request_content' in request.")
+
+	if not isinstance(request_type, str):
+		return _error("'request_type' must be a string.")
+
+	if request_type not in CONTROL_REQUEST_TYPES:
+		return _error(f"Invalid 'request_type'. Must be one of: {', '.join(sorted(CONTROL_REQUEST_TYPES))}.")
+
+	# Dispatch based on request_type
+	if request_type == "echo":
+		return {"status": "ok", "request_type": "echo", "data": request_content}
+
+	if request_type == "ping":
+		return {"status": "ok", "request_type": "ping", "data": "pong"}
+
+	if request_type == "status":
+		return {"status": "ok", "request_type": "status", "data": await _daemon_status()}
+
+	if request_type == "lateness_report":
+		# request_content is optional: {"metric": "lateness", "statistic": "p95", "limit": 10}
+		options = request_content if isinstance(request_content, dict) else {}
+		try:
+			report = get_lateness_tracker().worst_offenders(
+				metric=options.get("metric", "lateness"),
+				statistic=options.get("statistic", "p95"),
+				limit=int(options.get("limit", 10)),
+			)
+		except (TypeError, ValueError) as ex:
+			return _error(str(ex))
+		return {"status": "ok", "request_type": "lateness_report", "data": report}
+
+	if request_type in ("create_task_schedules", "cancel_task_schedules"):
+		task_schedule_ids = _validate_task_schedule_id_list(request_content)
+		if task_schedule_ids is None:
+			return _error("'request_content' must be a non-empty list of Task Schedule ID strings.")
+		try:
+			results = await _execute_bulk_request(request_type, task_schedule_ids)
+		except Exception as ex:
+			get_logger().error(f"{transport_name}: Error while processing '{request_type}': {ex}")
+			return _error(f"Unable to process '{request_type}'.")
+		return {"status": "ok", "request_type": request_type, "data": results}
+
+	# The remaining request types both expect request_content to be a Task Schedule ID string.
+	if not isinstance(request_content, str) or not request_content.strip():
+		return _error("'request_content' must be a non-empty Task Schedule ID string.")
+
+	task_schedule_id = request_content.strip()
+
+	if request_type == "create_task_schedule":
+		internal_queue = _get_tcp_internal_queue()
+		if internal_queue is None:
+			get_logger().error(
+				f"{transport_name}: Internal queue is not available; cannot enqueue Task Schedule ID from request."
+			)
+			return _error("Scheduler internal queue is not available; cannot process create_task_schedule.")
+
+		await internal_queue.put(task_schedule_id, lane=LANE_INTERACTIVE)
+		get_logger().info(f"{transport_name}: Enqueued Task Schedule ID {task_schedule_id} from request.")
+		return {
+			"status": "ok",
+			"request_type": "create_task_schedule",
+			"data": f"BTU Scheduler now re-processing Task Schedule {task_schedule_id} in Python RQ.",
+		}
+
+	if request_type == "cancel_task_schedule":
+		try:
+			scheduler.rq_cancel_scheduled_task(task_schedule_id)
+			# After cancellation, print remaining tasks to stdout as requested.
+			scheduler.rq_print_scheduled_tasks(to_stdout=True)
+		except Exception as ex:
+			get_logger().error(
+				f"{transport_name}: Error while attempting to cancel Task Schedule {task_schedule_id}: {ex}"
+			)
+			return _error(f"Unable to cancel Task Schedule {task_schedule_id}.")
+
+		return {
+			"status": "ok",
+			"request_type": "cancel_task_schedule",
+			"data": f"Task Schedule {task_schedule_id} cancellation requested; remaining tasks printed to stdout.",
+		}
+
+	# This branch should not be reachable, but handle defensively.
+	return _error(f"Unhandled request_type '{request_type}'.")
+
+
+@dataclass(frozen=True)
+class ConnectionLimits:
+	max_request_bytes: int = 1024 * 1024
+	idle_timeout_secs: float = 300
+	max_in_flight: int = 32  # pipelined requests being processed at once, per connection
+
+	@staticmethod
+	def from_config(prefix: str) -> "ConnectionLimits":
+		"""
+		Read limits from configuration keys such as 'tcp_max_request_bytes' and 'tcp_idle_timeout_secs'.
+		"""
+		config_data = btu_py.get_config_data()
+		defaults = ConnectionLimits()
+		return ConnectionLimits(
+			max_request_bytes=config_data.get(f"{prefix}_max_request_bytes", defaults.max_request_bytes),
+			idle_timeout_secs=config_data.get(f"{prefix}_idle_timeout_secs", defaults.idle_timeout_secs),
+			max_in_flight=config_data.get(f"{prefix}_max_in_flight", defaults.max_in_flight),
+		)
+
+
+# How long a complete JSON object without a newline may wait for one, before it is treated as a legacy request.
+LEGACY_REQUEST_WAIT_SECS = 0.1
+
+
+class _FrameTooLarge(Exception):
+	pass
+
+
+def _looks_like_complete_json(buffer: bytes) -> bool:
+	"""
+	True if 'buffer' is one complete JSON object; used to recognise legacy requests sent without a newline.
+	"""
+	if not buffer.rstrip().endswith(b"}"):
+		return False  # cheap test first, so partial frames are not parsed repeatedly
+	try:
+		json.loads(buffer)
+		return True
+	except (UnicodeDecodeError, json.JSONDecodeError):
+		return False
+
+
+async def _iter_frames(reader, limits: ConnectionLimits):
+	"""
+	Yield (frame_bytes, codec, is_legacy) for each request received on the connection, until the client closes it.
+	"""
+	buffer = b""
+	while True:
+		frame, frame_codec, remainder = codec.split_frame(buffer)
+		if frame is not None:
+			buffer = remainder
+			if frame_codec is not codec.JSON or frame.strip():
+				yield frame, frame_codec, False
+			continue
+		if frame_codec is codec.JSON and buffer.strip() and _looks_like_complete_json(buffer):
+			# Either a legacy request, or a newline-delimited one whose newline has not arrived yet.
+			try:
+				chunk = await asyncio.wait_for(reader.read(65536), LEGACY_REQUEST_WAIT_SECS)
+			except TimeoutError:
+				chunk = b""
+			if not chunk:
+				yield buffer, codec.JSON, True
+				return
+			buffer += chunk
+			continue
+		if codec.pending_frame_size(buffer) > limits.max_request_bytes:
+			raise _FrameTooLarge
+		chunk = await asyncio.wait_for(reader.read(65536), limits.idle_timeout_secs)
+		if not chunk:
+			if frame_codec is codec.JSON and buffer.strip():
+				yield buffer, codec.JSON, True
+			return
+		buffer += chunk
+
+
+def _decode_frame(frame: bytes, frame_codec, transport_name: str):
+	"""
+	Returns a tuple: (request_obj, error_response).  Exactly one of them is None.
+	"""
+	try:
+		return frame_codec.loads(frame), None
+	except codec.CodecError as ex:
+		get_logger().warning(f"{transport_name}: Unable to decode {frame_codec.name} request {frame[:200]!r}: {ex}")
+		return None, _error(str(ex))
+
+
+def encode_response(payload: dict, response_codec=codec.JSON) -> bytes:
+	"""
+	Encode a response frame.  Falls back to JSON if the requested encoding is unavailable.
+	"""
+	try:
+		return codec.encode_frame(payload, response_codec)
+	except codec.CodecError as ex:
+		return codec.encode_frame(_error(str(ex)) | {"request_id": payload.get("request_id")}, codec.JSON)
+
+
+async def _close_writer(writer, transport_name: str) -> None:
+	try:
+		writer.close()
+		await writer.wait_closed()
+	except Exception as close_ex:
+		get_logger().debug(f"{transport_name}: Error closing writer (connection may already be closed): {close_ex}")
+
+
+async def serve_control_connection(
+	reader, writer, transport_name: str, client_slots: asyncio.Semaphore, limits: ConnectionLimits
+) -> None:
+	"""
+	Serve one client connection until it closes, goes idle, or breaks the framing rules.
+
+	'client_slots' limits the number of concurrent connections across the whole listener.
+	"""
+	peer = writer.get_extra_info("peername")
+	if client_slots.locked():
+		get_logger().warning(f"{transport_name}: Refusing connection from {peer}; too many concurrent clients.")
+		try:
+			writer.write(encode_response(_error("Too many concurrent clients; please try again later.")))
+			await writer.drain()
+		except _CONNECTION_ERRORS:
+			pass
+		await _close_writer(writer, transport_name)
+		return
+
+	async with client_slots:
+		write_lock = asyncio.Lock()
+		in_flight = asyncio.Semaphore(limits.max_in_flight)
+		pending_tasks: set[asyncio.Task] = set()
+
+		async def respond(frame: bytes, frame_codec) -> None:
+			try:
+				request_obj, response = _decode_frame(frame, frame_codec, transport_name)
+				if response is None:
+					try:
+						response = await process_control_request(request_obj, transport_name)
+					except Exception as ex:
+						get_logger().error(f"{transport_name}: Unexpected error while processing request: {ex}")
+						response = _error("Internal server error while processing request.")
+				if isinstance(request_obj, dict) and "request_id" in request_obj:
+					response["request_id"] = request_obj["request_id"]
+				async with write_lock:
+					writer.write(encode_response(response, codec.response_codec(request_obj, frame_codec)))
+					await writer.drain()
+			except _CONNECTION_ERRORS as conn_ex:
+				get_logger().debug(f"{transport_name}: Client closed connection during response: {conn_ex}")
+			finally:
+				in_flight.release()
+
+		try:
+			async for frame, frame_codec, is_legacy in _iter_frames(reader, limits):
+				get_logger().debug("%s: Received request from %s: %r", transport_name, peer, frame)
+				await in_flight.acquire()
+				task = asyncio.create_task(respond(frame, frame_codec))
+				pending_tasks.add(task)
+				task.add_done_callback(pending_tasks.discard)
+				if is_legacy:
+					break  # one request per connection, as in the original protocol
+		except _FrameTooLarge:
+			get_logger().warning(f"{transport_name}: Request from {peer} exceeds {limits.max_request_bytes} bytes.")
+			async with write_lock:
+				writer.write(encode_response(_error(f"Request exceeds {limits.max_request_bytes} bytes.")))
+		except TimeoutError:
+			get_logger().debug(f"{transport_name}: Closing idle connection from {peer}.")
+		except _CONNECTION_ERRORS as conn_ex:
+			get_logger().debug(f"{transport_name}: Client closed connection or network error occurred: {conn_ex}")
+		except Exception as ex:
+			get_logger().error(f"{transport_name}: Unexpected error while serving {peer}: {ex}")
+		finally:
+			if pending_tasks:
+				await asyncio.gather(*pending_tasks, return_exceptions=True)  # finish responding before closing
+			await _close_writer(writer, transport_name)
@@ -1,36 +1,41 @@
 """btu_py/daemon/couroutines.py"""
 
 import asyncio
-import json
+import functools
 import os
 import pathlib
 
+import redis
+
 import btu_py
 from btu_py import get_logger
-from btu_py.lib import scheduler
+from btu_py.lib import codec, scheduler
+from btu_py.lib.internal_queue import LANE_INTERACTIVE, LANE_REFILL
+from btu_py.lib.lateness import get_lateness_tracker
+from btu_py.lib.log_sampling import new_item_logger_from_config
+from btu_py.lib.metrics import get_metrics
+from btu_py.lib.refresh_offload import next_execution_epochs
+from btu_py.lib.sites import current_site_name, get_site_context
 from btu_py.lib.structs import BtuTaskSchedule
 from btu_py.lib.utils import Stopwatch
 
+from .control_protocol import (
+	ConnectionLimits,
+	_execute_bulk_request,
+	_get_tcp_internal_queue,
+	_validate_task_schedule_id_list,
+	serve_control_connection,
+)
+from .snapshot import get_schedule_catalog
+
 # Redis key where incoming commands are delivered from the Frappe web server.
 # Must match REDIS_COMMAND_QUEUE in btu/btu_api/scheduler.py.
 REDIS_COMMAND_QUEUE = "btu:scheduler:commands"
 
-_tcp_internal_queue: asyncio.Queue | None = None
-
+# Request types whose 'request_content' is a list of Task Schedule IDs.
+REDIS_BULK_REQUEST_TYPES = ("create_task_schedules", "cancel_task_schedules")
 
-def set_tcp_internal_queue(shared_queue: asyncio.Queue) -> None:
-	"""
-	Register the shared internal queue so TCP requests can enqueue Task Schedule IDs.
-	"""
-	global _tcp_internal_queue  # noqa: PLW0603
-	_tcp_internal_queue = shared_queue
-
-
-def _get_tcp_internal_queue() -> asyncio.Queue | None:
-	"""
-	Return the shared internal queue used by the TCP handler, if available.
-	"""
-	return _tcp_internal_queue
+_rpop_count_supported: bool = True  # cleared if the Redis server rejects 'RPOP key count' (Redis < 6.2)
 
 
 def get_tcp_socket_port() -> int:
@@ -42,27 +47,64 @@ def get_tcp_socket_port() -> int:
 
 async def internal_queue_consumer(shared_queue):
 	"""
-	Reads TSIKs from the internal couroutine Queue, and adds them to Python RQ.
+	Reads Task Schedule IDs from the internal queue, and adds them to Python RQ.
+
+	Waits on the queue (no polling), then takes up to 'internal_queue_batch_size' IDs at a time, by priority lane,
+	and reads their Task Schedules with a single SQL query.
+
+	Per-item debug lines are sampled; once the queue drains, a single summary line reports the whole cycle.
+
+	If cancelled mid-batch (e.g. at shutdown), the IDs not yet processed are put back in the queue, so that they are
+	saved in the shutdown snapshot rather than lost.
 	"""
+	item_logger = new_item_logger_from_config()
+	catalog = get_schedule_catalog()  # saved in the shutdown snapshot
+	batch_size = max(1, int(btu_py.get_config_data().get("internal_queue_batch_size", 100)))
+	processed_this_cycle = 0
+	failed_this_cycle = 0
 	while True:
-		if shared_queue.qsize():
-			# get_logger().debug(f"IQM: Number of items in Queue = {shared_queue.qsize()}")
-			next_task_schedule_id = (
-				await shared_queue.get()
-			)  # NOTE: The coroutine will hang out here, doing nothing, until something shows up in the Queue.
-			# get_logger().info(f"IQM: The next Task Schedule ID = {next_task_schedule_id}")
-			task_schedule: BtuTaskSchedule = await BtuTaskSchedule.init_from_schedule_key(next_task_schedule_id)
+		lanes = {}  # Task Schedule ID --> lane it was taken from
+		# NOTE: waits here until something shows up in the Queue.
+		batch = await shared_queue.get_batch(batch_size, lanes)
+		try:
+			try:
+				task_schedules = await BtuTaskSchedule.init_from_schedule_keys(batch)
+			except Exception as ex:
+				get_logger().error("IQM: Unable to read %s Task Schedules from SQL: %s", len(batch), ex)
+				task_schedules = {}
+			# Large batches are calculated by a pool of workers, off the event loop (see refresh_offload.py).
+			next_executions = await next_execution_epochs(list(task_schedules.values()))
+		except asyncio.CancelledError:
+			get_logger().info("IQM: Cancelled; %s unprocessed Task Schedule IDs put back.", shared_queue.requeue(lanes))
+			raise
+
+		# No awaits from here on: once the batch is read, it is processed completely.
+		for next_task_schedule_id in batch:
+			task_schedule: BtuTaskSchedule = task_schedules.get(next_task_schedule_id)
 			if task_schedule:
-				scheduler.add_task_schedule_to_rq(task_schedule)
-				get_logger().debug(
-					f"IQM: Added task schedule to Redis Key 'btu_scheduler:task_execution_times'.  Size of internal queue is now {shared_queue.qsize()}"
+				scheduler.add_task_schedule_to_rq(task_schedule, next_executions.get(next_task_schedule_id))
+				catalog.record(task_schedule)
+				processed_this_cycle += 1
+				item_logger.debug(
+					"IQM: Added task schedule to Redis Key 'btu_scheduler:task_execution_times'.  Size of internal queue is now %s",
+					shared_queue.qsize(),
 				)
 			else:
+				failed_this_cycle += 1
 				get_logger().error(
-					f"IQM: Unable to construct a BtuTaskSchedule object from Task Schedule ID = {next_task_schedule_id}"
+					"IQM: Unable to construct a BtuTaskSchedule object from Task Schedule ID = %s", next_task_schedule_id
 				)
 
-		await asyncio.sleep(1)  # blocking request for just a moment
+		if shared_queue.empty():
+			get_logger().info(
+				"IQM: Internal queue drained; %s Task Schedules written to Redis, %s failed.",
+				processed_this_cycle,
+				failed_this_cycle,
+			)
+			processed_this_cycle = 0
+			failed_this_cycle = 0
+		else:
+			await asyncio.sleep(0)  # let other coroutines (e.g. control requests) run between batches
 
 
 async def internal_queue_producer(shared_queue):
@@ -74,24 +116,55 @@ async def internal_queue_producer(shared_queue):
 	it will be refilled automatically after a while!
 
 	As the queue is filled, Thread 1 handles consuming and procesing each TSIK.
+
+	If IDs from the previous refill are still waiting when the next one is due, configuration 'refill_overlap_policy'
+	decides what happens: "skip" (the default) skips this refill, while "merge" refills anyway, and the queue
+	coalesces the IDs that are already waiting.
 	"""
 
 	btu_py.get_logger().info("Initializing coroutine 'internal_queue_producer()' ...")
+	overlap_policy = btu_py.get_config_data().get("refill_overlap_policy", "skip")
+	metrics = get_metrics()
+	refills_started = metrics.counter("refill_started_total", "Full refills of the internal queue")
+	refills_skipped = metrics.counter("refill_skipped_total", "Full refills skipped; the previous one was still waiting")
 	stopwatch = Stopwatch()
 	while True:
 		elapsed_seconds = stopwatch.get_elapsed_seconds_total()  # calculate elapsed seconds since last Queue Repopulate
 		if elapsed_seconds > btu_py.get_config_data().full_refresh_internal_secs:  # If sufficient time has passed ...
+			still_waiting = shared_queue.lane_depths()[LANE_REFILL]
+			if still_waiting and overlap_policy == "skip":
+				refills_skipped.inc()
+				btu_py.get_logger().warning(
+					"Producer: skipping a full refill; %s Task Schedule IDs from the previous refill are still waiting.",
+					still_waiting,
+				)
+				stopwatch.reset()
+				await asyncio.sleep(1)
+				continue
+
 			btu_py.get_logger().debug(
-				f"Producer: {elapsed_seconds} seconds have elapsed.  Time for a full-write of Task Schedule Keys in Redis!"
+				"Producer: %s seconds have elapsed.  Time for a full-write of Task Schedule Keys in Redis!", elapsed_seconds
 			)
-			result = await scheduler.queue_full_refill(shared_queue)
+			refills_started.inc()
+			saturated_before = shared_queue.saturated
+			result = await scheduler.queue_full_refill(shared_queue)  # waits whenever the queue is at capacity
+			if shared_queue.saturated > saturated_before:
+				btu_py.get_logger().warning(
+					"Producer: the internal queue reached its capacity of %s during the refill; the consumer is behind.",
+					shared_queue.capacity,
+				)
 			if result:
-				btu_py.get_logger().debug(f"  * Internal queue contains a total of {shared_queue.qsize()} values.")
-				scheduler.rq_print_scheduled_tasks(False)  # log the Task Schedule:
+				btu_py.get_logger().debug(
+					"  * Internal queue contains a total of %s values (%s duplicates coalesced since startup).",
+					shared_queue.qsize(),
+					shared_queue.coalesced,
+				)
+				scheduler.rq_log_scheduled_tasks()  # log a summary (or diff) of the scheduled tasks
 			else:
 				btu_py.get_logger().warning(
 					"No Task Schedules found in the database.  Unable to repopulate the internal queue."
 				)
+			shared_queue.publish_metrics(metrics)
 			stopwatch.reset()  # reset the stopwatch and begin a new countdown
 
 		await asyncio.sleep(1)  # blocking request, yields controls to another coroutine for a while.
@@ -123,66 +196,45 @@ async def review_next_execution_times(shared_queue):
 		)  # wait N seconds before trying again.
 
 
-async def handle_unix_socket_echo(reader, writer):
+async def reconcile_scheduled_tasks_periodically():
 	"""
-	Unix Socket server handler: echos client's request back to them.
+	Every 'reconcile_interval_secs' seconds, repair the differences between SQL and the scheduled-tasks sorted set:
+	orphaned, stale and missing TSIKs (see btu_py/lib/reconcile.py).
 	"""
-	get_logger().info("Unix Socket: New client connection; applying handler 'handle_echo_client'")
-
-	try:
-		msg_bytes = await reader.readline()  # read the message from the client
-		if not msg_bytes:
-			get_logger().info("Unix Socket: Client closed connection before sending data.")
-			return
-
-		decoded_bytes: str = msg_bytes.decode().strip()
-
-		get_logger().debug(f"Unix Socket: Datatype of decoded_bytes: {type(decoded_bytes)}")  # report the message
-		get_logger().info(f"Unix Socket: Received this data string: '{decoded_bytes}'")  # report the message
+	from btu_py.lib.reconcile import reconcile_scheduled_tasks
 
+	btu_py.get_logger().info("Initializing coroutine 'reconcile_scheduled_tasks_periodically()' ...")
+	catalog = get_schedule_catalog()
+	while True:
+		await asyncio.sleep(btu_py.get_config_data().get("reconcile_interval_secs", 3600))
 		try:
-			writer.write(msg_bytes)  # send the message back (this is a synchronous, blocking call)
-			await writer.drain()  # wait for the buffer to empty
-
-			get_logger().info(
-				"Unix Socket: Successfully echoed the message back to the client.  Closing connection."
-			)  # Close the connection
-		except (
-			ConnectionResetError,
-			ConnectionError,
-			BrokenPipeError,
-			OSError,
-		) as conn_ex:
-			# Client closed connection before we could send response - this is normal, not an error
-			get_logger().debug(f"Unix Socket: Client closed connection during response: {conn_ex}")
+			report = await reconcile_scheduled_tasks()
 		except Exception as ex:
-			get_logger().error(f"Unix Socket: Error sending response to client: {ex}")
-		finally:
-			# Always try to close the writer, even if there was an error
-			try:
-				writer.close()
-				await writer.wait_closed()
-			except Exception as close_ex:
-				get_logger().debug(f"Unix Socket: Error closing writer (connection may already be closed): {close_ex}")
-	except (ConnectionResetError, ConnectionError, BrokenPipeError, OSError) as conn_ex:
-		# Client closed connection during read - this is normal, not an error
-		get_logger().debug(f"Unix Socket: Client closed connection during read: {conn_ex}")
-		try:
-			writer.close()
-		except Exception:
-			pass  # Connection already closed
-	except Exception as ex:
-		get_logger().error(f"Unix Socket: Error in handle_echo_client() : {ex}")
-		# Don't re-raise - handle gracefully to prevent "Task exception was never retrieved" errors
-		try:
-			writer.close()
-		except Exception:
-			pass  # Connection may already be closed
+			btu_py.get_logger().error(f"Reconciliation pass failed: {ex}")
+			continue
+		lateness_tracker = get_lateness_tracker()
+		for each_id in report.orphan_ids:
+			catalog.forget(each_id)
+			lateness_tracker.forget(each_id)
+
+
+async def handle_unix_socket_request(
+	reader, writer, client_slots: asyncio.Semaphore | None = None, limits: ConnectionLimits | None = None
+):
+	"""
+	Unix Socket server handler.  Serves the same control protocol as the TCP listener (see control_protocol.py),
+	on persistent connections, without the network stack.
+	"""
+	if client_slots is None:
+		client_slots = asyncio.Semaphore(btu_py.get_config_data().get("unix_max_clients", 64))
+	if limits is None:
+		limits = ConnectionLimits.from_config("unix")
+	await serve_control_connection(reader, writer, "Unix Socket", client_slots, limits)
 
 
 async def unix_domain_socket_listener():
 	"""
-	A simple Unix Domain Socket listener to process user requests.
+	A Unix Domain Socket listener to process user requests, for tools running on the same host.
 	"""
 	socket_path = pathlib.Path(btu_py.get_config_data().socket_path)
 	if not socket_path.parent.exists():
@@ -197,7 +249,12 @@ async def unix_domain_socket_listener():
 		except Exception as ex:
 			raise ex
 
-	server = await asyncio.start_unix_server(handle_unix_socket_echo, socket_path)  # create a new server object
+	handler = functools.partial(
+		handle_unix_socket_request,
+		client_slots=asyncio.Semaphore(btu_py.get_config_data().get("unix_max_clients", 64)),
+		limits=ConnectionLimits.from_config("unix"),
+	)
+	server = await asyncio.start_unix_server(handler, socket_path)  # create a new server object
 	async with server:
 		# report message
 		get_logger().info(f"SOCKET: Unix Domain Socket listening for incoming connections via file '{socket_path}'")
@@ -209,259 +266,19 @@ async def unix_domain_socket_listener():
 	# os.unlink(socket_path)
 
 
-async def _send_tcp_json_response(writer, payload: dict) -> None:
+async def handle_tcp_request(
+	reader, writer, client_slots: asyncio.Semaphore | None = None, limits: ConnectionLimits | None = None
+):
 	"""
-	Serialize and send a JSON payload to the TCP client, then close the connection.
-	"""
-	try:
-		response_text = json.dumps(payload, separators=(",", ":")) + "\n"
-		writer.write(response_text.encode("utf-8"))
-		await writer.drain()
-	except (ConnectionResetError, ConnectionError, BrokenPipeError, OSError) as conn_ex:
-		get_logger().debug(f"TCP Socket: Client closed connection during response: {conn_ex}")
-	except Exception as ex:
-		get_logger().error(f"TCP Socket: Error sending response to client: {ex}")
-	finally:
-		try:
-			writer.close()
-			await writer.wait_closed()
-		except Exception as close_ex:
-			get_logger().debug(f"TCP Socket: Error closing writer (connection may already be closed): {close_ex}")
-
-
-async def handle_tcp_request(reader, writer):
-	"""
-	TCP Socket server handler implementing a simple JSON-based control protocol.
+	TCP Socket server handler for the JSON control protocol.  See control_protocol.py and docs/tcp_protocol.md.
 
-	Expected request JSON:
-	{
-		"request_type": "echo" | "ping" | "create_task_schedule" | "cancel_task_schedule",
-		"request_content": ...
-	}
+	A connection stays open for as many newline-delimited requests as the client wishes to send.
 	"""
-	addr = writer.get_extra_info("peername")
-	try:
-		data = await reader.read(4096)
-		if not data:
-			get_logger().info(f"TCP Socket: Client {addr} closed connection before sending data.")
-			try:
-				writer.close()
-				await writer.wait_closed()
-			except Exception:
-				pass
-			return
-
-		get_logger().info(f"TCP Socket: Received raw data from {addr}: {data!r}")
-
-		# Decode bytes into a UTF-8 string.
-		try:
-			message_str = data.decode("utf-8").strip()
-		except UnicodeDecodeError:
-			get_logger().warning("TCP Socket: Received non-UTF-8 data that cannot be converted to a string.")
-			await _send_tcp_json_response(
-				writer,
-				{
-					"status": "error",
-					"error": "Request must be a UTF-8 encoded string containing JSON.",
-				},
-			)
-			return
-
-		# Parse JSON.
-		try:
-			request_obj = json.loads(message_str)
-		except json.JSONDecodeError:
-			get_logger().warning(f"TCP Socket: Unable to parse JSON from request string: {message_str!r}")
-			await _send_tcp_json_response(
-				writer,
-				{
-					"status": "error",
-					"error": "Request body must be valid JSON.",
-				},
-			)
-			return
-
-		if not isinstance(request_obj, dict):
-			await _send_tcp_json_response(
-				writer,
-				{
-					"status": "error",
-					"error": "Request body must be a JSON object with keys 'request_type' and 'request_content'.",
-				},
-			)
-			return
-
-		request_type = request_obj.get("request_type")
-		if request_type is None:
-			await _send_tcp_json_response(
-				writer,
-				{
-					"status": "error",
-					"error": "Missing 'request_type' in request.",
-				},
-			)
-			return
-
-		request_content = request_obj.get("request_content")
-		if "request_content" not in request_obj:
-			await _send_tcp_json_response(
-				writer,
-				{
-					"status": "error",
-					"error": "Missing 'request_content' in request.",
-				},
-			)
-			return
-
-		if not isinstance(request_type, str):
-			await _send_tcp_json_response(
-				writer,
-				{
-					"status": "error",
-					"error": "'request_type' must be a string.",
-				},
-			)
-			return
-
-		valid_request_types = {
-			"echo",
-			"ping",
-			"create_task_schedule",
-			"cancel_task_schedule",
-		}
-		if request_type not in valid_request_types:
-			await _send_tcp_json_response(
-				writer,
-				{
-					"status": "error",
-					"error": f"Invalid 'request_type'. Must be one of: {', '.join(sorted(valid_request_types))}.",
-				},
-			)
-			return
-
-		# Dispatch based on request_type
-		if request_type == "echo":
-			await _send_tcp_json_response(
-				writer,
-				{
-					"status": "ok",
-					"request_type": "echo",
-					"data": request_content,
-				},
-			)
-			return
-
-		if request_type == "ping":
-			await _send_tcp_json_response(
-				writer,
-				{
-					"status": "ok",
-					"request_type": "ping",
-					"data": "pong",
-				},
-			)
-			return
-
-		# The remaining request types both expect request_content to be a Task Schedule ID string.
-		if not isinstance(request_content, str) or not request_content.strip():
-			await _send_tcp_json_response(
-				writer,
-				{
-					"status": "error",
-					"error": "'request_content' must be a non-empty Task Schedule ID string.",
-				},
-			)
-			return
-
-		task_schedule_id = request_content.strip()
-
-		if request_type == "create_task_schedule":
-			internal_queue = _get_tcp_internal_queue()
-			if internal_queue is None:
-				get_logger().error(
-					"TCP Socket: Internal queue is not available; cannot enqueue Task Schedule ID from TCP request."
-				)
-				await _send_tcp_json_response(
-					writer,
-					{
-						"status": "error",
-						"error": "Scheduler internal queue is not available; cannot process create_task_schedule.",
-					},
-				)
-				return
-
-			await internal_queue.put(task_schedule_id)
-			message = f"BTU Scheduler now re-processing Task Schedule {task_schedule_id} in Python RQ."
-			get_logger().info(f"TCP Socket: Enqueued Task Schedule ID {task_schedule_id} from TCP request.")
-			await _send_tcp_json_response(
-				writer,
-				{
-					"status": "ok",
-					"request_type": "create_task_schedule",
-					"data": message,
-				},
-			)
-			return
-
-		if request_type == "cancel_task_schedule":
-			try:
-				scheduler.rq_cancel_scheduled_task(task_schedule_id)
-				# After cancellation, print remaining tasks to stdout as requested.
-				scheduler.rq_print_scheduled_tasks(to_stdout=True)
-			except Exception as ex:
-				get_logger().error(
-					f"TCP Socket: Error while attempting to cancel Task Schedule {task_schedule_id}: {ex}"
-				)
-				await _send_tcp_json_response(
-					writer,
-					{
-						"status": "error",
-						"error": f"Unable to cancel Task Schedule {task_schedule_id}.",
-					},
-				)
-				return
-
-			await _send_tcp_json_response(
-				writer,
-				{
-					"status": "ok",
-					"request_type": "cancel_task_schedule",
-					"data": f"Task Schedule {task_schedule_id} cancellation requested; remaining tasks printed to stdout.",
-				},
-			)
-			return
-
-		# This branch should not be reachable, but handle defensively.
-		await _send_tcp_json_response(
-			writer,
-			{
-				"status": "error",
-				"error": f"Unhandled request_type '{request_type}'.",
-			},
-		)
-	except (ConnectionResetError, ConnectionError, BrokenPipeError, OSError) as conn_ex:
-		get_logger().debug(f"TCP Socket: Client closed connection or network error occurred: {conn_ex}")
-		try:
-			writer.close()
-			await writer.wait_closed()
-		except Exception:
-			pass
-	except Exception as ex:
-		get_logger().error(f"TCP Socket: Unexpected error in handle_tcp_request(): {ex}")
-		try:
-			await _send_tcp_json_response(
-				writer,
-				{
-					"status": "error",
-					"error": "Internal server error while processing TCP request.",
-				},
-			)
-		except Exception:
-			try:
-				writer.close()
-				await writer.wait_closed()
-			except Exception:
-				pass
+	if client_slots is None:
+		client_slots = asyncio.Semaphore(btu_py.get_config_data().get("tcp_max_clients", 64))
+	if limits is None:
+		limits = ConnectionLimits.from_config("tcp")
+	await serve_control_connection(reader, writer, "TCP Socket", client_slots, limits)
 
 
 async def tcp_socket_listener():
@@ -470,7 +287,12 @@ async def tcp_socket_listener():
 	"""
 	port_number = get_tcp_socket_port()
 	try:
-		server = await asyncio.start_server(handle_tcp_request, "0.0.0.0", port_number)
+		handler = functools.partial(
+			handle_tcp_request,
+			client_slots=asyncio.Semaphore(btu_py.get_config_data().get("tcp_max_clients", 64)),
+			limits=ConnectionLimits.from_config("tcp"),
+		)
+		server = await asyncio.start_server(handler, "0.0.0.0", port_number)
 		# addr = server.sockets[0].getsockname()
 		async with server:
 			get_logger().info(f"Starting TCP listener on port number {port_number} ...")
@@ -482,14 +304,55 @@ async def tcp_socket_listener():
 			raise ex
 
 
-async def _dispatch_redis_command(request_type: str, request_content: str) -> None:
+def _push_redis_completion(response_key: str, payload: dict, content_type: str | None = None) -> None:
+	"""
+	Push a completion message to the caller's response key (after the receipt ACK).
+	"""
+	from btu_py.lib.btu_rq import create_connection
+
+	pipeline = create_connection().pipeline(transaction=True)
+	pipeline.lpush(response_key, codec.encode_message(payload, codec.codec_for_content_type(content_type)))
+	pipeline.expire(response_key, 60)
+	pipeline.execute()
+
+
+def _unknown_site_error(command: dict) -> str | None:
+	"""
+	An error message if the command names a site this daemon does not serve (multi-site mode; see
+	btu_py/lib/sites.py).  None if it names no site, or a known one.
+	"""
+	site_name = command.get("site")
+	if site_name is None or (isinstance(site_name, str) and get_site_context(site_name) is not None):
+		return None
+	return f"Unknown site '{site_name}'."
+
+
+async def _dispatch_redis_command(
+	request_type: str,
+	request_content,
+	response_key: str | None = None,
+	content_type: str | None = None,
+	site: str | None = None,
+) -> None:
 	"""
 	Execute a command that arrived via the Redis RPC queue.
 
 	Called after the receipt ACK has already been sent, so this function
 	can take as long as it needs without affecting the caller's wait time.
+
+	Bulk commands additionally push a completion message, with per-ID results, to 'response_key'.
+
+	A command naming a 'site' runs in that site's context, so it reads that site's configuration and objects.
 	"""
-	get_logger().info(f"Redis RPC: dispatching '{request_type}' with content '{request_content}'.")
+	if site is not None and site != current_site_name():
+		# Already validated (and the caller told) when the receipt ACK was sent.
+		await asyncio.create_task(
+			_dispatch_redis_command(request_type, request_content, response_key, content_type),
+			context=get_site_context(site),
+		)
+		return
+
+	get_logger().info("Redis RPC: dispatching '%s' with content '%s'.", request_type, request_content)
 
 	if request_type == "ping":
 		get_logger().info("Redis RPC: ping received.")
@@ -500,13 +363,12 @@ async def _dispatch_redis_command(request_type: str, request_content: str) -> No
 		if internal_queue is None:
 			get_logger().error("Redis RPC: internal queue unavailable; cannot process create_task_schedule.")
 			return
-		await internal_queue.put(request_content)
+		await internal_queue.put(request_content, lane=LANE_INTERACTIVE)
 		get_logger().info(f"Redis RPC: enqueued Task Schedule ID '{request_content}'.")
 		return
 
 	if request_type == "cancel_task_schedule":
 		try:
-			from btu_py.lib import scheduler
 			scheduler.rq_cancel_scheduled_task(request_content)
 			scheduler.rq_print_scheduled_tasks(to_stdout=False)
 			get_logger().info(f"Redis RPC: cancelled Task Schedule '{request_content}'.")
@@ -514,70 +376,170 @@ async def _dispatch_redis_command(request_type: str, request_content: str) -> No
 			get_logger().error(f"Redis RPC: error cancelling Task Schedule '{request_content}': {ex}")
 		return
 
+	if request_type in REDIS_BULK_REQUEST_TYPES:
+		task_schedule_ids = _validate_task_schedule_id_list(request_content)
+		if task_schedule_ids is None:
+			payload = {
+				"status": "error",
+				"request_type": request_type,
+				"error": "'request_content' must be a non-empty list of Task Schedule ID strings.",
+			}
+		else:
+			try:
+				payload = {
+					"status": "ok",
+					"request_type": request_type,
+					"results": await _execute_bulk_request(request_type, task_schedule_ids),
+				}
+			except Exception as ex:
+				get_logger().error(f"Redis RPC: error processing '{request_type}': {ex}")
+				payload = {"status": "error", "request_type": request_type, "error": str(ex)}
+		if response_key:
+			_push_redis_completion(response_key, payload, content_type)
+		return
+
 	get_logger().warning(f"Redis RPC: unrecognised request_type '{request_type}'.")
 
 
+async def _submit_redis_command(pool, command: dict, on_done=None) -> None:
+	"""
+	Hand one parsed command to the worker pool.  'on_done' is called once it has executed.
+	"""
+	request_type = command.get("request_type", "")
+	request_content = command.get("request_content", "")
+	response_key = command.get("response_key")
+	content_type = command.get("content_type")
+	site = command.get("site")
+	if error := _unknown_site_error(command):
+		get_logger().error(f"Redis RPC: {error}  Discarding '{request_type}' with content '{request_content}'.")
+		if on_done:
+			on_done(None)
+		return
+	args = (request_type, request_content, response_key, content_type, site)
+	if request_type in REDIS_BULK_REQUEST_TYPES:
+		# Touches many Task Schedules; runs after the commands received before it, and before those received after it.
+		await pool.submit_exclusive(*args, on_done=on_done)
+	else:
+		# Two sites may have Task Schedules with the same ID; they need not wait for each other.
+		await pool.submit(request_content if site is None else (site, request_content), *args, on_done=on_done)
+
+
+def _parse_redis_command(raw_message) -> dict | None:
+	"""
+	Decode one raw message popped from REDIS_COMMAND_QUEUE (JSON, or msgpack; see btu_py/lib/codec.py).
+	Returns None (and logs) if it is not an object.
+
+	The returned command's 'content_type' is set to the encoding its replies should use.
+	"""
+	try:
+		command, message_codec = codec.decode_message(raw_message)
+	except codec.CodecError as ex:
+		get_logger().warning("Redis RPC: %s  Discarding: %r", ex, raw_message)
+		return None
+	if not isinstance(command, dict):
+		get_logger().warning("Redis RPC: received a value that is not an object, discarding: %r", raw_message)
+		return None
+	command["content_type"] = codec.response_codec(command, message_codec).content_type
+	return command
+
+
+def _pop_and_ack_commands(redis_conn, batch_size: int) -> list[dict]:
+	"""
+	Synchronous; runs in a thread executor.
+
+	1. Block (up to 1 second) until at least one command is available, then pop up to 'batch_size' commands
+	   in total.  Frappe LPUSHes commands, so popping from the right preserves the order they were sent.
+	2. ACK every command that has a 'response_key' in a single MULTI/EXEC pipeline.
+	"""
+	result = redis_conn.brpop([REDIS_COMMAND_QUEUE], timeout=1)
+	if result is None:
+		return []  # nothing arrived within the 1-second window
+
+	global _rpop_count_supported
+	raw_messages = [result[1]]
+	if batch_size > 1 and _rpop_count_supported:
+		try:
+			more = redis_conn.rpop(REDIS_COMMAND_QUEUE, batch_size - 1)  # RPOP with a count requires Redis 6.2+
+		except redis.exceptions.ResponseError as ex:
+			get_logger().warning(f"Redis RPC: batched pops are unsupported ({ex}); popping one command at a time.")
+			_rpop_count_supported = False
+			more = None
+		if more:
+			raw_messages.extend(more)
+
+	commands = [each for each in map(_parse_redis_command, raw_messages) if each is not None]
+	_ack_redis_commands(redis_conn, commands)
+	return commands
+
+
+def _ack_redis_commands(redis_conn, commands: list[dict]) -> None:
+	"""
+	Push a receipt ACK to the 'response_key' of every command that has one, using a single MULTI/EXEC pipeline.
+	A command for an unknown site is acknowledged with an error instead, and will not be executed.
+	"""
+	pipeline = redis_conn.pipeline(transaction=True)
+	for command in commands:
+		response_key = command.get("response_key")
+		if response_key:
+			if error := _unknown_site_error(command):
+				ack = {"status": "error", "request_type": command.get("request_type", ""), "error": error}
+			else:
+				ack = {
+					"status": "ok",
+					"request_type": command.get("request_type", ""),
+					"message": "Command received by BTU Scheduler.",
+				}
+			ack = codec.encode_message(ack, codec.codec_for_content_type(command.get("content_type")))
+			pipeline.lpush(response_key, ack)
+			pipeline.expire(response_key, 60)  # auto-clean orphaned keys if caller died
+	if len(pipeline):
+		pipeline.execute()
+
+
 async def redis_command_listener() -> None:
 	"""
 	Primary control-plane listener for the BTU Scheduler daemon.
 
 	Monitors REDIS_COMMAND_QUEUE using a blocking BRPOP (run in a thread executor
-	so it does not stall the asyncio event loop).  On receiving a command:
+	so it does not stall the asyncio event loop).  On receiving commands:
 
-	  1. Immediately pushes a receipt ACK to the caller's response_key.
+	  1. Pops up to 'redis_rpc_batch_size' commands in one round trip, and immediately
+	     pushes a receipt ACK to each caller's response_key, all in one pipeline.
 	     The Frappe web worker is blocking on BLPOP(response_key) and unblocks here.
 	     This happens before any execution work, keeping the caller's wait near-instant.
 
-	  2. Dispatches the command to _dispatch_redis_command(), which runs after the
-	     caller has already received its acknowledgement.
+	  2. Hands each command to a pool of 'redis_rpc_workers' workers that run
+	     _dispatch_redis_command() concurrently.  Commands for the same Task Schedule
+	     always go to the same worker, so they still execute in the order received.
 
 	See docs/scheduler_redis_rpc.md for the full protocol description.
 	"""
-	from btu_py.lib.btu_rq import create_connection
+	from btu_py.lib.btu_rq import create_raw_connection
 
-	redis_conn = create_connection()
-	loop = asyncio.get_event_loop()
-
-	get_logger().info(f"Redis RPC command listener started, monitoring queue '{REDIS_COMMAND_QUEUE}'.")
-
-	while True:
-		try:
-			# Blocking BRPOP with a 1-second timeout, run in a thread so the event loop
-			# stays free for the scheduler's other coroutines during the wait.
-			result = await loop.run_in_executor(
-				None,
-				lambda: redis_conn.blpop([REDIS_COMMAND_QUEUE], timeout=1)
-			)
+	from .command_pool import CommandWorkerPool
 
-			if result is None:
-				continue  # nothing arrived within the 1-second window; loop back
-
-			_, raw_message = result
+	config_data = btu_py.get_config_data()
+	batch_size = max(1, int(config_data.get("redis_rpc_batch_size", 32)))
+	pool = CommandWorkerPool(
+		_dispatch_redis_command, worker_count=config_data.get("redis_rpc_workers", 4), name="Redis RPC"
+	)
+	redis_conn = create_raw_connection()  # messages may be msgpack, so they are not decoded as UTF-8
+	loop = asyncio.get_event_loop()
 
+	async def listen():
+		get_logger().info(f"Redis RPC command listener started, monitoring queue '{REDIS_COMMAND_QUEUE}'.")
+		while True:
 			try:
-				command = json.loads(raw_message)
-			except json.JSONDecodeError:
-				get_logger().warning(f"Redis RPC: received non-JSON message, discarding: {raw_message!r}")
+				commands = await loop.run_in_executor(None, _pop_and_ack_commands, redis_conn, batch_size)
+			except Exception as ex:
+				get_logger().error(f"Redis RPC listener unhandled error: {ex}")
+				await asyncio.sleep(1)  # brief back-off before resuming
 				continue
 
-			request_type = command.get("request_type", "")
-			request_content = command.get("request_content", "")
-			response_key = command.get("response_key")
-
-			# Step 1: ACK receipt BEFORE executing anything.
-			# The Frappe web worker is blocked on BLPOP(response_key); this unblocks it.
-			if response_key:
-				ack = json.dumps({
-					"status": "ok",
-					"request_type": request_type,
-					"message": "Command received by BTU Scheduler.",
-				})
-				redis_conn.lpush(response_key, ack)
-				redis_conn.expire(response_key, 60)  # auto-clean orphaned keys if caller died
+			# Now execute the commands (callers are already unblocked).
+			for command in commands:
+				await _submit_redis_command(pool, command)
 
-			# Step 2: Now execute the command (caller is already unblocked).
-			await _dispatch_redis_command(request_type, request_content)
-
-		except Exception as ex:
-			get_logger().error(f"Redis RPC listener unhandled error: {ex}")
-			await asyncio.sleep(1)  # brief back-off before resuming
+	async with asyncio.TaskGroup() as group:
+		group.create_task(pool.run(), name="Redis RPC Worker Pool")
+		group.create_task(listen(), name="Redis RPC Listener")
@@ -0,0 +1,245 @@
+"""btu_py/daemon/snapshot.py"""
+
+# Warm restarts.
+#
+# Without a snapshot, a starting daemon queues every enabled Task Schedule, and rebuilds each one through SQL and cron
+# before it is fully ready; the larger the catalog, the longer that takes.  Instead, on SIGTERM (or SIGINT) the daemon
+# saves a snapshot of:
+#
+#   * the internal queue (Task Schedule IDs still waiting, per lane),
+#   * the schedule catalog (a fingerprint of each Task Schedule definition it has written to Redis), and
+#   * the scheduled instances (TSIKs and their next execution times).
+#
+# On start, the snapshot is loaded: TSIKs are written back to Redis (if missing) and the internal queue is restored.
+# Then, in the background, the catalog is verified against SQL with a single query: only Task Schedules that are new
+# or changed are rebuilt, and those no longer enabled are cancelled.
+#
+# The snapshot is gzipped JSON, stored in a local file ('snapshot_path') or a Redis key ('snapshot_store' = "redis").
+
+import asyncio
+import gzip
+import json
+import os
+import pathlib
+import time
+
+import btu_py
+from btu_py import get_logger
+from btu_py.lib.internal_queue import LANE_REFILL, LANES
+from btu_py.lib.sites import per_site, site_key
+from btu_py.lib.structs import BtuTaskSchedule
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_REDIS_KEY = "btu_scheduler:snapshot"
+DEFAULT_SNAPSHOT_PATH = "/var/tmp/btu_scheduler_snapshot.json.gz"
+
+
+class DaemonShutdown(Exception):
+	"""
+	Raised inside the daemon's TaskGroup when a shutdown signal arrives, so that every other task is cancelled.
+	"""
+
+
+def schedule_fingerprint(task_schedule) -> str:
+	"""
+	The parts of a Task Schedule definition that decide its RQ scheduling.  Accepts a BtuTaskSchedule or a SQL row.
+	"""
+	if isinstance(task_schedule, BtuTaskSchedule):
+		schedule = task_schedule
+		values = (schedule.task_key, schedule.queue_name, schedule.cron_string, schedule.cron_timezone)
+	else:
+		values = tuple(task_schedule[each] for each in ("task", "queue_name", "cron_string", "cron_timezone"))
+	return "|".join(str(each) for each in values)
+
+
+class ScheduleCatalog:
+	"""
+	Fingerprints of the Task Schedules this daemon has written to Redis, keyed by Task Schedule ID.
+	"""
+
+	def __init__(self, entries: dict | None = None):
+		self.entries: dict[str, str] = dict(entries or {})
+
+	def __len__(self) -> int:
+		return len(self.entries)
+
+	def record(self, task_schedule) -> None:
+		self.entries[task_schedule.id] = schedule_fingerprint(task_schedule)
+
+	def forget(self, task_schedule_id: str) -> None:
+		self.entries.pop(task_schedule_id, None)
+
+	def compare(self, sql_rows: list) -> tuple[list[str], list[str]]:
+		"""
+		Returns (IDs that are new or changed in SQL, IDs in the catalog that are no longer enabled in SQL).
+		"""
+		in_sql = {each_row["name"]: schedule_fingerprint(each_row) for each_row in sql_rows}
+		changed = [each_id for each_id, fingerprint in in_sql.items() if self.entries.get(each_id) != fingerprint]
+		removed = [each_id for each_id in self.entries if each_id not in in_sql]
+		return changed, removed
+
+
+_catalogs: dict[str | None, ScheduleCatalog] = {}
+
+
+def get_schedule_catalog() -> ScheduleCatalog:
+	"""
+	Return the site's ScheduleCatalog (see btu_py/lib/sites.py), creating it on first use.
+	"""
+	return per_site(_catalogs, ScheduleCatalog)
+
+
+def build_snapshot(internal_queue, catalog: ScheduleCatalog, scheduled_tasks: dict) -> dict:
+	return {
+		"version": SNAPSHOT_VERSION,
+		"created_at": time.time(),
+		"internal_queue": internal_queue.items_by_lane(),
+		"catalog": catalog.entries,
+		"scheduled_tasks": scheduled_tasks,
+	}
+
+
+def _snapshot_settings() -> tuple[str, str]:
+	config_data = btu_py.get_config_data()
+	path = config_data.get("snapshot_path", DEFAULT_SNAPSHOT_PATH)
+	if config_data.get("site_name"):
+		# One file per site, e.g. /var/tmp/erp.btu_scheduler_snapshot.json.gz
+		path = str(pathlib.Path(path).with_name(f"{config_data.site_name}.{pathlib.Path(path).name}"))
+	return config_data.get("snapshot_store", "file"), path
+
+
+def write_snapshot(snapshot: dict) -> int:
+	"""
+	Save a snapshot to the configured store.  Returns the number of bytes written.
+	"""
+	store, path = _snapshot_settings()
+	payload = gzip.compress(json.dumps(snapshot, separators=(",", ":")).encode("utf-8"))
+	if store == "redis":
+		from btu_py.lib.btu_rq import create_connection
+
+		create_connection(decode_responses=False).set(site_key(SNAPSHOT_REDIS_KEY), payload)
+	else:
+		# Write a temporary file, then rename it: a crash while writing never leaves a truncated snapshot.
+		snapshot_path = pathlib.Path(path)
+		temporary_path = snapshot_path.with_name(snapshot_path.name + ".tmp")
+		temporary_path.write_bytes(payload)
+		os.replace(temporary_path, snapshot_path)
+	return len(payload)
+
+
+def read_snapshot(max_age_secs: float) -> dict | None:
+	"""
+	Load the snapshot from the configured store.  Returns None if there is none, or it is unusable.
+	"""
+	store, path = _snapshot_settings()
+	if store == "none":
+		return None
+	try:
+		if store == "redis":
+			from btu_py.lib.btu_rq import create_connection
+
+			payload = create_connection(decode_responses=False).get(site_key(SNAPSHOT_REDIS_KEY))
+		else:
+			payload = pathlib.Path(path).read_bytes() if pathlib.Path(path).exists() else None
+		if not payload:
+			return None
+		snapshot = json.loads(gzip.decompress(payload))
+	except Exception as ex:
+		get_logger().warning("Ignoring the daemon snapshot; it cannot be read: %s", ex)
+		return None
+
+	if snapshot.get("version") != SNAPSHOT_VERSION:
+		get_logger().warning("Ignoring the daemon snapshot; version %s is not supported.", snapshot.get("version"))
+		return None
+	age_secs = time.time() - snapshot.get("created_at", 0)
+	if age_secs > max_age_secs:
+		get_logger().warning("Ignoring the daemon snapshot; it is %s seconds old.", int(age_secs))
+		return None
+	return snapshot
+
+
+def save_snapshot(internal_queue) -> None:
+	"""
+	Snapshot the daemon's state during shutdown.  Failures are logged, never raised.
+	"""
+	if _snapshot_settings()[0] == "none":
+		return
+	from btu_py.lib.btu_rq import create_connection
+	from btu_py.lib.task_store import get_scheduled_task_store
+
+	started = time.perf_counter()
+	try:
+		scheduled_tasks = dict(get_scheduled_task_store().scan(create_connection()))
+		snapshot = build_snapshot(internal_queue, get_schedule_catalog(), scheduled_tasks)
+		size = write_snapshot(snapshot)
+	except Exception as ex:
+		get_logger().error(f"Unable to save the daemon snapshot: {ex}")
+		return
+	get_logger().info(
+		"Saved the daemon snapshot (%s Task Schedules, %s scheduled instances, %s queued IDs; %s bytes) in %.3f secs.",
+		len(snapshot["catalog"]),
+		len(scheduled_tasks),
+		internal_queue.qsize(),
+		size,
+		time.perf_counter() - started,
+	)
+
+
+def restore_snapshot(snapshot: dict, internal_queue) -> None:
+	"""
+	Write the snapshot's TSIKs back to Redis (keeping any that are already there), refill the internal queue, and
+	load the schedule catalog.
+	"""
+	from btu_py.lib.btu_rq import create_connection
+	from btu_py.lib.task_store import get_scheduled_task_store
+
+	scheduled_tasks = snapshot.get("scheduled_tasks") or {}
+	if scheduled_tasks:
+		get_scheduled_task_store().add(create_connection(), scheduled_tasks, nx=True)
+	queued = 0
+	for lane in LANES:
+		for each_id in snapshot.get("internal_queue", {}).get(lane, []):
+			if lane == LANE_REFILL and internal_queue.full():
+				break  # these were from a periodic refill, which will run again
+			queued += internal_queue.put_nowait(each_id, lane=lane)
+	get_schedule_catalog().entries = dict(snapshot.get("catalog") or {})
+	get_logger().info(
+		"Restored the daemon snapshot: %s Task Schedules, %s scheduled instances, %s queued IDs.",
+		len(get_schedule_catalog()),
+		len(scheduled_tasks),
+		queued,
+	)
+
+
+async def verify_snapshot_against_sql(internal_queue) -> tuple[int, int]:
+	"""
+	Compare the restored catalog with SQL; rebuild new and changed Task Schedules, and cancel those no longer enabled.
+	The scheduled instances of a changed Task Schedule are removed first, since they were calculated from the old
+	definition.  Returns (number rebuilt, number cancelled).
+	"""
+	from btu_py.lib.scheduler import rq_cancel_scheduled_tasks
+	from btu_py.lib.sql import get_enabled_task_schedule_rows
+
+	catalog = get_schedule_catalog()
+	changed, removed = catalog.compare(await get_enabled_task_schedule_rows())
+	outdated = [each_id for each_id in changed if each_id in catalog.entries] + removed
+	if outdated:
+		await asyncio.to_thread(rq_cancel_scheduled_tasks, outdated)  # to_thread() keeps the site context
+		for each_id in outdated:
+			catalog.forget(each_id)
+	for each_id in changed:
+		await internal_queue.put(each_id, lane=LANE_REFILL)
+	get_logger().info(
+		"Verified the daemon snapshot against SQL: %s Task Schedules new or changed, %s no longer enabled.",
+		len(changed),
+		len(removed),
+	)
+	return len(changed), len(removed)
+
+
+async def wait_for_shutdown_signal(shutdown_requested) -> None:
+	"""
+	Wait for the 'shutdown_requested' event (set by a signal handler), then raise DaemonShutdown to stop the TaskGroup.
+	"""
+	await shutdown_requested.wait()
+	raise DaemonShutdown
@@ -0,0 +1,187 @@
+"""btu_py/daemon/stream_listener.py"""
+
+# An alternative Redis RPC transport, built on Redis Streams and consumer groups (requires Redis 6.2+).
+#
+# Compared to the list-based transport in coroutines.py:
+#   * A command is only removed (XACK + XDEL) after it has executed.  If the daemon dies in between, the entry
+#     stays in the group's Pending Entries List, and is reclaimed (XAUTOCLAIM) by whichever consumer notices first.
+#     Executed commands are removed in batches, with one pipeline per batch, run in the thread executor.
+#   * Any number of daemons can read from the same consumer group, e.g. a standby daemon on another host.
+
+import asyncio
+import os
+import socket
+
+import redis
+
+import btu_py
+from btu_py import get_logger
+
+from .coroutines import _ack_redis_commands, _dispatch_redis_command, _parse_redis_command, _submit_redis_command
+
+# Must match REDIS_COMMAND_STREAM in the Frappe BTU application.
+REDIS_COMMAND_STREAM = "btu:scheduler:command_stream"
+REDIS_COMMAND_GROUP = "btu_scheduler"
+
+
+def _consumer_name() -> str:
+	return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def ensure_consumer_group(redis_conn) -> None:
+	"""
+	Create the stream and consumer group if they do not exist yet.
+	"""
+	try:
+		redis_conn.xgroup_create(REDIS_COMMAND_STREAM, REDIS_COMMAND_GROUP, id="0", mkstream=True)
+		get_logger().info(f"Redis Streams: created consumer group '{REDIS_COMMAND_GROUP}' on '{REDIS_COMMAND_STREAM}'.")
+	except redis.exceptions.ResponseError as ex:
+		if "BUSYGROUP" not in str(ex):
+			raise
+
+
+def _entries_to_commands(redis_conn, entries: list) -> list[tuple[str, dict]]:
+	"""
+	Parse stream entries into (entry_id, command) pairs.  Unparseable entries are acknowledged and deleted at once,
+	so they are not reclaimed forever.
+	"""
+	parsed = []
+	discarded = []
+	for entry_id, fields in entries:
+		if isinstance(entry_id, bytes):
+			entry_id = entry_id.decode("ascii")
+		command = _parse_redis_command(fields.get(b"payload", b"")) if fields else None
+		if command is None:
+			discarded.append(entry_id)
+		else:
+			parsed.append((entry_id, command))
+	if discarded:
+		_acknowledge_entries(redis_conn, discarded)
+	return parsed
+
+
+def _acknowledge_entries(redis_conn, entry_ids: list[str]) -> None:
+	pipeline = redis_conn.pipeline(transaction=True)
+	pipeline.xack(REDIS_COMMAND_STREAM, REDIS_COMMAND_GROUP, *entry_ids)
+	pipeline.xdel(REDIS_COMMAND_STREAM, *entry_ids)
+	pipeline.execute()
+
+
+def _read_new_commands(redis_conn, consumer_name: str, batch_size: int) -> list[tuple[str, dict]]:
+	"""
+	Synchronous; runs in a thread executor.  Block up to 1 second for new entries, read up to 'batch_size' of them
+	in one round trip, and ACK receipt to every caller in one pipeline.
+	"""
+	response = redis_conn.xreadgroup(
+		REDIS_COMMAND_GROUP, consumer_name, {REDIS_COMMAND_STREAM: ">"}, count=batch_size, block=1000
+	)
+	if not response:
+		return []
+	_, entries = response[0]
+	commands = _entries_to_commands(redis_conn, entries)
+	_ack_redis_commands(redis_conn, [command for _, command in commands])
+	return commands
+
+
+def _reclaim_idle_commands(redis_conn, consumer_name: str, batch_size: int, min_idle_ms: int):
+	"""
+	Synchronous; runs in a thread executor.  Take ownership of entries that another consumer (or a previous run of
+	this daemon) read, but never acknowledged.  Callers were already sent a receipt ACK, so none is sent again.
+	"""
+	response = redis_conn.xautoclaim(
+		REDIS_COMMAND_STREAM, REDIS_COMMAND_GROUP, consumer_name, min_idle_ms, start_id="0-0", count=batch_size
+	)
+	# Redis 6.2 returns [next_id, entries]; Redis 7+ adds a third element listing deleted entry IDs.
+	entries = [each for each in response[1] if each and each[1] is not None]
+	return _entries_to_commands(redis_conn, entries)
+
+
+async def redis_stream_command_listener() -> None:
+	"""
+	Control-plane listener using Redis Streams: XREADGROUP for new commands, XACK/XDEL once executed, and
+	XAUTOCLAIM to recover commands left pending by a consumer that died.
+
+	Enabled with configuration 'redis_rpc_transport = "stream"'.  See docs/scheduler_redis_rpc.md.
+	"""
+	from btu_py.lib.btu_rq import create_raw_connection
+
+	from .command_pool import CommandWorkerPool
+
+	config_data = btu_py.get_config_data()
+	batch_size = max(1, int(config_data.get("redis_rpc_batch_size", 32)))
+	min_idle_ms = int(config_data.get("redis_stream_claim_idle_ms", 60000))
+	pool = CommandWorkerPool(
+		_dispatch_redis_command, worker_count=config_data.get("redis_rpc_workers", 4), name="Redis Streams RPC"
+	)
+	consumer_name = _consumer_name()
+	redis_conn = create_raw_connection()  # payloads may be msgpack, so they are not decoded as UTF-8
+	loop = asyncio.get_event_loop()
+
+	await loop.run_in_executor(None, ensure_consumer_group, redis_conn)
+
+	in_flight: set[str] = set()  # entries submitted to the pool, but not yet acknowledged
+	executed: list[str] = []  # entries executed, waiting to be acknowledged by acknowledge()
+	executed_event = asyncio.Event()
+
+	def acknowledge_when_done(entry_id: str):
+		def on_done(_result):
+			# Runs on the event loop; the round trip to Redis is left to acknowledge(), in the thread executor.
+			executed.append(entry_id)
+			executed_event.set()
+
+		return on_done
+
+	async def acknowledge():
+		while True:
+			await executed_event.wait()
+			executed_event.clear()
+			entry_ids = executed[:]
+			executed.clear()
+			try:
+				await loop.run_in_executor(None, _acknowledge_entries, redis_conn, entry_ids)
+			except Exception as ex:
+				# The entries stay pending, and will be reclaimed and executed again later.
+				get_logger().error(f"Redis Streams: unable to acknowledge {len(entry_ids)} entries: {ex}")
+			in_flight.difference_update(entry_ids)
+
+	async def submit_all(commands: list[tuple[str, dict]]):
+		for entry_id, command in commands:
+			if entry_id in in_flight:
+				continue  # reclaimed from ourselves while still executing; do not run it twice
+			in_flight.add(entry_id)
+			await _submit_redis_command(pool, command, on_done=acknowledge_when_done(entry_id))
+
+	async def listen():
+		get_logger().info(
+			f"Redis Streams command listener started as consumer '{consumer_name}' "
+			f"in group '{REDIS_COMMAND_GROUP}' on stream '{REDIS_COMMAND_STREAM}'."
+		)
+		while True:
+			try:
+				commands = await loop.run_in_executor(None, _read_new_commands, redis_conn, consumer_name, batch_size)
+			except Exception as ex:
+				get_logger().error(f"Redis Streams listener unhandled error: {ex}")
+				await asyncio.sleep(1)  # brief back-off before resuming
+				continue
+			await submit_all(commands)
+
+	async def reclaim():
+		while True:
+			try:
+				commands = await loop.run_in_executor(
+					None, _reclaim_idle_commands, redis_conn, consumer_name, batch_size, min_idle_ms
+				)
+				commands = [(entry_id, command) for entry_id, command in commands if entry_id not in in_flight]
+				if commands:
+					get_logger().warning(f"Redis Streams: reclaimed {len(commands)} unacknowledged commands.")
+					await submit_all(commands)
+					continue  # there may be more; check again right away
+			except Exception as ex:
+				get_logger().error(f"Redis Streams reclaim unhandled error: {ex}")
+			await asyncio.sleep(max(1.0, min_idle_ms / 2000))
+
+	async with asyncio.TaskGroup() as group:
+		group.create_task(pool.run(), name="Redis Streams Worker Pool")
+		group.create_task(listen(), name="Redis Streams Listener")
+		group.create_task(reclaim(), name="Redis Streams Reclaimer")
+		group.create_task(acknowledge(), name="Redis Streams Acknowledger")
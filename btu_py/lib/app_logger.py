@@ -1,10 +1,24 @@
 """btu_py/lib/app_logger.py"""
 
+import atexit
 import logging
+import logging.handlers
 import pathlib
+import queue
 
+# One background listener per logger name, so rebuilding a logger does not leak threads.
+_queue_listeners: dict[str, logging.handlers.QueueListener] = {}
 
-def build_new_logger(logger_name: str, logfile_path, logging_level: str, stream_to_terminal=True):
+
+def build_new_logger(
+	logger_name: str, logfile_path, logging_level: str, stream_to_terminal=True, use_queue=True
+):
+	"""
+	Build a logger that writes to a file (and optionally the terminal).
+
+	When 'use_queue' is True, the logger itself only has a QueueHandler.  The file and terminal handlers are
+	driven by a QueueListener on a background thread, so disk latency never blocks the asyncio event loop.
+	"""
 	logger = logging.getLogger(logger_name)
 	logger.level = logging.getLevelName(logging_level)  # determine the Level from the application's configuration.
 	logger.handlers = []
@@ -15,13 +29,40 @@ def build_new_logger(logger_name: str, logfile_path, logging_level: str, stream_
 	# Create a File Handler
 	handler_file = logging.FileHandler(filename=pathlib.Path(logfile_path).resolve(), mode="a", encoding="utf-8")
 	handler_file.setFormatter(formatter)
-	logger.addHandler(handler_file)  # finally, add the handler to the custom logger
+	output_handlers = [handler_file]
 
 	if stream_to_terminal:
-		logger.propagate = False
 		print("Note: Logger will also stream to the terminal.")
 		handler_stream = logging.StreamHandler()
 		handler_stream.setFormatter(formatter)
-		logger.addHandler(handler_stream)  # finally, add the handler to the custom logger
+		output_handlers.append(handler_stream)
+
+	stop_queue_listener(logger_name)  # if this logger was built before, retire its listener first
+	if use_queue:
+		log_queue = queue.SimpleQueue()
+		listener = logging.handlers.QueueListener(log_queue, *output_handlers, respect_handler_level=True)
+		listener.start()
+		_queue_listeners[logger_name] = listener
+		logger.addHandler(logging.handlers.QueueHandler(log_queue))
+	else:
+		for each_handler in output_handlers:
+			logger.addHandler(each_handler)  # finally, add the handler to the custom logger
 
 	return logger
+
+
+def stop_queue_listener(logger_name: str) -> None:
+	"""
+	Flush and stop the background listener for a logger, if it has one.
+	"""
+	listener = _queue_listeners.pop(logger_name, None)
+	if listener:
+		listener.stop()  # processes any records still waiting in the queue
+		for each_handler in listener.handlers:
+			each_handler.close()
+
+
+@atexit.register
+def _stop_all_queue_listeners():
+	for logger_name in list(_queue_listeners):
+		stop_queue_listener(logger_name)
@@ -9,17 +9,23 @@ from __future__ import (
 import uuid
 from dataclasses import dataclass
 from datetime import datetime as DateTimeType
-from typing import Union
+from typing import TYPE_CHECKING, Union
 from zoneinfo import ZoneInfo
 
 import redis
-import rq
+
+if TYPE_CHECKING:
+	import rq  # only for annotations; importing Python RQ itself is slow
 
 # BTU
-from btu_py import get_config, get_config_data, get_logger
+from btu_py import get_config, get_config_data
 
 NoneType = type(None)
 
+# One connection pool per set of connection settings.  After a configuration reload, connections keep using the same
+# pool unless the Redis host or port changed.
+_connection_pools: dict[tuple, redis.ConnectionPool] = {}
+
 
 def datetime_to_rq_date_string(some_datetime):
 	return some_datetime.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
@@ -32,23 +38,23 @@ def create_connection(decode_responses=True):
 	if not get_config().as_dictionary():
 		raise RuntimeError("Application configuration is not loaded.")
 
-	return redis.StrictRedis(
-		host=get_config().as_dictionary()["rq_host"],
-		port=get_config().as_dictionary()["rq_port"],
-		decode_responses=decode_responses,
-	)
+	config_data = get_config_data()
+	settings = (config_data.rq_host, config_data.rq_port, decode_responses)
+	pool = _connection_pools.get(settings)
+	if pool is None:
+		for each_settings in [each for each in _connection_pools if each[:2] != settings[:2]]:
+			_connection_pools.pop(each_settings).disconnect()  # the Redis server has moved
+		pool = redis.ConnectionPool(host=settings[0], port=settings[1], decode_responses=decode_responses)
+		_connection_pools[settings] = pool
+	return redis.StrictRedis(connection_pool=pool)
 
 
 def create_raw_connection():
-	if not get_config().as_dictionary():
-		raise RuntimeError("Application configuration is not loaded.")
-
-	return redis.StrictRedis(
-		host=get_config().as_dictionary()["rq_host"],
-		port=get_config().as_dictionary()["rq_port"],
-		decode_responses=False,
-		encoding=None,
-	)
+	"""
+	A connection whose responses are bytes (e.g. msgpack payloads).  Arguments may still be strings; redis-py encodes
+	them as UTF-8, so the encoding must not be None.
+	"""
+	return create_connection(decode_responses=False)
 
 
 @dataclass
@@ -101,65 +107,47 @@ class RQJobWrapper:
 			rq_job_object=None,
 		)
 
-	def DEL_create_only(self):
+	def to_redis_mapping(self) -> dict:
 		"""
-		Save the RQ struct to the Redis database, but do not enqueue.
+		The fields of the 'rq:job:*' hash, as Python RQ writes them.  NoneTypes cannot be stored, so become "".
 		"""
-		redis_conn = create_connection()
-
-		# NOTE: Cannot pass NoneTypes here
-		values_dict = {
-			"status": self.status,
+		mapping = {
+			"status": self.status or "",
 			"worker_name": self.worker_name,
 			"ended_at": self.ended_at or "",
 			"result_ttl": self.result_ttl or "",
-			"enqueued_at": self.enqueued_at or "",
+			"enqueued_at": datetime_to_rq_date_string(self.enqueued_at) if self.enqueued_at else "",
 			"last_heartbeat": datetime_to_rq_date_string(self.last_heartbeat) if self.last_heartbeat else "",
 			"origin": self.origin,
 			"description": self.description,
 			"started_at": self.started_at or "",
 			"created_at": datetime_to_rq_date_string(self.created_at),
 			"timeout": self.timeout,
+			"data": self.data,  # bytes: a zlib-compressed pickle of (function, instance, args, kwargs)
 		}
-
-		# When using hset_multiple, the values must all be of the same Type.
-		# In the case below, an Array of Tuples, where the Tuple is (&str, &String)
-		print(f"Adding data for Job {self.job_key} to Redis database ...")
-		redis_conn.hmset(self.fully_qualified_key, values_dict)
-		create_connection(decode_responses=False).hset(self.fully_qualified_key, "data", self.data)
 		if self.meta:
-			redis_conn.hset(self.self.fully_qualified_key, "meta", self.meta)
+			mapping["meta"] = self.meta
+		return mapping
+
+	def save_and_enqueue(self, pipeline) -> None:
+		"""
+		Add commands to 'pipeline' that save this Job, and push it onto its queue, so a worker can pick it up.
+		Nothing is sent to Redis until the caller executes the pipeline.
+		"""
+		if not self.data:
+			raise ValueError(f"RQ Job {self.job_key} has no data (pickled function); it cannot be enqueued.")
+		self.status = "queued"
+		self.enqueued_at = DateTimeType.now(ZoneInfo("UTC"))
+		queue_key = rq_queue_key(self.origin)
 
-	def DEL_create_and_enqueue(self):
-		pass
+		pipeline.hset(self.fully_qualified_key, mapping=self.to_redis_mapping())
+		pipeline.sadd("rq:queues", queue_key)  # the queue is probably registered already
+		pipeline.rpush(queue_key, self.job_key)
 
 
-def DEL_enqueue_job_immediate(existing_job_id: str):
+def rq_queue_key(queue_name: str) -> str:
 	"""
-	Add a pre-existing RQ Job to a queue, so a worker can pick it up.
+	The Redis key of a Python RQ queue.  Queue names read from SQL already carry the bench prefix
+	(e.g. "erpnext-mybench:short"); 'rq_queue_prefix' is prepended for installations that need something else.
 	"""
-	redis_conn = create_connection()
-
-	from rq.registry import StartedJobRegistry
-
-	registry = StartedJobRegistry("default", connection=redis_conn)
-	queued_job_ids = registry.get_queue().job_ids
-	print(f"queued_job_ids: {queued_job_ids}")
-
-	this_job = rq.job.Job.fetch(existing_job_id, connection=redis_conn)
-
-	# First, add the Queue name to 'rq:queues' (it could be there already)
-	queue_key: str = f"rq:queue:{this_job.origin}"
-	some_result = redis_conn.sadd("rq:queues", queue_key)
-	if not some_result:
-		get_logger().error("Error during enqueue_job_immediate()")
-		raise IOError(some_result)
-
-	# Then add the Job's ID to the queue.
-	# NOTE: The return value of 'rpush' is an integer, representing the length of the List, after the completion of the push operation.
-	push_result = redis_conn.rpush(queue_key, existing_job_id)
-	if not push_result:
-		raise IOError(push_result)
-	get_logger.info(
-		f"Enqueued RQ Job '{existing_job_id}' for immediate execution. Length of list after 'rpush' operation: {push_result}"
-	)
+	return f"rq:queue:{get_config_data().get('rq_queue_prefix', '')}{queue_name}"
@@ -0,0 +1,169 @@
+"""btu_py/lib/codec.py"""
+
+# Serialization shared by the control protocols (TCP socket and Redis RPC).
+#
+# Two encodings are supported:
+#   * JSON     UTF-8 text.  The default, and what every existing client sends.
+#   * msgpack  Compact binary.  Requires the optional 'msgpack' package ("pip install btu_py[msgpack]").
+#
+# A msgpack message is prefixed with the byte 0xC1.  That byte is never used by msgpack itself, and can never begin
+# a JSON document, so the encoding of any message can be detected from its first byte.  On a TCP stream, the magic
+# byte is followed by a 4-byte big-endian payload length; JSON frames are terminated by a newline instead.
+#
+# A response is encoded the same way as its request, unless the request names a different 'content_type'.
+
+import json
+import struct
+
+MSGPACK_MAGIC = b"\xc1"
+_FRAME_LENGTH = struct.Struct(">I")
+
+
+class CodecError(ValueError):
+	"""
+	A message could not be encoded or decoded.
+	"""
+
+
+class JsonCodec:
+	name = "json"
+	content_type = "application/json"
+
+	@staticmethod
+	def dumps(obj) -> bytes:
+		return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+	@staticmethod
+	def loads(data: bytes):
+		try:
+			return json.loads(data)
+		except UnicodeDecodeError as ex:
+			raise CodecError("Request must be a UTF-8 encoded string containing JSON.") from ex
+		except json.JSONDecodeError as ex:
+			raise CodecError("Request body must be valid JSON.") from ex
+
+
+class MsgpackCodec:
+	name = "msgpack"
+	content_type = "application/msgpack"
+
+	@staticmethod
+	def _module():
+		try:
+			import msgpack
+		except ImportError as ex:
+			raise CodecError("msgpack encoding is not available; the 'msgpack' package is not installed.") from ex
+		return msgpack
+
+	@classmethod
+	def dumps(cls, obj) -> bytes:
+		return cls._module().packb(obj, use_bin_type=True)
+
+	@classmethod
+	def loads(cls, data: bytes):
+		msgpack = cls._module()
+		try:
+			return msgpack.unpackb(data, raw=False)
+		except (ValueError, msgpack.UnpackException) as ex:
+			raise CodecError("Request body must be valid msgpack.") from ex
+
+
+JSON = JsonCodec()
+MSGPACK = MsgpackCodec()
+
+_CODECS_BY_NAME = {
+	"json": JSON,
+	"application/json": JSON,
+	"msgpack": MSGPACK,
+	"application/msgpack": MSGPACK,
+	"application/x-msgpack": MSGPACK,
+}
+
+
+def msgpack_available() -> bool:
+	try:
+		MsgpackCodec._module()
+		return True
+	except CodecError:
+		return False
+
+
+def codec_for_content_type(content_type, default=JSON):
+	"""
+	Return the codec named by 'content_type' (e.g. "msgpack" or "application/json"), or 'default' if not recognised.
+	"""
+	if not isinstance(content_type, str):
+		return default
+	return _CODECS_BY_NAME.get(content_type.strip().lower(), default)
+
+
+def response_codec(request_obj, request_codec):
+	"""
+	The codec for replying to 'request_obj': its 'content_type' field if present, otherwise the request's own codec.
+	"""
+	if not isinstance(request_obj, dict):
+		return request_codec
+	result = codec_for_content_type(request_obj.get("content_type"), request_codec)
+	if result is MSGPACK and not msgpack_available():
+		return request_codec
+	return result
+
+
+def decode_message(data: bytes | str):
+	"""
+	Decode one whole message (e.g. a Redis list element).  Returns a tuple: (obj, codec).  Raises CodecError.
+	"""
+	if isinstance(data, str):
+		return JSON.loads(data), JSON
+	if data[:1] == MSGPACK_MAGIC:
+		return MSGPACK.loads(data[1:]), MSGPACK
+	return JSON.loads(data), JSON
+
+
+def encode_message(obj, codec=JSON) -> bytes:
+	"""
+	Encode one whole message; the inverse of decode_message().
+	"""
+	if codec is MSGPACK:
+		return MSGPACK_MAGIC + MSGPACK.dumps(obj)
+	return JSON.dumps(obj)
+
+
+def encode_frame(obj, codec=JSON) -> bytes:
+	"""
+	Encode one message for a byte stream (TCP or Unix socket).
+	"""
+	if codec is MSGPACK:
+		payload = MSGPACK.dumps(obj)
+		return MSGPACK_MAGIC + _FRAME_LENGTH.pack(len(payload)) + payload
+	return JSON.dumps(obj) + b"\n"
+
+
+def split_frame(buffer: bytes) -> tuple[bytes | None, object, bytes]:
+	"""
+	Try to take one complete frame from the front of 'buffer'.
+
+	Returns a tuple: (frame, codec, remainder).  'frame' is None when more data is needed.
+	"""
+	if buffer[:1] == MSGPACK_MAGIC:
+		header_end = 1 + _FRAME_LENGTH.size
+		if len(buffer) < header_end:
+			return None, MSGPACK, buffer
+		(length,) = _FRAME_LENGTH.unpack(buffer[1:header_end])
+		if len(buffer) < header_end + length:
+			return None, MSGPACK, buffer
+		return buffer[header_end : header_end + length], MSGPACK, buffer[header_end + length :]
+
+	newline = buffer.find(b"\n")
+	if newline < 0:
+		return None, JSON, buffer
+	return buffer[:newline], JSON, buffer[newline + 1 :]
+
+
+def pending_frame_size(buffer: bytes) -> int:
+	"""
+	The total size of the (incomplete) frame at the front of 'buffer', so far as it is known.
+	"""
+	if buffer[:1] == MSGPACK_MAGIC and len(buffer) >= 1 + _FRAME_LENGTH.size:
+		return _FRAME_LENGTH.unpack(buffer[1 : 1 + _FRAME_LENGTH.size])[0]
+	return len(buffer)
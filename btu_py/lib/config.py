@@ -10,12 +10,12 @@ import toml
 import tomllib  # New in Python versions 3.11+.  Useless for writing TOML, but can read it.
 import urllib.parse
 from dataclasses import dataclass, field
+from types import MappingProxyType
 from zoneinfo import ZoneInfo
 
 from schema import And, Optional, Or, Schema
 
 from btu_py.lib.app_logger import build_new_logger
-from btu_py.lib.utils import DictToDot
 
 BASE_DIRECTORY = pathlib.Path("/etc/btu_scheduler")
 
@@ -36,6 +36,10 @@ def get_config_schema():
 			"tracing_level": And(str, len),  # INFO
 			"startup_without_database_connections": bool,
 			Optional("disable_redis_rpc"): Or(int, bool),
+			Optional("redis_rpc_transport"): And(str, lambda x: x in ("list", "stream")),
+			Optional("redis_stream_claim_idle_ms"): And(int, lambda x: x > 0),
+			Optional("redis_rpc_workers"): And(int, lambda x: x >= 1),
+			Optional("redis_rpc_batch_size"): And(int, lambda x: x >= 1),
 			Optional("disable_unix_socket"): Or(int, bool),
 			Optional("disable_tcp_socket"): Or(int, bool),
 			"sql_type": And(str, len, lambda x: x in ("mariadb", "postgres")),
@@ -48,18 +52,215 @@ def get_config_schema():
 			"rq_host": And(str, len),
 			"rq_port": int,
 			"tcp_socket_port": And(int),
+			Optional("tcp_max_clients"): And(int, lambda x: x >= 1),
+			Optional("tcp_idle_timeout_secs"): And(Or(int, float), lambda x: x > 0),
+			Optional("tcp_max_request_bytes"): And(int, lambda x: x >= 1024),
+			Optional("tcp_max_in_flight"): And(int, lambda x: x >= 1),
 			"socket_path": And(str, len),
+			Optional("unix_max_clients"): And(int, lambda x: x >= 1),
+			Optional("unix_idle_timeout_secs"): And(Or(int, float), lambda x: x > 0),
+			Optional("unix_max_request_bytes"): And(int, lambda x: x >= 1024),
+			Optional("unix_max_in_flight"): And(int, lambda x: x >= 1),
 			"socket_file_group_owner": And(str, len),
 			"webserver_ip": And(str, len),
 			"webserver_port": int,
 			"webserver_token": And(str, len),
 			Optional("webserver_host_header"): And(str, len),
 			Optional("slack_webhook_url"): And(str, len),
+			Optional("internal_queue_batch_size"): And(int, lambda x: x >= 1),
+			Optional("internal_queue_capacity"): And(int, lambda x: x >= 0),
+			Optional("refill_overlap_policy"): And(str, lambda x: x in ("skip", "merge")),
+			Optional("disable_logging_queue"): Or(int, bool),
+			Optional("scheduled_tasks_log_mode"): And(str, lambda x: x in ("full", "summary", "diff")),
+			Optional("log_item_sample_rate"): And(int, lambda x: x >= 1),
+			Optional("log_item_max_per_interval"): And(int, lambda x: x >= 0),
+			Optional("log_item_interval_secs"): And(int, lambda x: x > 0),
+			Optional("frappe_enqueue_batch_size"): And(int, lambda x: x >= 1),
+			Optional("dispatch_jitter_window_secs"): And(Or(int, float), lambda x: x >= 0),
+			Optional("dispatch_rate_limit_per_sec"): And(Or(int, float), lambda x: x >= 0),
+			Optional("dispatch_rate_burst"): And(int, lambda x: x >= 1),
+			Optional("dispatch_max_lateness_secs"): And(Or(int, float), lambda x: x >= 0),
+			Optional("dispatch_mode"): And(str, lambda x: x in ("frappe_http", "direct_rq")),
+			Optional("direct_rq_payload_ttl_secs"): And(int, lambda x: x >= 0),
+			Optional("rq_queue_prefix"): str,
+			Optional("retry_max_attempts"): And(int, lambda x: x >= 1),
+			Optional("retry_base_delay_secs"): And(Or(int, float), lambda x: x > 0),
+			Optional("retry_max_delay_secs"): And(Or(int, float), lambda x: x > 0),
+			Optional("circuit_breaker_failure_threshold"): And(int, lambda x: x >= 1),
+			Optional("circuit_breaker_reset_secs"): And(Or(int, float), lambda x: x > 0),
+			Optional("misfire_policy"): And(str, lambda x: x in ("coalesce", "skip_stale", "fire_all")),
+			Optional("misfire_grace_secs"): And(Or(int, float), lambda x: x >= 0),
+			Optional("snapshot_store"): And(str, lambda x: x in ("file", "redis", "none")),
+			Optional("snapshot_path"): And(str, len),
+			Optional("snapshot_max_age_secs"): And(int, lambda x: x > 0),
+			Optional("reconcile_interval_secs"): And(int, lambda x: x >= 0),
+			Optional("scheduled_tasks_layout"): And(str, lambda x: x in ("single", "hourly", "daily")),
+			Optional("event_loop"): And(str, lambda x: x in ("asyncio", "uvloop")),
+			Optional("executor_workers"): And(int, lambda x: x >= 1),
+			Optional("refresh_offload_workers"): And(int, lambda x: x >= 0),
+			Optional("refresh_offload_threshold"): And(int, lambda x: x >= 1),
+			Optional("sites"): And(dict, lambda x: all(isinstance(each, dict) for each in x.values())),
+			Optional("site_name"): And(str, len),  # set from the name of a [sites.<name>] table; not set by hand
+			Optional("redis_key_namespace"): And(str, len),
+			Optional("site_dispatch_concurrency"): And(int, lambda x: x >= 1),
+			Optional("lateness_window_secs"): And(int, lambda x: x > 0),
+			Optional("lateness_redis_sink"): Or(int, bool),
 		}
 	)
 	return result
 
 
+@dataclass(frozen=True, slots=True)
+class ConfigData:
+	"""
+	The validated contents of the configuration file, plus values derived from them once, when the file is read.
+	Optional keys that are absent from the file are None.
+
+	Replaced as a whole (never modified) when the configuration is reloaded, so readers always see one consistent version.
+	"""
+
+	name: str
+	environment_name: str
+	full_refresh_internal_secs: int
+	jobs_site_prefix: str
+	scheduler_polling_interval: int
+	time_zone_string: str
+	tracing_level: str
+	startup_without_database_connections: bool
+	sql_type: str
+	sql_host: str
+	sql_port: int
+	sql_database: str
+	sql_schema: str
+	sql_user: str
+	sql_password: str
+	rq_host: str
+	rq_port: int
+	tcp_socket_port: int
+	socket_path: str
+	socket_file_group_owner: str
+	webserver_ip: str
+	webserver_port: int
+	webserver_token: str
+
+	disable_redis_rpc: int | bool | None = None
+	redis_rpc_transport: str | None = None
+	redis_stream_claim_idle_ms: int | None = None
+	redis_rpc_workers: int | None = None
+	redis_rpc_batch_size: int | None = None
+	disable_unix_socket: int | bool | None = None
+	disable_tcp_socket: int | bool | None = None
+	tcp_max_clients: int | None = None
+	tcp_idle_timeout_secs: int | float | None = None
+	tcp_max_request_bytes: int | None = None
+	tcp_max_in_flight: int | None = None
+	unix_max_clients: int | None = None
+	unix_idle_timeout_secs: int | float | None = None
+	unix_max_request_bytes: int | None = None
+	unix_max_in_flight: int | None = None
+	webserver_host_header: str | None = None
+	slack_webhook_url: str | None = None
+	internal_queue_batch_size: int | None = None
+	internal_queue_capacity: int | None = None
+	refill_overlap_policy: str | None = None
+	disable_logging_queue: int | bool | None = None
+	scheduled_tasks_log_mode: str | None = None
+	log_item_sample_rate: int | None = None
+	log_item_max_per_interval: int | None = None
+	log_item_interval_secs: int | None = None
+	frappe_enqueue_batch_size: int | None = None
+	dispatch_jitter_window_secs: int | float | None = None
+	dispatch_rate_limit_per_sec: int | float | None = None
+	dispatch_rate_burst: int | None = None
+	dispatch_max_lateness_secs: int | float | None = None
+	dispatch_mode: str | None = None
+	direct_rq_payload_ttl_secs: int | None = None
+	rq_queue_prefix: str | None = None
+	retry_max_attempts: int | None = None
+	retry_base_delay_secs: int | float | None = None
+	retry_max_delay_secs: int | float | None = None
+	circuit_breaker_failure_threshold: int | None = None
+	circuit_breaker_reset_secs: int | float | None = None
+	misfire_policy: str | None = None
+	misfire_grace_secs: int | float | None = None
+	snapshot_store: str | None = None
+	snapshot_path: str | None = None
+	snapshot_max_age_secs: int | None = None
+	reconcile_interval_secs: int | None = None
+	scheduled_tasks_layout: str | None = None
+	event_loop: str | None = None
+	executor_workers: int | None = None
+	refresh_offload_workers: int | None = None
+	refresh_offload_threshold: int | None = None
+	sites: dict | None = None
+	site_name: str | None = None
+	redis_key_namespace: str | None = None
+	site_dispatch_concurrency: int | None = None
+	lateness_window_secs: int | None = None
+	lateness_redis_sink: int | bool | None = None
+
+	# Derived values (computed in __post_init__):
+	time_zone: ZoneInfo = field(init=False, repr=False, compare=False)
+	frappe_base_url: str = field(init=False, repr=False, compare=False)
+	frappe_headers: MappingProxyType = field(init=False, repr=False, compare=False)  # Authorization, and Host if needed
+	sql_connection_string: str = field(init=False, repr=False, compare=False)
+
+	def __post_init__(self):
+		if self.webserver_port == 443:
+			frappe_base_url = f"https://{self.webserver_ip}"
+		else:
+			frappe_base_url = f"http://{self.webserver_ip}:{self.webserver_port}"
+		headers = {"Authorization": self.webserver_token}
+		# If Frappe is running via gunicorn, in DNS Multi-tenancy mode, then we have to pass a "Host" header.
+		if self.webserver_host_header:
+			headers["Host"] = self.webserver_host_header
+
+		object.__setattr__(self, "time_zone", ZoneInfo(self.time_zone_string))
+		object.__setattr__(self, "frappe_base_url", frappe_base_url)
+		object.__setattr__(self, "frappe_headers", MappingProxyType(headers))
+		object.__setattr__(self, "sql_connection_string", self._build_sql_connection_string())
+
+	def _build_sql_connection_string(self) -> str:
+		"""
+		Create a connection string for the configured database type (PostgreSQL or MariaDB/MySQL).
+		"""
+		user = urllib.parse.quote(self.sql_user)
+		password = urllib.parse.quote(self.sql_password)
+		address = f"{self.sql_host}:{self.sql_port}/{self.sql_database}"
+		match self.sql_type.lower():
+			case "postgres":
+				return f"postgresql+asyncpg://{user}:{password}@{address}"  # PostgreSQL using the asyncpg driver
+			case "mariadb":
+				return f"mysql+asyncmy://{user}:{password}@{address}"  # MariaDB/MySQL using the asyncmy driver
+		raise ValueError(f"Unsupported sql_type: {self.sql_type}. Supported types: 'postgres', 'mariadb'")
+
+	@staticmethod
+	def from_dictionary(data_dictionary: dict) -> "ConfigData":
+		return ConfigData(**data_dictionary)
+
+	def get(self, key: str, default=None):
+		"""
+		Dictionary-style access, e.g. get("internal_queue_capacity", 50000).  Returns 'default' for absent keys.
+		"""
+		value = getattr(self, key, None)
+		return default if value is None else value
+
+
+def get_site_settings(data_dictionary: dict, site_name: str) -> dict:
+	"""
+	The settings of one site in multi-site mode: the top-level settings, overridden by the table [sites.<site_name>].
+	Its Redis keys are namespaced with the site's name, unless the table sets 'redis_key_namespace'.
+	"""
+	site_table = (data_dictionary.get("sites") or {}).get(site_name)
+	if site_table is None:
+		raise KeyError(f"The configuration file has no table [sites.{site_name}].")
+	settings = {key: value for key, value in data_dictionary.items() if key != "sites"}
+	settings.update(site_table)
+	settings["site_name"] = site_name
+	settings.setdefault("redis_key_namespace", site_name)
+	return settings
+
+
 def get_default_config_template():
 	# WARNING: Do not use 'None' as a value or the entire key will be left out of TOML file.
 	return {
@@ -76,13 +277,13 @@ class AppConfig:
 	"""
 
 	__logger: object
-	__sql_connection_string: str = None
 	__data_dict: dict = field(default_factory=dict)
 
 	# Dataclass attributes with Defaults:
 	__config_directory: str = copy.copy(BASE_DIRECTORY)
 	__config_file_path: pathlib.Path = BASE_DIRECTORY / "btu_scheduler.toml"
-	data: object = None  # this will end up being a list of attributes, accessible via dot notation
+	data: ConfigData = None  # the settings as attributes, plus derived values; replaced as a whole on reload
+	site_name: str | None = None  # in multi-site mode, the site whose settings these are (see btu_py/lib/sites.py)
 
 	def __init__(self):
 		self.init_config_from_files()
@@ -96,6 +297,22 @@ class AppConfig:
 		"""
 		return self.__data_dict
 
+	def site_names(self) -> list[str]:
+		"""
+		The names of the [sites.<name>] tables, in file order.  Empty unless running in multi-site mode.
+		"""
+		return list(self.as_dictionary().get("sites") or {})
+
+	def for_site(self, site_name: str) -> "AppConfig":
+		"""
+		A copy of this configuration, with the settings of one site (see get_site_settings).  Shares the logger.
+		"""
+		site_config = copy.copy(self)
+		site_config.site_name = site_name
+		site_config.__data_dict = get_site_settings(self.as_dictionary(), site_name)
+		site_config.data = ConfigData.from_dictionary(get_config_schema().validate(site_config.__data_dict))
+		return site_config
+
 	def get_config_file_path(self):
 		"""
 		Return a path to the main configuration file.
@@ -123,15 +340,47 @@ class AppConfig:
 		printer.pprint(self.as_dictionary())
 		print()  # empty line for aesthetics
 
-	def __read_configuration_from_disk(self):
+	def __load_from_disk(self) -> tuple[dict, ConfigData]:
 		"""
-		Load the main configuration file into memory.
+		Read and validate the main configuration file, without changing the current settings.
 		"""
 		with self.get_config_file_path().open(mode="rb") as fstream:
 			data_dictionary = tomllib.load(fstream)
 
 		get_config_schema().validate(data_dictionary)
-		self.__data_dict = data_dictionary
+		if self.site_name:
+			data_dictionary = get_site_settings(data_dictionary, self.site_name)
+			get_config_schema().validate(data_dictionary)
+		return data_dictionary, (ConfigData.from_dictionary(data_dictionary) if data_dictionary else None)
+
+	def __read_configuration_from_disk(self):
+		"""
+		Load the main configuration file into memory.
+		"""
+		self.__data_dict, self.data = self.__load_from_disk()
+
+	def reload(self) -> list[str] | None:
+		"""
+		Read the configuration file again (e.g. on SIGHUP).  The new settings replace the old ones in a single step.
+		If the file cannot be read or is invalid, the current settings stay, and None is returned.
+		Otherwise, returns the names of the settings that changed.
+		"""
+		try:
+			data_dictionary, data = self.__load_from_disk()
+			if not data:
+				raise ValueError("The configuration file is empty.")
+		except Exception as ex:
+			self.get_logger().error(f"Configuration was not reloaded; keeping the current settings.  Error: {ex}")
+			return None
+
+		previous = self.__data_dict
+		changed = sorted(
+			key for key in previous.keys() | data_dictionary.keys() if previous.get(key) != data_dictionary.get(key)
+		)
+		self.__data_dict, self.data = data_dictionary, data
+		if "tracing_level" in changed:
+			self.get_logger().setLevel(data.tracing_level)
+		return changed
 
 	def init_config_from_files(self):
 		"""
@@ -143,9 +392,6 @@ class AppConfig:
 				self.revert_to_defaults()
 			if not self.as_dictionary():
 				raise IOError("Failed to initialize main configuration settings.")
-
-			# Enable some dot notation, just to make code a bit cleaner
-			self.data = DictToDot(self.as_dictionary())
 		except FileNotFoundError:
 			print(
 				f"Warning: Could not read configuration file '{self.get_config_file_path()}'.  Reverting to default values."
@@ -190,30 +436,14 @@ class AppConfig:
 		Get the database type from configuration.
 		Returns 'postgres' or 'mariadb'.
 		"""
-		return self.as_dictionary()["sql_type"].lower()
+		return self.data.sql_type.lower()
 
 	def get_sql_connection_string(self):
 		"""
 		Create a connection string for the configured database type.
 		Supports PostgreSQL and MariaDB/MySQL based on sql_type configuration.
 		"""
-		if not hasattr(self, "__sql_connection_string") or (not self.__sql_connection_string):
-			user = urllib.parse.quote(self.as_dictionary()["sql_user"])
-			password = urllib.parse.quote(self.as_dictionary()["sql_password"])
-			host = self.as_dictionary()["sql_host"]
-			port = self.as_dictionary()["sql_port"]
-			database_name = self.as_dictionary()["sql_database"]
-			sql_type = self.get_sql_type()
-
-			if sql_type == "postgres":
-				# PostgreSQL connection string using asyncpg driver
-				self.__sql_connection_string = f"postgresql+asyncpg://{user}:{password}@{host}:{port}/{database_name}"
-			elif sql_type == "mariadb":
-				# MariaDB/MySQL connection string using asyncmy driver
-				self.__sql_connection_string = f"mysql+asyncmy://{user}:{password}@{host}:{port}/{database_name}"
-			else:
-				raise ValueError(f"Unsupported sql_type: {sql_type}. Supported types: 'postgres', 'mariadb'")
-		return self.__sql_connection_string
+		return self.data.sql_connection_string
 
 	def get_logger(self):
 		"""
@@ -221,11 +451,16 @@ class AppConfig:
 		"""
 		if (not hasattr(self, "_AppConfig__logger")) or (not self.__logger):
 			print("Constructing a new logger ...")
-			self.__logger = build_new_logger("btu_py", "/etc/btu_scheduler/logs/logger.log", self.data.tracing_level)
+			self.__logger = build_new_logger(
+				"btu_py",
+				"/etc/btu_scheduler/logs/logger.log",
+				self.data.tracing_level,
+				use_queue=not bool(self.as_dictionary().get("disable_logging_queue", False)),
+			)
 		return self.__logger
 
 	def timezone(self) -> ZoneInfo:
 		"""
 		Return a ZoneInfo object for the application's preferred Time Zone.
 		"""
-		return ZoneInfo(self.data.time_zone_string)
+		return self.data.time_zone
@@ -0,0 +1,90 @@
+"""btu_py/lib/control_client.py"""
+
+# A minimal client for the daemon's control protocol (TCP or Unix socket), used by CLI commands and local tooling.
+# Connections are persistent: open one ControlClient, and send as many requests as needed over it.
+
+import itertools
+import json
+import socket
+
+import btu_py
+
+
+class ControlClient:
+	"""
+	A synchronous connection to a running daemon.  Use as a context manager:
+
+		with ControlClient.unix() as client:
+			client.request("cancel_task_schedule", "TS-000003")
+	"""
+
+	def __init__(self, sock: socket.socket, description: str):
+		self.sock = sock
+		self.description = description
+		self._buffer = b""
+		self._request_ids = itertools.count(1)
+
+	@classmethod
+	def tcp(cls, host: str = "127.0.0.1", port: int | None = None, timeout: float = 10) -> "ControlClient":
+		port = port or btu_py.get_config_data().tcp_socket_port
+		return cls(socket.create_connection((host, port), timeout=timeout), f"{host}:{port}")
+
+	@classmethod
+	def unix(cls, socket_path: str | None = None, timeout: float = 10) -> "ControlClient":
+		socket_path = str(socket_path or btu_py.get_config_data().socket_path)
+		sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		sock.settimeout(timeout)
+		try:
+			sock.connect(socket_path)
+		except OSError:
+			sock.close()
+			raise
+		return cls(sock, socket_path)
+
+	def _readline(self) -> bytes:
+		while b"\n" not in self._buffer:
+			chunk = self.sock.recv(65536)
+			if not chunk:
+				raise ConnectionError(f"BTU daemon at {self.description} closed the connection without responding.")
+			self._buffer += chunk
+		line, self._buffer = self._buffer.split(b"\n", 1)
+		return line
+
+	def request(self, request_type: str, request_content=None) -> dict:
+		"""
+		Send one request, and return the decoded response.
+		"""
+		request_id = next(self._request_ids)
+		payload = {"request_type": request_type, "request_content": request_content, "request_id": request_id}
+		self.sock.sendall(json.dumps(payload).encode("utf-8") + b"\n")
+		response = json.loads(self._readline())
+		if response.get("request_id") not in (request_id, None):
+			raise RuntimeError(f"Expected a response to request {request_id}, but received {response!r}")
+		return response
+
+	def close(self) -> None:
+		self.sock.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+
+def send_tcp_request(request_type: str, request_content=None, host: str = "127.0.0.1", timeout: float = 10) -> dict:
+	"""
+	Send one JSON request to the daemon's TCP listener, and return the decoded JSON response.
+	"""
+	with ControlClient.tcp(host, timeout=timeout) as client:
+		return client.request(request_type, request_content)
+
+
+def send_unix_request(
+	request_type: str, request_content=None, socket_path: str | None = None, timeout: float = 10
+) -> dict:
+	"""
+	Send one JSON request to the daemon's Unix socket listener, and return the decoded JSON response.
+	"""
+	with ControlClient.unix(socket_path, timeout=timeout) as client:
+		return client.request(request_type, request_content)
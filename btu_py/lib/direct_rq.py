@@ -0,0 +1,166 @@
+"""btu_py/lib/direct_rq.py"""
+
+# The "direct_rq" dispatch mode: the daemon writes RQ Jobs to Redis itself, instead of asking the Frappe web server.
+#
+# An RQ Job is a hash 'rq:job:<id>' plus the <id> pushed onto the list 'rq:queue:<queue name>'.  The hash's 'data'
+# field holds the pickled function and arguments; only Frappe can produce that, so it is fetched over HTTP (the
+# 'get_pickled_task' endpoint) and cached per Task Schedule.  At dispatch time the cached payload is used, and every
+# due Job is written with a single MULTI/EXEC pipeline.  If a refresh fails, the previous payload is used anyway:
+# dispatch keeps working while the Frappe web server is slow or offline.
+#
+# Payloads missing from the cache are fetched concurrently, in the thread executor, so a batch costs about one round
+# trip and the event loop is never blocked.  Fetches go through the Frappe circuit breaker (see retry.py): while it is
+# open, stale payloads are used without waiting for a web server that is down.
+
+import asyncio
+import time
+import zlib
+from dataclasses import dataclass
+
+from btu_py import get_logger
+from btu_py.lib.btu_rq import RQJobWrapper, create_connection
+from btu_py.lib.frappe_client import get_frappe_client
+from btu_py.lib.metrics import get_metrics
+from btu_py.lib.retry import get_frappe_circuit_breaker
+from btu_py.lib.sites import per_site
+from btu_py.lib.structs import BtuTask, BtuTaskSchedule
+
+
+def _rq_job_data(payload: bytes) -> bytes:
+	"""
+	Python RQ stores the pickle zlib-compressed.  Accept either form from the web server.
+	"""
+	if payload[:1] == b"x":  # zlib header; a pickle begins with b"\x80"
+		return payload
+	return zlib.compress(payload)
+
+
+@dataclass
+class CachedPayload:
+	task_key: str
+	data: bytes  # zlib-compressed pickle, ready for the 'data' field of an RQ Job
+	timeout: int  # the Task's 'max_task_duration'
+	fetched_at: float
+
+
+class PayloadCache:
+	"""
+	Pickled payloads, keyed by Task Schedule ID.  Entries older than 'ttl_secs' are refreshed from Frappe.
+	"""
+
+	def __init__(self, ttl_secs: float = 600, clock=time.monotonic):
+		self.ttl_secs = ttl_secs
+		self.clock = clock
+		self._entries: dict[str, CachedPayload] = {}
+		metrics = get_metrics()
+		self._refreshed = metrics.counter("direct_rq_payload_refreshed_total")
+		self._stale_used = metrics.counter("direct_rq_payload_stale_used_total")
+
+	def __len__(self) -> int:
+		return len(self._entries)
+
+	def invalidate(self, task_schedule_id: str) -> None:
+		self._entries.pop(task_schedule_id, None)
+
+	def _is_fresh(self, entry: CachedPayload, task_schedule: BtuTaskSchedule) -> bool:
+		return entry.task_key == task_schedule.task_key and self.clock() - entry.fetched_at < self.ttl_secs
+
+	async def _fetch(self, task_schedule: BtuTaskSchedule) -> CachedPayload:
+		import requests
+
+		task = await BtuTask.init_from_task_key(task_schedule.task_key)
+		breaker = get_frappe_circuit_breaker()
+		if not breaker.allow():
+			raise OSError("The Frappe web server is unavailable; the circuit breaker is open.")
+		try:
+			payload = await asyncio.to_thread(
+				get_frappe_client().get_pickled_task, task_schedule.task_key, task_schedule.id
+			)
+		except (requests.ConnectionError, requests.Timeout):
+			breaker.record_failure()
+			raise
+		except Exception:
+			breaker.record_success()  # the web server answered, if only with an error
+			raise
+		breaker.record_success()
+		if not payload:
+			raise OSError(f"Frappe returned an empty payload for Task Schedule '{task_schedule.id}'")
+		return CachedPayload(task_schedule.task_key, _rq_job_data(payload), task.max_task_duration, self.clock())
+
+	async def get(self, task_schedule: BtuTaskSchedule) -> CachedPayload:
+		"""
+		Return the payload for a Task Schedule, refreshing it if needed.  Raises if there is neither a fresh nor
+		a stale payload.
+		"""
+		entry = self._entries.get(task_schedule.id)
+		if entry and self._is_fresh(entry, task_schedule):
+			return entry
+		try:
+			entry = await self._fetch(task_schedule)
+		except Exception as ex:
+			if not entry or entry.task_key != task_schedule.task_key:
+				raise
+			self._stale_used.inc()
+			get_logger().warning(
+				"Unable to refresh the pickled payload for Task Schedule '%s'; using the cached one.  Error = %s",
+				task_schedule.id,
+				ex,
+			)
+			return entry
+		self._refreshed.inc()
+		self._entries[task_schedule.id] = entry
+		return entry
+
+
+def build_rq_job(task_schedule: BtuTaskSchedule, payload: CachedPayload) -> RQJobWrapper:
+	wrapped_job = RQJobWrapper.new_with_defaults()
+	wrapped_job.description = task_schedule.task_description
+	wrapped_job.origin = task_schedule.queue_name
+	wrapped_job.data = payload.data
+	wrapped_job.timeout = payload.timeout
+	return wrapped_job
+
+
+async def enqueue_direct(task_schedules: list[BtuTaskSchedule], redis_conn=None) -> dict:
+	"""
+	Create and enqueue an RQ Job for each Task Schedule, with one Redis transaction.
+
+	Returns a dictionary keyed by Task Schedule key, like FrappeClient.enqueue_many(): {"status": "ok", "job_id": ...}
+	or {"status": "error", "error": "..."}.  A failure of the Redis transaction raises an exception instead.
+	"""
+	results = {}
+	jobs = []
+	cache = get_payload_cache()
+	payloads = await asyncio.gather(*(cache.get(each) for each in task_schedules), return_exceptions=True)
+	for each_schedule, each_payload in zip(task_schedules, payloads):
+		if isinstance(each_payload, Exception):
+			results[each_schedule.id] = {"status": "error", "error": f"No pickled payload available: {each_payload}"}
+		else:
+			jobs.append((each_schedule.id, build_rq_job(each_schedule, each_payload)))
+	if not jobs:
+		return results
+
+	redis_conn = redis_conn or create_connection(decode_responses=False)  # 'data' is binary
+	pipeline = redis_conn.pipeline(transaction=True)
+	for _, each_job in jobs:
+		each_job.save_and_enqueue(pipeline)
+	await asyncio.get_running_loop().run_in_executor(None, pipeline.execute)
+
+	for task_schedule_id, each_job in jobs:
+		get_logger().info("Enqueued Task Schedule '%s' directly as RQ Job '%s'", task_schedule_id, each_job.job_key)
+		results[task_schedule_id] = {"status": "ok", "job_id": each_job.job_key}
+	return results
+
+
+_payload_caches: dict[str | None, PayloadCache] = {}  # per site; Task keys are only unique within a site
+
+
+def get_payload_cache() -> PayloadCache:
+	"""
+	Return the site's PayloadCache (see sites.py), creating it from the application configuration on first use.
+	"""
+	import btu_py
+
+	return per_site(
+		_payload_caches, lambda: PayloadCache(ttl_secs=btu_py.get_config_data().get("direct_rq_payload_ttl_secs", 600))
+	)
@@ -0,0 +1,160 @@
+"""btu_py/lib/dispatch_pacing.py"""
+
+# Most cron expressions fire at the top of the minute, so hundreds of Task Schedules become due at the same moment.
+# The helpers below spread that burst out, without changing the times stored in Redis or shown in Frappe:
+#
+#   * Jitter:      each Task Schedule is dispatched a fixed, deterministic offset after its scheduled time.
+#                  The offset is derived from the Task Schedule ID, so the same schedule always runs at the same
+#                  offset, and different schedules are spread evenly across the window.
+#   * Rate limit:  a token bucket caps how many dispatches per second reach Frappe and the RQ workers.
+#
+# Both are bounded by 'dispatch_max_lateness_secs': a dispatch is never delayed by pacing beyond that.
+
+import asyncio
+import time
+import zlib
+
+from btu_py import get_logger
+from btu_py.lib.metrics import get_metrics
+from btu_py.lib.sites import per_site
+
+
+def jitter_offset(task_schedule_id: str, window_secs: float) -> float:
+	"""
+	A deterministic offset in the range [0, window_secs), derived from the Task Schedule ID.
+	"""
+	if window_secs <= 0:
+		return 0.0
+	window_ms = int(window_secs * 1000)
+	# crc32 rather than hash(), so offsets do not change between daemon restarts (PYTHONHASHSEED).
+	return (zlib.crc32(task_schedule_id.encode("utf-8")) % window_ms) / 1000
+
+
+class TokenBucket:
+	"""
+	Allows an average of 'rate_per_sec' operations per second, with bursts of up to 'burst' operations.
+	"""
+
+	def __init__(self, rate_per_sec: float, burst: int = 1, clock=time.monotonic):
+		if rate_per_sec <= 0:
+			raise ValueError("rate_per_sec must be greater than zero.")
+		self.rate_per_sec = float(rate_per_sec)
+		self.burst = max(1, int(burst))
+		self.clock = clock
+		self._tokens = float(self.burst)
+		self._updated = clock()
+
+	def _refill(self) -> None:
+		now = self.clock()
+		self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_per_sec)
+		self._updated = now
+
+	def seconds_until_available(self) -> float:
+		self._refill()
+		return 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate_per_sec
+
+	def try_acquire(self) -> bool:
+		self._refill()
+		if self._tokens >= 1:
+			self._tokens -= 1
+			return True
+		return False
+
+	def force_acquire(self) -> None:
+		"""
+		Take a token even if none is available; the bucket goes into debt, slowing later callers.
+		"""
+		self._refill()
+		self._tokens -= 1
+
+	async def acquire(self) -> None:
+		while not self.try_acquire():
+			await asyncio.sleep(self.seconds_until_available())
+
+
+class DispatchPacer:
+	"""
+	Decides when each due Task Schedule instance is dispatched.  See the module comments.
+	"""
+
+	def __init__(
+		self, jitter_window_secs: float = 0, rate_limit_per_sec: float = 0, burst: int = 1, max_lateness_secs: float = 60
+	):
+		self.max_lateness_secs = max(0.0, float(max_lateness_secs))
+		# Jitter alone must never push a dispatch past the lateness bound.
+		self.jitter_window_secs = min(max(0.0, float(jitter_window_secs)), self.max_lateness_secs)
+		self.bucket = TokenBucket(rate_limit_per_sec, burst) if rate_limit_per_sec > 0 else None
+		metrics = get_metrics()
+		self._deferred = metrics.counter("dispatch_deferred_by_jitter_total")
+		self._rate_limited = metrics.counter("dispatch_rate_limited_total")
+		self._bound_reached = metrics.counter("dispatch_pacing_bound_reached_total")
+
+	@property
+	def enabled(self) -> bool:
+		return bool(self.jitter_window_secs or self.bucket)
+
+	def dispatch_at(self, task_schedule_id: str, scheduled_unix: float) -> float:
+		return scheduled_unix + jitter_offset(task_schedule_id, self.jitter_window_secs)
+
+	def due(self, scheduled_tasks: list, now: float, next_poll_in_secs: float = 0) -> list:
+		"""
+		Filter RQScheduledTask instances down to those whose jittered dispatch time has arrived, earliest first.
+		The others stay in Redis, and are picked up by a later polling cycle (in 'next_poll_in_secs'), unless
+		waiting for it would exceed the lateness bound.
+		"""
+		if not self.jitter_window_secs:
+			return scheduled_tasks
+		ready = []
+		for each_task in scheduled_tasks:
+			scheduled_unix = each_task.next_execution_as_unix_timestamp
+			dispatch_at = self.dispatch_at(each_task.task_schedule_id, scheduled_unix)
+			if dispatch_at <= now or now + next_poll_in_secs > scheduled_unix + self.max_lateness_secs:
+				ready.append((dispatch_at, each_task))
+			else:
+				self._deferred.inc()
+		ready.sort(key=lambda pair: pair[0])
+		return [each_task for _, each_task in ready]
+
+	def must_wait(self) -> bool:
+		"""
+		Whether the next wait_for_turn() may have to wait for a token.
+		"""
+		return bool(self.bucket) and self.bucket.seconds_until_available() > 0
+
+	async def wait_for_turn(self, scheduled_unix: float) -> None:
+		"""
+		Wait for a rate-limit token, unless waiting would make the dispatch later than 'max_lateness_secs'.
+		"""
+		if not self.bucket or self.bucket.try_acquire():
+			return
+		self._rate_limited.inc()
+		wait_secs = self.bucket.seconds_until_available()
+		remaining_secs = scheduled_unix + self.max_lateness_secs - time.time()
+		if wait_secs > remaining_secs:
+			self._bound_reached.inc()
+			get_logger().debug("Dispatch pacing: lateness bound reached; dispatching without waiting for a token.")
+			self.bucket.force_acquire()
+			return
+		await asyncio.sleep(wait_secs)
+		self.bucket.force_acquire()
+
+
+_pacers: dict[str | None, DispatchPacer] = {}
+
+
+def get_dispatch_pacer() -> DispatchPacer:
+	"""
+	Return the site's DispatchPacer (see sites.py), creating it from the application configuration on first use.
+	"""
+	import btu_py
+
+	def new_pacer() -> DispatchPacer:
+		config_data = btu_py.get_config_data()
+		return DispatchPacer(
+			jitter_window_secs=config_data.get("dispatch_jitter_window_secs", 0),
+			rate_limit_per_sec=config_data.get("dispatch_rate_limit_per_sec", 0),
+			burst=config_data.get("dispatch_rate_burst", 10),
+			max_lateness_secs=config_data.get("dispatch_max_lateness_secs", 60),
+		)
+
+	return per_site(_pacers, new_pacer)
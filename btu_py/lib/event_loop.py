@@ -0,0 +1,124 @@
+"""btu_py/lib/event_loop.py"""
+
+# Choosing and tuning the daemon's event loop.
+#
+# Two event loops are supported:
+#   * asyncio  The standard library's loop.  The default.
+#   * uvloop   A drop-in replacement built on libuv; faster socket I/O and callbacks.  Requires the optional 'uvloop'
+#              package ("pip install btu_py[uvloop]").  If it is not installed, the daemon warns and uses asyncio.
+#
+# Blocking calls (e.g. the Redis RPC listener's BLPOP, or HTTP requests to Frappe) run in the loop's default thread
+# executor.  Its size is Python's default, min(32, CPUs + 4), unless 'executor_workers' is set.
+#
+# 'btu-py benchmark-loop' compares the loops on the daemon's own TCP control protocol, and on executor round trips.
+
+import asyncio
+import time
+
+LOOP_ASYNCIO = "asyncio"
+LOOP_UVLOOP = "uvloop"
+LOOPS = (LOOP_ASYNCIO, LOOP_UVLOOP)
+
+
+def uvloop_available() -> bool:
+	import importlib.util
+
+	return importlib.util.find_spec("uvloop") is not None
+
+
+def loop_factory(loop_name: str):
+	"""
+	The factory for an asyncio.Runner; None for the standard library's loop.
+	"""
+	if loop_name not in LOOPS:
+		raise ValueError(f"Unknown event loop '{loop_name}'; expected one of {', '.join(LOOPS)}.")
+	if loop_name == LOOP_ASYNCIO:
+		return None
+	import uvloop
+
+	return uvloop.new_event_loop
+
+
+def resolve_loop_name(requested: str | None) -> str:
+	"""
+	The event loop to use: 'requested', else the configuration's 'event_loop', else asyncio.  Falls back to asyncio,
+	with a warning, when uvloop is requested but not installed.
+	"""
+	import btu_py
+
+	loop_name = (requested or btu_py.get_config_data().get("event_loop", LOOP_ASYNCIO)).lower()
+	if loop_name == LOOP_UVLOOP and not uvloop_available():
+		btu_py.get_logger().warning("Event loop 'uvloop' was requested, but is not installed; using 'asyncio'.")
+		return LOOP_ASYNCIO
+	return loop_name
+
+
+def run(coroutine, loop_name: str = LOOP_ASYNCIO, executor_workers: int | None = None):
+	"""
+	Run 'coroutine' to completion on a new event loop, like asyncio.run().  With 'executor_workers', the loop's default
+	executor (used by run_in_executor(None, ...) and asyncio.to_thread) has that many threads.
+	"""
+	with asyncio.Runner(loop_factory=loop_factory(loop_name)) as runner:
+		if executor_workers:
+			import concurrent.futures
+
+			runner.get_loop().set_default_executor(
+				concurrent.futures.ThreadPoolExecutor(executor_workers, thread_name_prefix="btu-executor")
+			)
+		return runner.run(coroutine)
+
+
+async def _tcp_round_trips(connections: int, requests_per_connection: int) -> float:
+	"""
+	Requests per second of "ping" control requests, sent one at a time on each of several concurrent connections.
+	"""
+	from btu_py.daemon.coroutines import handle_tcp_request
+
+	server = await asyncio.start_server(handle_tcp_request, "127.0.0.1", 0)
+	port = server.sockets[0].getsockname()[1]
+	request = b'{"request_type": "ping", "request_content": null}\n'
+
+	async def client():
+		reader, writer = await asyncio.open_connection("127.0.0.1", port)
+		for _ in range(requests_per_connection):
+			writer.write(request)
+			await reader.readline()
+		writer.close()
+		await writer.wait_closed()
+
+	async with server:
+		started = time.perf_counter()
+		await asyncio.gather(*(client() for _ in range(connections)))
+		elapsed = time.perf_counter() - started
+	return connections * requests_per_connection / elapsed
+
+
+async def _executor_round_trips(concurrency: int, calls_per_task: int) -> float:
+	"""
+	Calls per second through the default executor, as made by the Redis listeners for each blocking command.
+	"""
+	loop = asyncio.get_running_loop()
+
+	async def caller():
+		for _ in range(calls_per_task):
+			await loop.run_in_executor(None, time.monotonic)
+
+	started = time.perf_counter()
+	await asyncio.gather(*(caller() for _ in range(concurrency)))
+	return concurrency * calls_per_task / (time.perf_counter() - started)
+
+
+def benchmark_loop(
+	loop_name: str, connections: int = 8, requests_per_connection: int = 1000, executor_workers: int | None = None
+) -> dict:
+	"""
+	Measure the throughput of one event loop.  Returns requests (or calls) per second, per workload.
+	"""
+
+	async def measure():
+		return {
+			"tcp_requests_per_sec": await _tcp_round_trips(connections, requests_per_connection),
+			"executor_calls_per_sec": await _executor_round_trips(connections, requests_per_connection),
+		}
+
+	return {"loop": loop_name, **run(measure(), loop_name, executor_workers)}
@@ -0,0 +1,196 @@
+"""btu_py/lib/frappe_client.py"""
+
+# HTTP client for the Frappe BTU endpoints used at dispatch time.
+#
+# When hundreds of Task Schedules are due at once (e.g. at midnight), one request per Task Schedule is expensive.
+# The bulk endpoint 'enqueue_for_next_available_workers' accepts a list of Task Schedule keys, and returns a result
+# per key.  Older versions of the Frappe BTU app do not have it; the client then falls back to one request per key,
+# and remembers not to try the bulk endpoint again for a while.
+
+import time
+
+from btu_py import get_logger
+
+ENDPOINT_ENQUEUE = "btu.btu_api.endpoints.enqueue_for_next_available_worker"
+ENDPOINT_ENQUEUE_BULK = "btu.btu_api.endpoints.enqueue_for_next_available_workers"
+ENDPOINT_PICKLED_TASK = "btu.btu_api.endpoints.get_pickled_task"
+
+# Responses meaning "no such endpoint": not found, method not allowed, not implemented.
+_UNSUPPORTED_STATUS_CODES = (404, 405, 501)
+
+
+class FrappeClient:
+	"""
+	A client for one Frappe web server.  Keeps a persistent HTTP session, so connections are reused.  Clients may share
+	a session: headers are sent with each request, so the session itself holds only the connection pool.
+	"""
+
+	def __init__(
+		self, base_url: str, headers: dict, timeout: float = 30, bulk_retry_secs: float = 3600, session=None
+	):
+		self.base_url = base_url.rstrip("/")
+		self.headers = dict(headers)
+		self.timeout = timeout
+		self.bulk_retry_secs = bulk_retry_secs  # how long to remember that the bulk endpoint is unsupported
+		self._bulk_unsupported_since: float | None = None
+		if session is None:
+			import requests  # imported here, so that importing the scheduler does not load it
+
+			session = requests.Session()
+		self._session = session
+
+	@staticmethod
+	def from_config(session=None) -> "FrappeClient":
+		import btu_py
+
+		config_data = btu_py.get_config_data()
+		return FrappeClient(config_data.frappe_base_url, config_data.frappe_headers, session=session)
+
+	def _url(self, endpoint: str) -> str:
+		return f"{self.base_url}/api/method/{endpoint}"
+
+	@staticmethod
+	def _response_json(response) -> dict:
+		try:
+			return response.json()
+		except ValueError:
+			return {"text": response.text[:500]}
+
+	@property
+	def bulk_supported(self) -> bool:
+		if self._bulk_unsupported_since is None:
+			return True
+		return time.monotonic() - self._bulk_unsupported_since > self.bulk_retry_secs
+
+	def enqueue_for_next_available_worker(self, task_schedule_key: str) -> None:
+		"""
+		Ask Frappe to immediately enqueue one Task Schedule as an RQ Job.  Raises IOError if it does not succeed.
+		"""
+		response = self._session.post(
+			url=self._url(ENDPOINT_ENQUEUE),
+			headers=self.headers | {"Content-Type": "application/json"},
+			params={"task_schedule_key": task_schedule_key},
+			timeout=self.timeout,
+		)
+		get_logger().debug(
+			"Response from Frappe to Enqueue: Status Code = %s, Data = %s",
+			response.status_code,
+			self._response_json(response),
+		)
+		if response.status_code != 200:
+			raise OSError(f"Unexpected response code from Frappe Framework web server: {self._response_json(response)}")
+		get_logger().info("Successfully enqueued Task Schedule: '%s'", task_schedule_key)
+
+	def get_pickled_task(self, task_key: str, task_schedule_id: str | None = None) -> bytes:
+		"""
+		Fetch a Task's pickled function and arguments (see direct_rq.py).  Raises OSError if it does not succeed.
+		"""
+		response = self._session.get(
+			url=self._url(ENDPOINT_PICKLED_TASK),
+			headers=self.headers | {"Content-Type": "application/octet-stream"},
+			params={"task_id": task_key, "task_schedule_id": task_schedule_id},
+			timeout=self.timeout,
+		)
+		if response.status_code != 200:
+			raise OSError(f"Unexpected response code from Frappe Framework web server: {response.status_code}")
+		# The body is JSON, with the pickle as a list of integers:  {"message": [128, 5, 149, ...]}
+		payload = bytes(self._response_json(response).get("message") or [])
+		get_logger().debug("Pickled function for Task '%s': %s bytes", task_key, len(payload))
+		return payload
+
+	def _enqueue_bulk(self, task_schedule_keys: list[str]) -> dict | None:
+		"""
+		Returns per-key results, or None if the server does not support the bulk endpoint.  Raises IOError.
+		"""
+		response = self._session.post(
+			url=self._url(ENDPOINT_ENQUEUE_BULK),
+			headers=self.headers,
+			json={"task_schedule_keys": task_schedule_keys},
+			timeout=self.timeout,
+		)
+		body = self._response_json(response)
+		if response.status_code in _UNSUPPORTED_STATUS_CODES or (
+			response.status_code >= 400 and ENDPOINT_ENQUEUE_BULK.rsplit(".", 1)[-1] in str(body)
+		):
+			return None
+		if response.status_code != 200:
+			raise OSError(f"Unexpected response code from Frappe Framework web server: {body}")
+
+		results = body.get("message")  # Frappe wraps return values in 'message'
+		if not isinstance(results, dict):
+			raise OSError(f"Unexpected response body from the bulk enqueue endpoint: {body}")
+		return {
+			each_key: results.get(each_key) or {"status": "error", "error": "No result returned for this key."}
+			for each_key in task_schedule_keys
+		}
+
+	def _enqueue_one_by_one(self, task_schedule_keys: list[str]) -> dict:
+		"""
+		Per-key results.  A connection failure or timeout is flagged with "unreachable": True, unlike an error returned
+		by Frappe, and the remaining keys are not attempted: the web server is down, and each would wait for a timeout.
+		"""
+		import requests
+
+		results = {}
+		for index, each_key in enumerate(task_schedule_keys):
+			try:
+				self.enqueue_for_next_available_worker(each_key)
+				results[each_key] = {"status": "ok"}
+			except (requests.ConnectionError, requests.Timeout) as ex:
+				for each_remaining in task_schedule_keys[index:]:
+					results[each_remaining] = {"status": "error", "error": str(ex), "unreachable": True}
+				break
+			except (OSError, requests.RequestException) as ex:
+				results[each_key] = {"status": "error", "error": str(ex)}
+		return results
+
+	def enqueue_many(self, task_schedule_keys: list[str]) -> dict:
+		"""
+		Enqueue many Task Schedules, with a single request if the server supports it.
+
+		Returns a dictionary keyed by Task Schedule key: {"status": "ok"} or {"status": "error", "error": "..."}.
+		A failure of the whole bulk request (e.g. the web server is down) raises an exception instead.  One key at a
+		time, a key the web server could not be reached for is flagged with "unreachable": True.
+		"""
+		if not task_schedule_keys:
+			return {}
+		if len(task_schedule_keys) > 1 and self.bulk_supported:
+			results = self._enqueue_bulk(task_schedule_keys)
+			if results is not None:
+				self._bulk_unsupported_since = None
+				return results
+			get_logger().warning(
+				"Frappe web server does not support '%s'; enqueuing one Task Schedule per request.",
+				ENDPOINT_ENQUEUE_BULK,
+			)
+			self._bulk_unsupported_since = time.monotonic()
+		return self._enqueue_one_by_one(task_schedule_keys)
+
+
+_frappe_clients: dict[str | None, FrappeClient] = {}  # per site (see btu_py/lib/sites.py)
+_shared_session = None  # one requests.Session, and so one connection pool, for every site
+
+
+def get_frappe_client() -> FrappeClient:
+	"""
+	Return the site's FrappeClient, creating it from the application configuration on first use.
+	A configuration reload that changes the web server's address or credentials replaces it.
+	"""
+	import btu_py
+	from btu_py.lib.sites import current_site_name
+
+	global _shared_session
+	config_data = btu_py.get_config_data()
+	site_name = current_site_name()
+	client = _frappe_clients.get(site_name)
+	if (
+		client is None
+		or client.base_url != config_data.frappe_base_url.rstrip("/")
+		or client.headers != config_data.frappe_headers
+	):
+		if _shared_session is None:
+			import requests
+
+			_shared_session = requests.Session()
+		client = _frappe_clients[site_name] = FrappeClient.from_config(_shared_session)
+	return client
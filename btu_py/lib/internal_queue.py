@@ -0,0 +1,187 @@
+"""btu_py/lib/internal_queue.py"""
+
+# The daemon's internal queue of Task Schedule IDs, waiting to be (re)written to Redis.
+#
+# A Task Schedule ID only needs to be processed once, no matter how many times it was queued while waiting:
+# the consumer always reads the latest Task Schedule from SQL.  So rather than a FIFO (asyncio.Queue), this is an
+# ordered set.  Putting an ID that is already waiting does nothing, except increment a counter.
+#
+# IDs are also queued in one of several priority lanes, so that a user's edit in Frappe is not stuck behind the
+# thousands of IDs from a periodic full refill.
+#
+# The queue has a capacity.  Only the refill lane waits for space ("back-pressure"): interactive edits and
+# reschedules are never blocked, and are bounded anyway by the number of Task Schedules.
+
+import asyncio
+
+LANE_INTERACTIVE = "interactive"  # create_task_schedule requests (TCP, Unix socket, Redis RPC)
+LANE_RESCHEDULE = "reschedule"  # calculating the next run, after a Task Schedule was dispatched
+LANE_REFILL = "refill"  # the periodic full refill
+
+LANES = (LANE_INTERACTIVE, LANE_RESCHEDULE, LANE_REFILL)  # highest priority first
+
+
+class CoalescingQueue:
+	"""
+	An ordered set of pending identifiers, with the asyncio.Queue methods used by the daemon (put, get, qsize, empty).
+
+	* get() always returns from the highest-priority lane that is not empty.
+	* Putting an identifier that is already waiting in the same (or a higher) lane is coalesced.
+	* Putting an identifier that is waiting in a lower lane promotes it.
+	* Once an identifier has been taken with get(), putting it again queues it again.
+	* When the queue holds 'capacity' identifiers or more, putting a new one in the refill lane waits for space.
+	  A capacity of 0 means unbounded.
+	"""
+
+	def __init__(self, capacity: int = 0):
+		self.capacity = max(0, int(capacity))
+		self._lanes: dict[str, dict] = {lane: {} for lane in LANES}  # dictionaries preserve insertion order
+		self._lane_of: dict = {}  # identifier --> lane it is waiting in
+		self._not_empty = asyncio.Event()
+		self._not_full = asyncio.Event()
+		self._not_full.set()
+		self.coalesced = 0  # total number of puts that found their identifier already waiting
+		self.promoted = 0  # total number of identifiers moved to a higher-priority lane
+		self.saturated = 0  # total number of refill puts that had to wait for space
+		self.high_water = 0  # the most identifiers ever waiting at once
+
+	def qsize(self) -> int:
+		return len(self._lane_of)
+
+	def empty(self) -> bool:
+		return not self._lane_of
+
+	def full(self) -> bool:
+		return bool(self.capacity) and len(self._lane_of) >= self.capacity
+
+	def __contains__(self, item) -> bool:
+		return item in self._lane_of
+
+	def lane_depths(self) -> dict[str, int]:
+		return {lane: len(pending) for lane, pending in self._lanes.items()}
+
+	def items_by_lane(self) -> dict[str, list]:
+		"""
+		The waiting identifiers in each lane, oldest first (e.g. to save them across a restart).
+		"""
+		return {lane: list(pending) for lane, pending in self._lanes.items()}
+
+	def _adds_to_full_refill_lane(self, item, lane: str) -> bool:
+		return lane == LANE_REFILL and item not in self._lane_of and self.full()
+
+	def put_nowait(self, item, lane: str = LANE_INTERACTIVE) -> bool:
+		"""
+		Add 'item' to the end of 'lane', unless it is already waiting.  Returns True if it was added or promoted.
+		Raises asyncio.QueueFull if the refill lane has no space.
+		"""
+		if lane not in self._lanes:
+			raise ValueError(f"Unknown lane '{lane}'.  Must be one of: {', '.join(LANES)}")
+		if self._adds_to_full_refill_lane(item, lane):
+			raise asyncio.QueueFull
+		current_lane = self._lane_of.get(item)
+		if current_lane is not None:
+			if LANES.index(current_lane) <= LANES.index(lane):
+				self.coalesced += 1
+				return False
+			del self._lanes[current_lane][item]
+			self.promoted += 1
+		self._lanes[lane][item] = None
+		self._lane_of[item] = lane
+		self._not_empty.set()
+		if self.full():
+			self._not_full.clear()
+		self.high_water = max(self.high_water, len(self._lane_of))
+		return True
+
+	async def put(self, item, lane: str = LANE_INTERACTIVE) -> bool:
+		"""
+		Like put_nowait(), except that a put to a full refill lane waits for space.
+		"""
+		if self._adds_to_full_refill_lane(item, lane):
+			self.saturated += 1
+			while self._adds_to_full_refill_lane(item, lane):
+				await self._not_full.wait()
+		return self.put_nowait(item, lane)
+
+	def _pop(self) -> tuple:
+		for lane, pending in self._lanes.items():
+			if pending:
+				item = next(iter(pending))
+				del pending[item]
+				del self._lane_of[item]
+				if not self._lane_of:
+					self._not_empty.clear()
+				if not self.full():
+					self._not_full.set()
+				return item, lane
+		raise asyncio.QueueEmpty
+
+	def get_nowait(self):
+		return self._pop()[0]
+
+	async def get(self):
+		"""
+		Remove and return the next item, by priority and then age.  Waits until one is available.
+		"""
+		while not self._lane_of:
+			await self._not_empty.wait()
+		return self.get_nowait()
+
+	async def get_batch(self, max_items: int, lanes: dict | None = None) -> list:
+		"""
+		Wait for at least one item, then take up to 'max_items' without waiting further.
+		If 'lanes' is given, it is filled with the lane each item was taken from (e.g. for requeue()).
+		"""
+		while not self._lane_of:
+			await self._not_empty.wait()
+		taken = {}
+		while len(taken) < max_items and self._lane_of:
+			item, lane = self._pop()
+			taken[item] = lane
+		if lanes is not None:
+			lanes.update(taken)
+		return list(taken)
+
+	def requeue(self, taken: dict) -> int:
+		"""
+		Put back items that were taken but not processed ('taken' maps each item to its lane), at the front of their
+		lanes.  Capacity is not enforced, since they were already counted in it.  Items waiting again are left where
+		they are.  Returns the number put back.
+		"""
+		requeued = 0
+		for lane in LANES:
+			items = [each for each, each_lane in taken.items() if each_lane == lane and each not in self._lane_of]
+			if items:
+				self._lanes[lane] = dict.fromkeys(items) | self._lanes[lane]
+				self._lane_of.update(dict.fromkeys(items, lane))
+				requeued += len(items)
+		if requeued:
+			self._not_empty.set()
+			if self.full():
+				self._not_full.clear()
+			self.high_water = max(self.high_water, len(self._lane_of))
+		return requeued
+
+	def publish_metrics(self, registry) -> None:
+		"""
+		Copy the queue's statistics into gauges of a MetricsRegistry (see btu_py/lib/metrics.py).
+		"""
+		registry.gauge("internal_queue_depth").set(self.qsize())
+		registry.gauge("internal_queue_capacity").set(self.capacity)
+		registry.gauge("internal_queue_high_water").set(self.high_water)
+		registry.gauge("internal_queue_coalesced_total").set(self.coalesced)
+		registry.gauge("internal_queue_promoted_total").set(self.promoted)
+		registry.gauge("internal_queue_saturated_total").set(self.saturated)
+		for lane, depth in self.lane_depths().items():
+			registry.gauge(f"internal_queue_depth_{lane}").set(depth)
+
+	def stats(self) -> dict:
+		return {
+			"depth": self.qsize(),
+			"capacity": self.capacity,
+			"lanes": self.lane_depths(),
+			"high_water": self.high_water,
+			"coalesced": self.coalesced,
+			"promoted": self.promoted,
+			"saturated": self.saturated,
+		}
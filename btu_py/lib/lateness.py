@@ -0,0 +1,266 @@
+"""btu_py/lib/lateness.py"""
+
+# NOTE: Lateness is "how long after its scheduled Unix time did BTU begin dispatching a Task Schedule Instance".
+#       Each dispatch is also split into phases (SQL read, Frappe enqueue) so a slow dispatch can be attributed
+#       to the polling interval, the SQL database, or the Frappe web server.
+
+import bisect
+import time
+from array import array
+
+from btu_py.lib.sites import per_site, site_key
+
+# Upper bounds (in seconds) of each histogram bucket.  One extra bucket catches everything larger.
+BUCKET_BOUNDS_SECS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 900, 3600)
+
+# lateness:    dispatch start minus the TSIK's scheduled Unix time (dominated by the polling interval)
+# sql:         seconds spent reading the Task Schedule from SQL
+# frappe:      seconds spent in the Frappe enqueue call
+# end_to_end:  enqueue completed minus the TSIK's scheduled Unix time
+LATENESS_METRICS = ("lateness", "sql", "frappe", "end_to_end")
+LATENESS_STATISTICS = ("max", "mean", "p50", "p95", "p99", "count")
+
+REDIS_KEY_LATENESS_WORST = "btu_scheduler:lateness:worst"
+REDIS_KEY_LATENESS_EVENTS = "btu_scheduler:lateness:events"
+
+
+class RollingHistogram:
+	"""
+	A fixed-bucket histogram covering the most recent 'window_secs' seconds.
+
+	The window is divided into slices.  Each slice owns a compact array of bucket counts, and is zeroed when
+	the window rolls back around to it, so memory stays constant regardless of how many samples are recorded.
+	"""
+
+	__slots__ = ("_counts", "_maxima", "_slice_ids", "_sums", "slice_count", "slice_secs")
+
+	def __init__(self, window_secs: int = 3600, slice_count: int = 6):
+		self.slice_count = max(1, int(slice_count))
+		self.slice_secs = max(1, int(window_secs) // self.slice_count)
+		width = len(BUCKET_BOUNDS_SECS) + 1
+		self._counts = [array("I", [0] * width) for _ in range(self.slice_count)]
+		self._sums = [0.0] * self.slice_count
+		self._maxima = [0.0] * self.slice_count
+		self._slice_ids = [-1] * self.slice_count
+
+	@property
+	def window_secs(self) -> int:
+		return self.slice_secs * self.slice_count
+
+	def record(self, value_secs: float, now: float | None = None) -> None:
+		"""
+		Add one sample to the histogram.  Negative values (clock skew) are recorded as zero.
+		"""
+		value_secs = max(0.0, float(value_secs))
+		slice_id = int((time.time() if now is None else now) // self.slice_secs)
+		index = slice_id % self.slice_count
+		if self._slice_ids[index] != slice_id:
+			# This slice holds data from a previous trip around the window; recycle it.
+			self._slice_ids[index] = slice_id
+			counts = self._counts[index]
+			for bucket in range(len(counts)):
+				counts[bucket] = 0
+			self._sums[index] = 0.0
+			self._maxima[index] = 0.0
+
+		self._counts[index][bisect.bisect_left(BUCKET_BOUNDS_SECS, value_secs)] += 1
+		self._sums[index] += value_secs
+		self._maxima[index] = max(self._maxima[index], value_secs)
+
+	def _live_slices(self, now: float | None = None) -> list[int]:
+		current_slice_id = int((time.time() if now is None else now) // self.slice_secs)
+		oldest_slice_id = current_slice_id - self.slice_count
+		return [index for index, slice_id in enumerate(self._slice_ids) if oldest_slice_id < slice_id <= current_slice_id]
+
+	def bucket_counts(self, now: float | None = None) -> list[int]:
+		totals = [0] * (len(BUCKET_BOUNDS_SECS) + 1)
+		for index in self._live_slices(now):
+			for bucket, count in enumerate(self._counts[index]):
+				totals[bucket] += count
+		return totals
+
+	def count(self, now: float | None = None) -> int:
+		return sum(sum(self._counts[index]) for index in self._live_slices(now))
+
+	def maximum(self, now: float | None = None) -> float:
+		return max((self._maxima[index] for index in self._live_slices(now)), default=0.0)
+
+	def mean(self, now: float | None = None) -> float:
+		live = self._live_slices(now)
+		samples = sum(sum(self._counts[index]) for index in live)
+		return (sum(self._sums[index] for index in live) / samples) if samples else 0.0
+
+	def percentile(self, percent: float, now: float | None = None) -> float:
+		"""
+		Return the upper bound of the bucket containing the requested percentile.
+		Values in the overflow bucket are reported as the observed maximum.
+		"""
+		totals = self.bucket_counts(now)
+		samples = sum(totals)
+		if not samples:
+			return 0.0
+		threshold = samples * (percent / 100.0)
+		running = 0
+		for bucket, count in enumerate(totals):
+			running += count
+			if running >= threshold and count:
+				if bucket < len(BUCKET_BOUNDS_SECS):
+					return min(float(BUCKET_BOUNDS_SECS[bucket]), self.maximum(now))
+				break
+		return self.maximum(now)
+
+	def statistic(self, name: str, now: float | None = None) -> float:
+		match name:
+			case "max":
+				return self.maximum(now)
+			case "mean":
+				return self.mean(now)
+			case "count":
+				return float(self.count(now))
+			case "p50" | "p95" | "p99":
+				return self.percentile(float(name[1:]), now)
+			case _:
+				raise ValueError(f"Unknown statistic '{name}'.  Must be one of: {', '.join(LATENESS_STATISTICS)}")
+
+	def summary(self, now: float | None = None) -> dict:
+		return {name: round(self.statistic(name, now), 3) for name in LATENESS_STATISTICS}
+
+
+class RedisLatenessSink:
+	"""
+	Optional sink that mirrors dispatch samples into Redis, so other processes (e.g. the CLI) can read them.
+
+	* A sorted set per metric and per window holds the worst value observed for each Task Schedule.
+	  Keys are suffixed with the window number and expire after two windows, so old data ages out by itself.
+	* A capped stream holds the most recent raw samples.
+	"""
+
+	def __init__(self, redis_conn, window_secs: int, stream_maxlen: int = 10000):
+		self.redis_conn = redis_conn
+		self.window_secs = max(1, int(window_secs))
+		self.stream_maxlen = stream_maxlen
+
+	def worst_key(self, metric: str, now: float | None = None) -> str:
+		window_number = int((time.time() if now is None else now) // self.window_secs)
+		return f"{site_key(REDIS_KEY_LATENESS_WORST)}:{metric}:{window_number}"
+
+	def publish(self, task_schedule_id: str, samples: dict, now: float | None = None) -> None:
+		pipeline = self.redis_conn.pipeline(transaction=False)
+		for metric, value_secs in samples.items():
+			key = self.worst_key(metric, now)
+			pipeline.zadd(key, {task_schedule_id: round(value_secs, 3)}, gt=True)
+			pipeline.expire(key, self.window_secs * 2)
+		fields = {metric: f"{value_secs:.3f}" for metric, value_secs in samples.items()}
+		fields["task_schedule_id"] = task_schedule_id
+		pipeline.xadd(site_key(REDIS_KEY_LATENESS_EVENTS), fields, maxlen=self.stream_maxlen, approximate=True)
+		pipeline.execute()
+
+	def worst_offenders(self, metric: str = "lateness", limit: int = 10, now: float | None = None) -> list[dict]:
+		"""
+		Merge the current and previous windows, returning the highest values first.
+		"""
+		now = time.time() if now is None else now
+		merged: dict[str, float] = {}
+		for key in (self.worst_key(metric, now), self.worst_key(metric, now - self.window_secs)):
+			for member, score in self.redis_conn.zrevrange(key, 0, limit - 1, withscores=True):
+				member = member.decode() if isinstance(member, bytes) else member
+				merged[member] = max(score, merged.get(member, 0.0))
+		ranked = sorted(merged.items(), key=lambda pair: pair[1], reverse=True)[:limit]
+		return [{"task_schedule_id": each_id, metric: {"max": score}} for each_id, score in ranked]
+
+
+class LatenessTracker:
+	"""
+	Per-schedule rolling histograms for dispatch lateness and its component phases.
+	"""
+
+	def __init__(self, window_secs: int = 3600, sink: RedisLatenessSink = None):
+		self.window_secs = int(window_secs)
+		self.sink = sink
+		self._histograms: dict[str, dict[str, RollingHistogram]] = {}
+
+	def _histogram(self, task_schedule_id: str, metric: str) -> RollingHistogram:
+		if metric not in LATENESS_METRICS:
+			raise ValueError(f"Unknown lateness metric '{metric}'.  Must be one of: {', '.join(LATENESS_METRICS)}")
+		per_schedule = self._histograms.setdefault(task_schedule_id, {})
+		if metric not in per_schedule:
+			per_schedule[metric] = RollingHistogram(self.window_secs)
+		return per_schedule[metric]
+
+	def record(self, task_schedule_id: str, metric: str, value_secs: float, now: float | None = None) -> None:
+		self._histogram(task_schedule_id, metric).record(value_secs, now)
+
+	def record_dispatch(
+		self,
+		task_schedule_id: str,
+		scheduled_unix_time: int,
+		dispatch_started: float,
+		sql_secs: float,
+		frappe_secs: float,
+		enqueued_at: float,
+	) -> dict:
+		"""
+		Record every phase of a single successful dispatch.  Timestamps are Unix times (time.time()).
+		"""
+		samples = {
+			"lateness": dispatch_started - scheduled_unix_time,
+			"sql": sql_secs,
+			"frappe": frappe_secs,
+			"end_to_end": enqueued_at - scheduled_unix_time,
+		}
+		for metric, value_secs in samples.items():
+			self.record(task_schedule_id, metric, value_secs, enqueued_at)
+		if self.sink:
+			self.sink.publish(task_schedule_id, samples, enqueued_at)
+		return samples
+
+	def forget(self, task_schedule_id: str) -> None:
+		self._histograms.pop(task_schedule_id, None)
+
+	def worst_offenders(
+		self, metric: str = "lateness", statistic: str = "p95", limit: int = 10, now: float | None = None
+	) -> list[dict]:
+		"""
+		Return the Task Schedules with the highest value of 'statistic' for 'metric', highest first.
+		Each entry also includes a summary of every metric, to help attribute the delay.
+		"""
+		ranked = []
+		for task_schedule_id, per_schedule in self._histograms.items():
+			histogram = per_schedule.get(metric)
+			if not histogram or not histogram.count(now):
+				continue
+			ranked.append((histogram.statistic(statistic, now), task_schedule_id))
+		ranked.sort(reverse=True)
+
+		return [
+			{
+				"task_schedule_id": task_schedule_id,
+				**{
+					each_metric: each_histogram.summary(now)
+					for each_metric, each_histogram in self._histograms[task_schedule_id].items()
+				},
+			}
+			for _, task_schedule_id in ranked[:limit]
+		]
+
+
+_lateness_trackers: dict[str | None, LatenessTracker] = {}
+
+
+def get_lateness_tracker() -> LatenessTracker:
+	"""
+	Return the site's LatenessTracker (see sites.py), creating it from the application configuration on first use.
+	"""
+	import btu_py
+
+	def new_tracker() -> LatenessTracker:
+		config_data = btu_py.get_config_data()
+		window_secs = int(config_data.get("lateness_window_secs", 3600))
+		sink = None
+		if config_data.get("lateness_redis_sink", False):
+			from btu_py.lib.btu_rq import create_connection
+
+			sink = RedisLatenessSink(create_connection(), window_secs)
+		return LatenessTracker(window_secs, sink)
+
+	return per_site(_lateness_trackers, new_tracker)
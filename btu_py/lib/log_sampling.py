@@ -0,0 +1,171 @@
+"""btu_py/lib/log_sampling.py"""
+
+# NOTE: With thousands of Task Schedules, "one log line per item" produces thousands of lines every refresh.
+#       The helpers below keep the logs useful by summarizing each cycle, and sampling the per-item chatter.
+
+import logging
+import time
+
+SCHEDULED_TASKS_LOG_MODES = ("full", "summary", "diff")
+
+
+class SampledLogger:
+	"""
+	Rate-limits a stream of similar log messages.
+
+	* Only 1 of every 'sample_rate' messages is considered for writing.
+	* At most 'max_per_interval' messages are written per 'interval_secs'.
+	* When an interval ends, a single line reports how many messages were suppressed.
+	"""
+
+	def __init__(self, get_logger, sample_rate: int = 1, max_per_interval: int = 50, interval_secs: float = 30):
+		self.get_logger = get_logger  # a callable, so the logger is resolved lazily
+		self.sample_rate = max(1, int(sample_rate))
+		self.max_per_interval = max(0, int(max_per_interval))
+		self.interval_secs = float(interval_secs)
+		self._interval_started = time.monotonic()
+		self._seen = 0
+		self._written = 0
+		self._suppressed = 0
+
+	def _roll_interval(self, logger, level: int, now: float) -> None:
+		if now - self._interval_started < self.interval_secs:
+			return
+		if self._suppressed:
+			logger.log(
+				level,
+				"(%s similar messages suppressed in the last %s seconds)",
+				self._suppressed,
+				int(now - self._interval_started),
+			)
+		self._interval_started = now
+		self._written = 0
+		self._suppressed = 0
+
+	def log(self, level: int, msg: str, *args) -> bool:
+		"""
+		Write the message if sampling and rate limits allow.  Returns True if it was written.
+		"""
+		logger = self.get_logger()
+		if not logger.isEnabledFor(level):
+			return False
+		self._roll_interval(logger, level, time.monotonic())
+		self._seen += 1
+		if (self._seen - 1) % self.sample_rate or self._written >= self.max_per_interval:
+			self._suppressed += 1
+			return False
+		self._written += 1
+		logger.log(level, msg, *args)
+		return True
+
+	def debug(self, msg: str, *args) -> bool:
+		return self.log(logging.DEBUG, msg, *args)
+
+	def info(self, msg: str, *args) -> bool:
+		return self.log(logging.INFO, msg, *args)
+
+
+def summarize_scheduled_tasks(tasks: list, previous: dict | None) -> tuple[dict, dict]:
+	"""
+	Summarize a listing of RQScheduledTask, comparing against the snapshot from the previous cycle.
+
+	Returns a tuple: (summary, snapshot).  The snapshot maps each Task Schedule ID to its next Unix time,
+	and should be passed back in as 'previous' on the next cycle.
+	"""
+	snapshot: dict[str, int] = {}
+	for each_task in tasks:
+		# A schedule can have more than one pending instance; track the earliest.
+		current = snapshot.get(each_task.task_schedule_id)
+		if current is None or each_task.next_execution_as_unix_timestamp < current:
+			snapshot[each_task.task_schedule_id] = each_task.next_execution_as_unix_timestamp
+
+	summary = {
+		"count": len(tasks),
+		"schedules": len(snapshot),
+		"min_next_run": min(snapshot.values(), default=None),
+		"max_next_run": max(snapshot.values(), default=None),
+		"added": [],
+		"removed": [],
+		"changed": [],
+	}
+	if previous is not None:
+		summary["added"] = sorted(set(snapshot) - set(previous))
+		summary["removed"] = sorted(set(previous) - set(snapshot))
+		summary["changed"] = sorted(
+			each_id for each_id in set(snapshot) & set(previous) if snapshot[each_id] != previous[each_id]
+		)
+	return summary, snapshot
+
+
+class ScheduledTaskListingLogger:
+	"""
+	Logs the contents of the scheduled-task sorted set once per cycle, in one of three modes:
+
+	* full:     one line per scheduled task (the original behavior).
+	* summary:  one line per cycle with counts, the earliest and latest next run, and the number of changes.
+	* diff:     the summary line, plus one (rate-limited) line per schedule that was added, removed or changed.
+	"""
+
+	def __init__(self, get_logger, mode: str = "summary", item_logger: SampledLogger = None):
+		if mode not in SCHEDULED_TASKS_LOG_MODES:
+			raise ValueError(f"Unknown mode '{mode}'.  Must be one of: {', '.join(SCHEDULED_TASKS_LOG_MODES)}")
+		self.get_logger = get_logger
+		self.mode = mode
+		self.item_logger = item_logger or SampledLogger(get_logger)
+		self._previous: dict | None = None
+
+	def log_cycle(self, tasks: list, format_time=str) -> dict:
+		"""
+		Log one cycle's listing.  'format_time' converts a Unix time into display text (e.g. local time).
+		"""
+		logger = self.get_logger()
+		summary, self._previous = summarize_scheduled_tasks(tasks, self._previous)
+		if not logger.isEnabledFor(logging.INFO):
+			return summary
+
+		if self.mode == "full":
+			for each_task in sorted(tasks, key=lambda x: x.task_schedule_id):
+				logger.info(
+					"Task Schedule %s is scheduled to occur later at %s",
+					each_task.task_schedule_id,
+					format_time(each_task.next_execution_as_unix_timestamp),
+				)
+			return summary
+
+		logger.info(
+			"Scheduled tasks: %s instances across %s schedules; next run %s, last run %s; "
+			"%s added, %s removed, %s changed since the last cycle.",
+			summary["count"],
+			summary["schedules"],
+			format_time(summary["min_next_run"]) if summary["min_next_run"] is not None else "n/a",
+			format_time(summary["max_next_run"]) if summary["max_next_run"] is not None else "n/a",
+			len(summary["added"]),
+			len(summary["removed"]),
+			len(summary["changed"]),
+		)
+		if self.mode == "diff":
+			for change in ("added", "removed", "changed"):
+				for each_id in summary[change]:
+					next_run = self._previous.get(each_id)
+					self.item_logger.info(
+						"Task Schedule %s %s; next run %s",
+						each_id,
+						change,
+						format_time(next_run) if next_run is not None else "n/a",
+					)
+		return summary
+
+
+def new_item_logger_from_config() -> SampledLogger:
+	"""
+	Construct a SampledLogger for per-item messages, using the application configuration.
+	"""
+	import btu_py
+
+	config_data = btu_py.get_config_data()
+	return SampledLogger(
+		btu_py.get_logger,
+		sample_rate=config_data.get("log_item_sample_rate", 1),
+		max_per_interval=config_data.get("log_item_max_per_interval", 50),
+		interval_secs=config_data.get("log_item_interval_secs", 30),
+	)
@@ -0,0 +1,72 @@
+"""btu_py/lib/metrics.py"""
+
+# A small in-process registry of counters and gauges.  Values are reported by the "status" control request.
+
+import threading
+
+
+class Counter:
+	__slots__ = ("description", "name", "value")
+
+	def __init__(self, name: str, description: str = ""):
+		self.name = name
+		self.description = description
+		self.value = 0
+
+	def inc(self, amount: int = 1) -> None:
+		self.value += amount
+
+
+class Gauge:
+	__slots__ = ("description", "name", "value")
+
+	def __init__(self, name: str, description: str = ""):
+		self.name = name
+		self.description = description
+		self.value = 0
+
+	def set(self, value) -> None:
+		self.value = value
+
+	def set_max(self, value) -> None:
+		"""
+		Keep the highest value seen (a high-water mark).
+		"""
+		self.value = max(self.value, value)
+
+
+class MetricsRegistry:
+
+	def __init__(self):
+		self._metrics: dict[str, Counter | Gauge] = {}
+		self._lock = threading.Lock()
+
+	def _get_or_create(self, metric_class, name: str, description: str):
+		metric = self._metrics.get(name)
+		if metric is None:
+			with self._lock:
+				metric = self._metrics.setdefault(name, metric_class(name, description))
+		if not isinstance(metric, metric_class):
+			raise TypeError(f"Metric '{name}' is a {type(metric).__name__}, not a {metric_class.__name__}.")
+		return metric
+
+	def counter(self, name: str, description: str = "") -> Counter:
+		return self._get_or_create(Counter, name, description)
+
+	def gauge(self, name: str, description: str = "") -> Gauge:
+		return self._get_or_create(Gauge, name, description)
+
+	def snapshot(self) -> dict:
+		return {name: metric.value for name, metric in sorted(self._metrics.items())}
+
+
+_registries: dict[str | None, MetricsRegistry] = {}
+
+
+def get_metrics() -> MetricsRegistry:
+	"""
+	Return the site's metrics (see btu_py/lib/sites.py).
+	"""
+	from btu_py.lib.sites import per_site
+
+	return per_site(_registries, MetricsRegistry)
@@ -0,0 +1,51 @@
+"""btu_py/lib/misfire.py"""
+
+# What to do with Task Schedule instances that were missed while the daemon (or Redis) was down.
+#
+# After an outage, every overdue instance is due at once, and one Task Schedule may have many of them (e.g. a job that
+# runs every minute, after an hour of downtime).  Before dispatching, the overdue instances are grouped per Task
+# Schedule, and one of these policies ('misfire_policy') is applied:
+#
+#   * coalesce (default):  run once; only the most recent instance is dispatched.
+#   * skip_stale:          instances more than 'misfire_grace_secs' late are not dispatched at all.
+#   * fire_all:            every instance is dispatched (the behavior before misfire policies existed).
+#
+# Instances that are not dispatched are removed from Redis by the caller.
+
+from btu_py.lib.metrics import get_metrics
+
+MISFIRE_COALESCE = "coalesce"
+MISFIRE_SKIP_STALE = "skip_stale"
+MISFIRE_FIRE_ALL = "fire_all"
+
+MISFIRE_POLICIES = (MISFIRE_COALESCE, MISFIRE_SKIP_STALE, MISFIRE_FIRE_ALL)
+
+
+def apply_misfire_policy(
+	scheduled_tasks: list, now: float, policy: str = MISFIRE_COALESCE, grace_secs: float = 300
+) -> tuple[list, list]:
+	"""
+	Split due RQScheduledTask instances into (to dispatch, to discard).  The order of those dispatched is preserved.
+	"""
+	if policy not in MISFIRE_POLICIES:
+		raise ValueError(f"Unknown misfire policy '{policy}'.  Must be one of: {', '.join(MISFIRE_POLICIES)}")
+	if policy == MISFIRE_FIRE_ALL:
+		return list(scheduled_tasks), []
+
+	if policy == MISFIRE_SKIP_STALE:
+		keep = [each for each in scheduled_tasks if now - each.next_execution_as_unix_timestamp <= grace_secs]
+	else:
+		latest = {}  # Task Schedule ID --> its most recent instance
+		for each in scheduled_tasks:
+			current = latest.get(each.task_schedule_id)
+			if current is None or each.next_execution_as_unix_timestamp > current.next_execution_as_unix_timestamp:
+				latest[each.task_schedule_id] = each
+		keep_ids = {id(each) for each in latest.values()}
+		keep = [each for each in scheduled_tasks if id(each) in keep_ids]
+
+	kept_ids = {id(each) for each in keep}
+	discard = [each for each in scheduled_tasks if id(each) not in kept_ids]
+	if discard:
+		counter = "misfire_skipped_total" if policy == MISFIRE_SKIP_STALE else "misfire_coalesced_total"
+		get_metrics().counter(counter).inc(len(discard))
+	return keep, discard
@@ -0,0 +1,196 @@
+"""btu_py/lib/reconcile.py"""
+
+# Reconciling the scheduled-tasks sorted set with SQL.
+#
+# TSIKs are only ever added by refills, and only removed when they are dispatched or a cancel request arrives.  So a
+# Task Schedule that is disabled or deleted in SQL, or whose cron string changes, leaves entries behind.  A
+# reconciliation pass streams the enabled Task Schedules from SQL and the members of the sorted set from Redis,
+# compares them in memory, and repairs the differences with pipelined ZREM and ZADD commands:
+#
+#   * orphans: TSIKs of Task Schedules that are no longer enabled (also removed from the retry set),
+#   * stale:   future TSIKs of enabled Task Schedules that are not their next execution time (e.g. the cron changed),
+#   * missing: enabled Task Schedules with no TSIK at all.
+#
+# TSIKs that are due (or will be by the next polling cycle) are left alone; the dispatch loop handles those.
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+
+import btu_py
+from btu_py import get_logger
+from btu_py.lib.btu_rq import create_connection
+from btu_py.lib.metrics import get_metrics
+from btu_py.lib.refresh_offload import next_execution_epochs
+from btu_py.lib.retry import RQ_KEY_RETRY_ATTEMPTS, RQ_KEY_RETRY_TASKS
+from btu_py.lib.scheduler import TSIK, _next_rq_scheduled_task
+from btu_py.lib.sites import site_key
+from btu_py.lib.sql import iterate_enabled_task_schedule_rows
+from btu_py.lib.structs import BtuTaskSchedule
+from btu_py.lib.task_store import SCAN_COUNT, get_scheduled_task_store
+
+PIPELINE_CHUNK_SIZE = 1000  # members per ZREM or ZADD command
+EXPECTED_BATCH_SIZE = 500  # Task Schedules per batch of next execution calculations
+
+
+@dataclass
+class ReconcileReport:
+	enabled_schedules: int = 0
+	scanned: int = 0  # members of the scheduled-tasks sorted set
+	orphans: int = 0
+	stale: int = 0
+	missing: int = 0
+	retry_orphans: int = 0  # members of the retry set, for Task Schedules that are no longer enabled
+	dry_run: bool = False
+	elapsed_secs: float = 0.0
+	orphan_ids: set[str] = field(default_factory=set, repr=False)
+	to_remove: list[str] = field(default_factory=list, repr=False)
+	retry_to_remove: list[str] = field(default_factory=list, repr=False)
+	to_add: dict[str, int] = field(default_factory=dict, repr=False)
+
+	def as_dictionary(self) -> dict:
+		return {
+			"enabled_schedules": self.enabled_schedules,
+			"scanned": self.scanned,
+			"orphans": self.orphans,
+			"stale": self.stale,
+			"missing": self.missing,
+			"retry_orphans": self.retry_orphans,
+			"dry_run": self.dry_run,
+			"elapsed_secs": round(self.elapsed_secs, 3),
+		}
+
+
+def diff_scheduled_tasks(expected: dict, members, retry_members, not_before: float) -> ReconcileReport:
+	"""
+	Compare the sorted sets with SQL.
+
+		expected:       enabled Task Schedule ID --> (TSIK of its next execution, Unix time), or None if unknown
+		members:        (TSIK, score) pairs of the scheduled-tasks sorted set
+		retry_members:  TSIKs of the retry set
+		not_before:     members scored at or before this Unix time are due; they are never stale
+
+	Returns a report of the counts, and the changes that would repair them.
+	"""
+	report = ReconcileReport(enabled_schedules=len(expected))
+	present = set()
+	stale_ids = set()
+	for each_tsik, score in members:
+		report.scanned += 1
+		task_schedule_id = TSIK(each_tsik).task_schedule_id()
+		if task_schedule_id not in expected:
+			report.orphans += 1
+			report.orphan_ids.add(task_schedule_id)
+			report.to_remove.append(each_tsik)
+		elif score <= not_before or expected[task_schedule_id] is None or expected[task_schedule_id][0] == each_tsik:
+			present.add(task_schedule_id)
+		else:
+			report.stale += 1
+			stale_ids.add(task_schedule_id)
+			report.to_remove.append(each_tsik)
+
+	for each_tsik in retry_members:
+		task_schedule_id = TSIK(each_tsik).task_schedule_id()
+		if task_schedule_id not in expected:
+			report.retry_orphans += 1
+			report.orphan_ids.add(task_schedule_id)
+			report.retry_to_remove.append(each_tsik)
+
+	# Add the next execution of every Task Schedule left without one: either its TSIKs were stale, or it had none.
+	for task_schedule_id, next_execution in expected.items():
+		if task_schedule_id not in present and next_execution is not None:
+			report.to_add[next_execution[0]] = next_execution[1]
+			if task_schedule_id not in stale_ids:
+				report.missing += 1
+	return report
+
+
+async def _expected_next_executions() -> dict:
+	"""
+	Stream the enabled Task Schedules from SQL, and calculate each one's next execution.
+	"""
+	expected = {}
+	batch = []
+	async for each_row in iterate_enabled_task_schedule_rows():
+		batch.append(BtuTaskSchedule.from_sql_row(each_row))
+		if len(batch) >= EXPECTED_BATCH_SIZE:
+			await _calculate_next_executions(batch, expected)
+			batch = []
+	await _calculate_next_executions(batch, expected)
+	return expected
+
+
+async def _calculate_next_executions(task_schedules: list[BtuTaskSchedule], expected: dict) -> None:
+	# Offloaded to a pool of workers, if configured (see refresh_offload.py).
+	next_executions = await next_execution_epochs(task_schedules)
+	for task_schedule in task_schedules:
+		try:
+			rq_scheduled_task = _next_rq_scheduled_task(task_schedule, next_executions.get(task_schedule.id))
+		except Exception as ex:
+			get_logger().warning("Reconcile: cannot calculate the next execution of %s: %s", task_schedule.id, ex)
+			rq_scheduled_task = None
+		expected[task_schedule.id] = (
+			(rq_scheduled_task.to_tsik(), rq_scheduled_task.next_execution_as_unix_timestamp)
+			if rq_scheduled_task
+			else None
+		)
+	await asyncio.sleep(0)  # cron calculations are CPU-bound; let other coroutines run
+
+
+def _apply(redis_conn, report: ReconcileReport) -> None:
+	store = get_scheduled_task_store()
+	pipeline = redis_conn.pipeline(transaction=False)
+	for start in range(0, len(report.to_remove), PIPELINE_CHUNK_SIZE):
+		store.remove_many(pipeline, report.to_remove[start : start + PIPELINE_CHUNK_SIZE])
+	for start in range(0, len(report.retry_to_remove), PIPELINE_CHUNK_SIZE):
+		chunk = report.retry_to_remove[start : start + PIPELINE_CHUNK_SIZE]
+		pipeline.zrem(site_key(RQ_KEY_RETRY_TASKS), *chunk)
+		pipeline.hdel(site_key(RQ_KEY_RETRY_ATTEMPTS), *chunk)
+	pipeline.execute()
+	members = list(report.to_add.items())
+	for start in range(0, len(members), PIPELINE_CHUNK_SIZE):
+		store.add(redis_conn, dict(members[start : start + PIPELINE_CHUNK_SIZE]), nx=True)
+
+
+async def reconcile_scheduled_tasks(dry_run: bool = False) -> ReconcileReport:
+	"""
+	Run one reconciliation pass.  With 'dry_run', the differences are counted but Redis is not modified.
+	"""
+	started = time.perf_counter()
+	# Calculate next executions first: a member scored before 'not_before' may be dispatched while this pass runs.
+	expected = await _expected_next_executions()
+	not_before = time.time() + btu_py.get_config_data().scheduler_polling_interval
+
+	redis_conn = create_connection()
+	members = get_scheduled_task_store().scan(redis_conn)
+	retry_key = site_key(RQ_KEY_RETRY_TASKS)
+	retry_members = (each_tsik for each_tsik, _ in redis_conn.zscan_iter(retry_key, count=SCAN_COUNT))
+	report = diff_scheduled_tasks(expected, members, retry_members, not_before)
+	report.dry_run = dry_run
+	if not dry_run and (report.to_remove or report.retry_to_remove or report.to_add):
+		_apply(redis_conn, report)
+	report.elapsed_secs = time.perf_counter() - started
+
+	if not dry_run:
+		metrics = get_metrics()
+		metrics.counter("reconcile_runs_total", "Reconciliation passes").inc()
+		metrics.counter("reconcile_orphans_removed_total", "TSIKs removed; no longer enabled").inc(
+			report.orphans + report.retry_orphans
+		)
+		metrics.counter("reconcile_stale_removed_total", "TSIKs removed; not the next execution").inc(report.stale)
+		metrics.counter("reconcile_missing_added_total", "TSIKs added for Task Schedules without one").inc(
+			report.missing
+		)
+	get_logger().info(
+		"Reconcile%s: %s enabled Task Schedules, %s scheduled instances; %s orphans, %s stale, %s missing, "
+		"%s orphaned retries (%.3f secs).",
+		" (dry run)" if dry_run else "",
+		report.enabled_schedules,
+		report.scanned,
+		report.orphans,
+		report.stale,
+		report.missing,
+		report.retry_orphans,
+		report.elapsed_secs,
+	)
+	return report
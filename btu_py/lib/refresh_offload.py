@@ -0,0 +1,132 @@
+"""btu_py/lib/refresh_offload.py"""
+
+# Calculating next execution times outside the event loop.
+#
+# A full refill calculates the next execution of every enabled Task Schedule.  croniter is pure Python, so on a large
+# catalog that is seconds of CPU on the event loop's thread: control requests wait for their responses, and due
+# instances wait to be dispatched.
+#
+# With 'refresh_offload_workers' set, batches of at least 'refresh_offload_threshold' Task Schedules are calculated
+# by a pool of worker processes instead (or of threads, on a free-threaded build of Python, where threads run in
+# parallel).  Each worker receives compact inputs, (cron string, time zone name, anchor Unix time), and returns an
+# array of Unix times.  Smaller batches are calculated inline, where a round trip to a worker would cost more than
+# it saves.
+#
+# A worker reports a Task Schedule it cannot calculate as NO_EPOCH; the caller then calculates it inline, so errors
+# are reported exactly as before.
+
+import asyncio
+import sys
+import time
+from array import array
+from zoneinfo import ZoneInfo
+
+import btu_py
+from btu_py.lib.metrics import get_metrics
+
+NO_EPOCH = -1  # no future execution, or the calculation failed
+
+_executor = None  # shared by every site; created on first use
+
+
+def next_epochs(jobs: list[tuple[str, str, int]]) -> array:
+	"""
+	The next execution, as a Unix time, of each (cron string, time zone name, anchor Unix time).  Runs in a worker.
+	"""
+	from datetime import datetime as DateTimeType
+
+	from btu_py.lib.btu_cron import tz_cron_to_utc_datetimes
+
+	utc_zone = ZoneInfo("UTC")
+	results = array("q")
+	for cron_string, time_zone_name, anchor in jobs:
+		try:
+			next_runtimes = tz_cron_to_utc_datetimes(
+				cron_string, time_zone_name, DateTimeType.fromtimestamp(anchor, tz=utc_zone), 1
+			)
+			results.append(int(next_runtimes[0].timestamp()) if next_runtimes else NO_EPOCH)
+		except Exception:
+			results.append(NO_EPOCH)
+	return results
+
+
+def free_threaded() -> bool:
+	"""
+	True on a free-threaded build of Python (3.13+) running without the GIL.
+	"""
+	is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+	return is_gil_enabled is not None and not is_gil_enabled()
+
+
+def get_executor():
+	"""
+	Return the process-wide pool of workers, creating it on first use; None if offloading is disabled.
+	"""
+	global _executor
+	workers = int(btu_py.get_config_data().get("refresh_offload_workers", 0))
+	if workers <= 0:
+		return None
+	if _executor is None:
+		import concurrent.futures
+		import multiprocessing
+
+		if free_threaded():
+			_executor = concurrent.futures.ThreadPoolExecutor(workers, thread_name_prefix="btu-refresh")
+		else:
+			# 'spawn', not 'fork': forking a process that is running an event loop and threads is not safe.
+			_executor = concurrent.futures.ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+		btu_py.get_logger().info(
+			"Calculating next execution times with %s worker %s.", workers, "threads" if free_threaded() else "processes"
+		)
+	return _executor
+
+
+def shutdown() -> None:
+	global _executor
+	if _executor is not None:
+		_executor.shutdown(wait=False, cancel_futures=True)
+		_executor = None
+
+
+def _time_zone_name(cron_timezone, default: ZoneInfo) -> str:
+	if isinstance(cron_timezone, ZoneInfo):
+		return cron_timezone.key
+	return cron_timezone or default.key
+
+
+async def next_execution_epochs(task_schedules: list) -> dict[str, int]:
+	"""
+	Calculate the next executions of a batch of Task Schedules in the pool of workers, if the batch is large enough.
+	Returns Task Schedule ID --> Unix time; Task Schedules that are absent should be calculated inline.
+	"""
+	config_data = btu_py.get_config_data()
+	threshold = max(1, int(config_data.get("refresh_offload_threshold", 50)))
+	if len(task_schedules) < threshold:
+		return {}
+	executor = get_executor()
+	if executor is None:
+		return {}
+	workers = int(config_data.get("refresh_offload_workers", 1))
+
+	anchor = int(time.time())
+	jobs = [
+		(each.cron_string, _time_zone_name(each.cron_timezone, config_data.time_zone), anchor) for each in task_schedules
+	]
+	chunk_size = -(-len(jobs) // workers)  # one chunk per worker
+	loop = asyncio.get_running_loop()
+	try:
+		chunks = await asyncio.gather(
+			*(
+				loop.run_in_executor(executor, next_epochs, jobs[start : start + chunk_size])
+				for start in range(0, len(jobs), chunk_size)
+			)
+		)
+	except Exception as ex:
+		btu_py.get_logger().warning("Refresh offload failed; calculating %s Task Schedules inline: %s", len(jobs), ex)
+		return {}
+	get_metrics().counter("refresh_offload_batches_total", "Batches of next execution times calculated by workers").inc()
+
+	epochs = [each_epoch for each_chunk in chunks for each_epoch in each_chunk]
+	return {
+		each.id: each_epoch for each, each_epoch in zip(task_schedules, epochs, strict=True) if each_epoch != NO_EPOCH
+	}
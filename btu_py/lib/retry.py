@@ -0,0 +1,186 @@
+"""btu_py/lib/retry.py"""
+
+# Retrying failed dispatches, without retrying them on every polling cycle.
+#
+# When a due Task Schedule instance (TSIK) cannot be enqueued, it is moved from the scheduled-tasks sorted set to a
+# retry sorted set, scored by the time of its next attempt.  The delay doubles after each failure, up to a maximum.
+# After 'retry_max_attempts' failures the TSIK is moved to a dead-letter sorted set instead, for an operator to
+# examine.  Either way, the Task Schedule itself is rescheduled forward, so later runs are not held up.
+#
+# The circuit breaker stops the dispatch loop from calling a Frappe web server that is down: after
+# 'circuit_breaker_failure_threshold' consecutive failed requests it "opens", and no requests are made for
+# 'circuit_breaker_reset_secs'.  Then a single trial request is allowed ("half-open"); its outcome closes the
+# breaker, or opens it again.  If no outcome is recorded within another 'circuit_breaker_reset_secs', another trial
+# is allowed, so a lost trial cannot leave the breaker half-open forever.
+
+import time
+from dataclasses import dataclass
+
+from btu_py import get_logger
+from btu_py.lib.metrics import get_metrics
+from btu_py.lib.sites import per_site, site_key
+
+RQ_KEY_RETRY_TASKS = "btu_scheduler:retry_times"  # TSIK --> Unix time of the next attempt
+RQ_KEY_RETRY_ATTEMPTS = "btu_scheduler:retry_attempts"  # hash of TSIK --> number of failed attempts
+RQ_KEY_DEAD_LETTER = "btu_scheduler:dead_letter"  # TSIK --> Unix time it was given up on
+# In multi-site mode, each key is prefixed with the site's namespace (see sites.py).
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+	max_attempts: int = 5
+	base_delay_secs: float = 30
+	max_delay_secs: float = 3600
+
+	@staticmethod
+	def from_config() -> "RetryPolicy":
+		import btu_py
+
+		config_data = btu_py.get_config_data()
+		return RetryPolicy(
+			max_attempts=config_data.get("retry_max_attempts", 5),
+			base_delay_secs=config_data.get("retry_base_delay_secs", 30),
+			max_delay_secs=config_data.get("retry_max_delay_secs", 3600),
+		)
+
+	def delay_for(self, attempt: int) -> float:
+		"""
+		Seconds to wait after failed attempt number 'attempt' (1, 2, ...): base, 2 x base, 4 x base, ... up to the maximum.
+		"""
+		return min(self.max_delay_secs, self.base_delay_secs * 2 ** (max(1, attempt) - 1))
+
+
+def schedule_retries(redis_conn, tsiks: list[str], scheduled_tasks, policy: RetryPolicy, now: float) -> dict:
+	"""
+	Record a failed attempt for each TSIK, and move it out of the 'scheduled_tasks' store (see task_store.py) into the
+	retry or dead-letter set.
+
+	Returns a dictionary of TSIK --> ("retry", Unix time of the next attempt) or ("dead", number of attempts).
+	"""
+	if not tsiks:
+		return {}
+	pipeline = redis_conn.pipeline(transaction=False)
+	for each_tsik in tsiks:
+		pipeline.hincrby(site_key(RQ_KEY_RETRY_ATTEMPTS), each_tsik, 1)
+	attempts = pipeline.execute()
+
+	outcomes = {}
+	pipeline = redis_conn.pipeline(transaction=True)
+	for each_tsik, attempt in zip(tsiks, attempts):
+		scheduled_tasks.remove(pipeline, each_tsik)
+		if attempt >= policy.max_attempts:
+			pipeline.zrem(site_key(RQ_KEY_RETRY_TASKS), each_tsik)
+			pipeline.hdel(site_key(RQ_KEY_RETRY_ATTEMPTS), each_tsik)
+			pipeline.zadd(site_key(RQ_KEY_DEAD_LETTER), {each_tsik: int(now)})
+			outcomes[each_tsik] = ("dead", attempt)
+		else:
+			retry_at = int(now + policy.delay_for(attempt))
+			pipeline.zadd(site_key(RQ_KEY_RETRY_TASKS), {each_tsik: retry_at})
+			outcomes[each_tsik] = ("retry", retry_at)
+	pipeline.execute()
+
+	metrics = get_metrics()
+	dead = sum(1 for outcome, _ in outcomes.values() if outcome == "dead")
+	metrics.counter("dispatch_retry_scheduled_total").inc(len(outcomes) - dead)
+	metrics.counter("dispatch_dead_lettered_total").inc(dead)
+	return outcomes
+
+
+def clear_retry_state(pipeline, tsik: str) -> None:
+	"""
+	Add commands to 'pipeline' that forget a TSIK's retry state, after it was dispatched successfully.
+	"""
+	pipeline.zrem(site_key(RQ_KEY_RETRY_TASKS), tsik)
+	pipeline.hdel(site_key(RQ_KEY_RETRY_ATTEMPTS), tsik)
+
+
+def fetch_retries_due(redis_conn, before_unix_time: float) -> list[str]:
+	return redis_conn.zrangebyscore(site_key(RQ_KEY_RETRY_TASKS), 0, before_unix_time)
+
+
+class CircuitBreaker:
+	"""
+	Counts consecutive failures of an external dependency.  See the module comments.
+	"""
+
+	CLOSED = "closed"
+	OPEN = "open"
+	HALF_OPEN = "half_open"
+
+	def __init__(self, name: str, failure_threshold: int = 5, reset_secs: float = 60, clock=time.monotonic):
+		self.name = name
+		self.failure_threshold = max(1, int(failure_threshold))
+		self.reset_secs = reset_secs
+		self.clock = clock
+		self.state = self.CLOSED
+		self.consecutive_failures = 0
+		self._opened_at = 0.0
+		self._trial_started_at = 0.0
+		metrics = get_metrics()
+		self._opened = metrics.counter(f"circuit_breaker_{name}_opened_total")
+		self._rejected = metrics.counter(f"circuit_breaker_{name}_rejected_total")
+		self._is_open = metrics.gauge(f"circuit_breaker_{name}_open")
+
+	def allow(self) -> bool:
+		"""
+		Whether a request may be made now.  After the reset period, allows exactly one trial request; and another one
+		if the trial's outcome was not recorded within the reset period.
+		"""
+		if self.state == self.CLOSED:
+			return True
+		since = self._opened_at if self.state == self.OPEN else self._trial_started_at
+		if self.clock() - since >= self.reset_secs:
+			if self.state == self.HALF_OPEN:
+				get_logger().warning(
+					"Circuit breaker '%s': the trial request recorded no outcome in %s seconds.",
+					self.name,
+					self.reset_secs,
+				)
+			self.state = self.HALF_OPEN
+			self._trial_started_at = self.clock()
+			get_logger().info("Circuit breaker '%s' is half-open; allowing a trial request.", self.name)
+			return True
+		self._rejected.inc()
+		return False
+
+	def record_success(self) -> None:
+		if self.state != self.CLOSED:
+			get_logger().info("Circuit breaker '%s' is closed; requests resume.", self.name)
+		self.state = self.CLOSED
+		self.consecutive_failures = 0
+		self._is_open.set(0)
+
+	def record_failure(self) -> None:
+		self.consecutive_failures += 1
+		if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+			if self.state != self.OPEN:
+				self._opened.inc()
+				get_logger().warning(
+					"Circuit breaker '%s' is open after %s consecutive failures; no requests for %s seconds.",
+					self.name,
+					self.consecutive_failures,
+					self.reset_secs,
+				)
+			self.state = self.OPEN
+			self._opened_at = self.clock()
+			self._is_open.set(1)
+
+
+_frappe_breakers: dict[str | None, CircuitBreaker] = {}
+
+
+def get_frappe_circuit_breaker() -> CircuitBreaker:
+	"""
+	Return the site's Frappe CircuitBreaker (see sites.py), creating it from the application configuration on first use.
+	"""
+	import btu_py
+
+	def new_breaker() -> CircuitBreaker:
+		config_data = btu_py.get_config_data()
+		return CircuitBreaker(
+			"frappe",
+			failure_threshold=config_data.get("circuit_breaker_failure_threshold", 5),
+			reset_secs=config_data.get("circuit_breaker_reset_secs", 60),
+		)
+
+	return per_site(_frappe_breakers, new_breaker)
@@ -1,5 +1,8 @@
 """btu_py/lib/scheduler.py"""
 
+import asyncio
+import logging
+import time
 from dataclasses import dataclass
 from datetime import datetime as DateTimeType
 from zoneinfo import ZoneInfo
@@ -7,13 +10,31 @@ from zoneinfo import ZoneInfo
 import btu_py
 from btu_py import get_logger
 from btu_py.lib.btu_rq import create_connection
+from btu_py.lib.direct_rq import enqueue_direct
+from btu_py.lib.dispatch_pacing import get_dispatch_pacer
+from btu_py.lib.frappe_client import get_frappe_client
+from btu_py.lib.internal_queue import LANE_REFILL, LANE_RESCHEDULE
+from btu_py.lib.lateness import get_lateness_tracker
+from btu_py.lib.log_sampling import ScheduledTaskListingLogger, new_item_logger_from_config
+from btu_py.lib.misfire import apply_misfire_policy
+from btu_py.lib.refresh_offload import next_execution_epochs
+from btu_py.lib.retry import (
+	RQ_KEY_RETRY_ATTEMPTS,
+	RQ_KEY_RETRY_TASKS,
+	RetryPolicy,
+	clear_retry_state,
+	fetch_retries_due,
+	get_frappe_circuit_breaker,
+	schedule_retries,
+)
+from btu_py.lib.sites import dispatch_turn, per_site, site_key
 from btu_py.lib.sql import get_enabled_task_schedules
 from btu_py.lib.structs import BtuTaskSchedule
+from btu_py.lib.task_store import get_scheduled_task_store
 
 # static RQ_SCHEDULER_NAMESPACE_PREFIX: &'static str = "rq:scheduler_instance:";
 # static RQ_KEY_SCHEDULER: &'static str = "rq:scheduler";
 # static RQ_KEY_SCHEDULER_LOCK: &'static str = "rq:scheduler_lock";
-RQ_KEY_SCHEDULED_TASKS = "btu_scheduler:task_execution_times"
 
 
 @dataclass
@@ -95,7 +116,24 @@ class RQScheduledTask:
 		return self.next_execution_as_datetime_utc.astimezone(btu_py.get_config().timezone())
 
 
-def add_task_schedule_to_rq(task_schedule: BtuTaskSchedule):
+def _next_rq_scheduled_task(task_schedule: BtuTaskSchedule, next_execution: int | None = None) -> RQScheduledTask | None:
+	"""
+	Calculate the next execution of a Task Schedule; returns None if the cron expression yields no future runs.
+	A 'next_execution' (Unix time) already calculated by a worker (see refresh_offload.py) is used as it is.
+	"""
+	if next_execution is not None:
+		return RQScheduledTask.from_tuple(task_schedule.id, next_execution)
+	next_runtimes: list[DateTimeType] = task_schedule.get_next_runtimes()
+	if not next_runtimes:
+		return None
+	return RQScheduledTask(
+		task_schedule_id=task_schedule.id,
+		next_execution_as_unix_timestamp=int(next_runtimes[0].timestamp()),  # force into an Integer
+		next_execution_as_datetime_utc=next_runtimes[0],
+	)
+
+
+def add_task_schedule_to_rq(task_schedule: BtuTaskSchedule, next_execution: int | None = None):
 	"""
 	Developer Notes:
 
@@ -135,14 +173,9 @@ def add_task_schedule_to_rq(task_schedule: BtuTaskSchedule):
 	# Notice the line below: Only retrieving the 1st value from the result vector.  Later, it might be helpful to fetch
 	# multiple Next Execution Times, because of time zone shifts around Daylight Savings.
 
-	next_runtimes: list[DateTimeType] = task_schedule.get_next_runtimes()
-	if not next_runtimes:
+	rq_scheduled_task = _next_rq_scheduled_task(task_schedule, next_execution)
+	if not rq_scheduled_task:
 		return []
-	rq_scheduled_task: RQScheduledTask = RQScheduledTask(
-		task_schedule_id=task_schedule.id,
-		next_execution_as_unix_timestamp=int(next_runtimes[0].timestamp()),  # force into an Integer
-		next_execution_as_datetime_utc=next_runtimes[0],
-	)
 
 	# print(f"Next Execution Time UTC: {rq_scheduled_task.next_execution_as_datetime_utc}")
 	# print(f"Next Execution Timestamp: {rq_scheduled_task.next_execution_as_unix_timestamp}")
@@ -157,28 +190,30 @@ def add_task_schedule_to_rq(task_schedule: BtuTaskSchedule):
 
 	# NOTE:  The response from zadd is the number of records added.  Value 0 means the record already existed, and no write was necessary.
 
-	members_added = redis_conn.zadd(
-		RQ_KEY_SCHEDULED_TASKS,
+	members_added = get_scheduled_task_store().add(
+		redis_conn,
 		{rq_scheduled_task.to_tsik(): rq_scheduled_task.next_execution_as_unix_timestamp},
 	)
 
-	if members_added > 0:
-		messages = []
-		messages.append(f"add_task_schedule_to_rq() : The response from 'zadd' = {members_added}")
-		messages.append(f"Task Schedule ID {task_schedule.id} is being monitored for future execution.")
-		messages.append(
-			f"Next Execution Time (UTC) for Task Schedule {task_schedule.id} = {rq_scheduled_task.next_execution_as_datetime_utc}"
+	# This function runs once per Task Schedule on every refill; only build these messages when DEBUG is enabled.
+	logger = get_logger()
+	if members_added > 0 and logger.isEnabledFor(logging.DEBUG):
+		logger.debug("add_task_schedule_to_rq() : The response from 'zadd' = %s", members_added)
+		logger.debug("Task Schedule ID %s is being monitored for future execution.", task_schedule.id)
+		logger.debug(
+			"Next Execution Time (UTC) for Task Schedule %s = %s",
+			task_schedule.id,
+			rq_scheduled_task.next_execution_as_datetime_utc,
 		)
 		# If application configuration has a good Time Zone string, print Next Execution Time in local time...
-		if btu_py.get_config().timezone():
-			next_execution_time_local = rq_scheduled_task.next_execution_as_datetime_utc.astimezone(
-				btu_py.get_config().timezone()
-			)
-			messages.append(
-				f"Next Execution Time ({btu_py.get_config().timezone()}) for Task Schedule {task_schedule.id} = {next_execution_time_local}"
+		local_timezone = btu_py.get_config().timezone()
+		if local_timezone:
+			logger.debug(
+				"Next Execution Time (%s) for Task Schedule %s = %s",
+				local_timezone,
+				task_schedule.id,
+				rq_scheduled_task.next_execution_as_datetime_utc.astimezone(local_timezone),
 			)
-		for each_message in messages:
-			get_logger().debug(each_message)
 
 	# NOTE: At the conclusion of this function, if you examined the Redis database:
 	#   1.  "Score" is the Next Execution Time (as a Unix timestamp)
@@ -186,6 +221,52 @@ def add_task_schedule_to_rq(task_schedule: BtuTaskSchedule):
 	#   3.  This particular Task Schedule would not have an actual Python RQ Job yet.
 
 
+async def rq_create_scheduled_tasks(task_schedule_ids: list[str]) -> dict:
+	"""
+	Bulk version of the internal queue's work: read many Task Schedules with one SQL query, calculate
+	their next execution times, and write them all to Redis with a single ZADD.
+
+	Returns a dictionary of per-identifier results, e.g.
+		{"TS-000001": {"status": "ok", "next_execution_utc": "2025-03-22 16:00:00+00:00"},
+		 "TS-000002": {"status": "error", "error": "Task Schedule not found."}}
+	"""
+	task_schedules = await BtuTaskSchedule.init_from_schedule_keys(task_schedule_ids)
+	next_executions = await next_execution_epochs([each for each in task_schedules.values() if each.enabled])
+	results: dict[str, dict] = {}
+	members: dict[str, int] = {}
+
+	for each_id in task_schedule_ids:
+		task_schedule = task_schedules.get(each_id)
+		if not task_schedule:
+			results[each_id] = {"status": "error", "error": "Task Schedule not found."}
+			continue
+		if not task_schedule.enabled:
+			results[each_id] = {"status": "error", "error": "Task Schedule is disabled."}
+			continue
+		try:
+			rq_scheduled_task = _next_rq_scheduled_task(task_schedule, next_executions.get(each_id))
+		except Exception as ex:
+			results[each_id] = {"status": "error", "error": f"Unable to calculate next execution time: {ex}"}
+			continue
+		if not rq_scheduled_task:
+			results[each_id] = {"status": "error", "error": "Cron expression has no future execution times."}
+			continue
+		members[rq_scheduled_task.to_tsik()] = rq_scheduled_task.next_execution_as_unix_timestamp
+		results[each_id] = {
+			"status": "ok",
+			"next_execution_utc": str(rq_scheduled_task.next_execution_as_datetime_utc),
+		}
+
+	if members:
+		get_scheduled_task_store().add(create_connection(), members)
+	get_logger().info(
+		"rq_create_scheduled_tasks() : scheduled %s of %s Task Schedules with a single write.",
+		len(members),
+		len(task_schedule_ids),
+	)
+	return results
+
+
 def fetch_task_schedules_ready_for_rq(sched_before_unix_time: int) -> list:
 	"""
 	Read the BTU section of RQ, and return the Jobs that are scheduled to execute before a specific Unix Timestamp.
@@ -208,12 +289,12 @@ def fetch_task_schedules_ready_for_rq(sched_before_unix_time: int) -> list:
 
 	# TODO: As per Redis 6.2.0, the command 'zrangebyscore' is considered deprecated.
 	# Please prefer using the ZRANGE command with the BYSCORE argument in new code.
-	zranges: list = redis_conn.zrangebyscore(RQ_KEY_SCHEDULED_TASKS, 0, sched_before_unix_time)
+	zranges: list = get_scheduled_task_store().due(redis_conn, sched_before_unix_time)
 	if not zranges:
 		return []
 
 	if len(zranges) > 0:
-		get_logger().info(f"Found {len(zranges)} Task Schedules that qualify for immediate execution.")
+		get_logger().info("Found %s Task Schedules that qualify for immediate execution.", len(zranges))
 
 	# The strings in the vector are a concatenation:  Task Schedule ID, pipe character, Unix Time.
 	# Need to split off the trailing Unix Time, to obtain a list of Task Schedules.
@@ -224,6 +305,48 @@ def fetch_task_schedules_ready_for_rq(sched_before_unix_time: int) -> list:
 	return task_schedules_to_enqueue
 
 
+async def discard_misfires(scheduled_tasks: list, now: float, internal_queue: object) -> list:
+	"""
+	Apply the configured misfire policy (see misfire.py) to due Task Schedule instances.  Removes the discarded
+	instances from Redis, and returns the ones to dispatch.
+	"""
+	config_data = btu_py.get_config_data()
+	policy = config_data.get("misfire_policy", "coalesce")
+	keep, discard = apply_misfire_policy(scheduled_tasks, now, policy, config_data.get("misfire_grace_secs", 300))
+	if not discard:
+		return keep
+
+	get_logger().warning(
+		"Misfire policy '%s': discarding %s overdue Task Schedule instances, dispatching %s.",
+		policy,
+		len(discard),
+		len(keep),
+	)
+	pipeline = create_connection().pipeline(transaction=False)
+	get_scheduled_task_store().remove_many(pipeline, [str(each_instance.to_tsik()) for each_instance in discard])
+	pipeline.execute()
+
+	# A Task Schedule with nothing left to dispatch still needs its next run calculated.
+	kept_ids = {each.task_schedule_id for each in keep}
+	for each_id in dict.fromkeys(each.task_schedule_id for each in discard):
+		if each_id not in kept_ids:
+			await internal_queue.put(each_id, lane=LANE_RESCHEDULE)
+	return keep
+
+
+def fetch_retries_ready_for_rq(sched_before_unix_time: int) -> list:
+	"""
+	Return the previously-failed Task Schedule instances whose next attempt is due (see retry.py).
+	"""
+	redis_conn = create_connection()
+	if not redis_conn:
+		return []
+	zranges: list = fetch_retries_due(redis_conn, sched_before_unix_time)
+	if zranges:
+		get_logger().info("Found %s failed Task Schedule instances that are due for another attempt.", len(zranges))
+	return [RQScheduledTask.from_tsik(TSIK(each)) for each in zranges]
+
+
 async def check_and_run_eligible_task_schedules(internal_queue: object):
 	"""
 	Examine the Next Execution Time for all scheduled RQ Jobs (this information is stored in RQ as a Unix timestamps)
@@ -235,77 +358,243 @@ async def check_and_run_eligible_task_schedules(internal_queue: object):
 	# get_logger().info(f"Current Timestamp (UTC) is {current_timestamp}")
 
 	# Developer Note: This function is analgous to the 'rq-scheduler' Python function: 'Scheduler.enqueue_jobs()'
-	for task_schedule_instance in fetch_task_schedules_ready_for_rq(current_timestamp):
-		await run_immediate_scheduled_task(task_schedule_instance, internal_queue)
+	# Optional pacing (see dispatch_pacing.py) may defer some instances to a later cycle, and limit the dispatch rate.
+	pacer = get_dispatch_pacer()
+	ready_for_rq = fetch_task_schedules_ready_for_rq(current_timestamp)
+	ready_for_rq = await discard_misfires(ready_for_rq, current_timestamp, internal_queue)
+	ready_for_rq += fetch_retries_ready_for_rq(current_timestamp)
+	get_scheduled_task_store().prune(create_connection(), current_timestamp)  # bucketed layouts: drop empty buckets
+	polling_interval = btu_py.get_config_data().scheduler_polling_interval
+	batch_size = max(1, int(btu_py.get_config_data().get("frappe_enqueue_batch_size", 100)))
+	batch = []
+	for task_schedule_instance in pacer.due(ready_for_rq, current_timestamp, polling_interval):
+		# Instances that already have their tokens are dispatched before waiting for the next one; otherwise they
+		# would wait for the whole batch to fill, undoing the rate limit and the lateness bound.
+		if batch and pacer.must_wait():
+			await _dispatch_batch(batch, internal_queue)
+			batch = []
+		await pacer.wait_for_turn(task_schedule_instance.next_execution_as_unix_timestamp)
+		batch.append(task_schedule_instance)
+		if len(batch) >= batch_size:
+			await _dispatch_batch(batch, internal_queue)
+			batch = []
+	if batch:
+		await _dispatch_batch(batch, internal_queue)
+
+
+async def _dispatch_batch(batch: list[RQScheduledTask], internal_queue: object):
+	async with dispatch_turn():  # multi-site mode: sites take turns, one batch at a time
+		await run_immediate_scheduled_tasks(batch, internal_queue)
 
 
 async def run_immediate_scheduled_task(task_schedule_instance: RQScheduledTask, internal_queue: object):
 	"""
 	Create a Python RQ Task and assign to a Queue, so the next available worker can run it.
 	"""
-	get_logger().info(
-		f">>>>> Time To Make The Donuts! (enqueuing Redis Job '{task_schedule_instance.task_schedule_id}' for immediate execution)"
-	)
+	await run_immediate_scheduled_tasks([task_schedule_instance], internal_queue)
+
+
+async def run_immediate_scheduled_tasks(task_schedule_instances: list[RQScheduledTask], internal_queue: object):
+	"""
+	Create Python RQ Tasks for many due Task Schedule instances, and assign them to Queues.
+
+	The Task Schedules are read with a single SQL query, and enqueued with a single request to the Frappe web server
+	(when it supports the bulk endpoint; see frappe_client.py), or with a single Redis transaction ('dispatch_mode'
+	= "direct_rq").  Instances that cannot be enqueued are retried later, with exponential backoff (see retry.py).
+	"""
+	dispatch_started = time.time()  # compared against each TSIK's Unix time to measure lateness
+	use_frappe = btu_py.get_config_data().get("dispatch_mode", "frappe_http") != "direct_rq"
+	for each_instance in task_schedule_instances:
+		get_logger().info(
+			">>>>> Time To Make The Donuts! (enqueuing Redis Job '%s' for immediate execution)",
+			each_instance.task_schedule_id,
+		)
 	redis_conn = create_connection()
 	if not redis_conn:
 		get_logger().error(
-			"Early exit from run_immediate_scheduled_task(); cannot establish a connection to Redis database."
+			"Early exit from run_immediate_scheduled_tasks(); cannot establish a connection to Redis database."
 		)
 		return  # If cannot connect to Redis, do not panic the thread.  Instead, return an empty Vector.
 
-	# 1. Read the SQL database to construct a BTU Task Schedule struct.
+	# 1. Read the SQL database to construct BTU Task Schedule structs.
+	sql_started = time.perf_counter()
 	try:
-		task_schedule = await BtuTaskSchedule.init_from_schedule_key(task_schedule_instance.task_schedule_id)
+		task_schedules = await BtuTaskSchedule.init_from_schedule_keys(
+			[each.task_schedule_id for each in task_schedule_instances]
+		)
+		sql_secs = time.perf_counter() - sql_started
 	except Exception as ex:
-		get_logger().error(f"Unable to read Task Schedule from the SQL database. Error = {ex}")
+		get_logger().error(f"Unable to read Task Schedules from the SQL database. Error = {ex}")
 		return
 
-	if not task_schedule:
-		get_logger().error(
-			f"Unable to read a BTU Task Schedule '{task_schedule_instance.task_schedule_id}' from SQL database."
-		)
+	dispatchable = []
+	for each_instance in task_schedule_instances:
+		task_schedule = task_schedules.get(each_instance.task_schedule_id)
+		if not task_schedule:
+			get_logger().error(
+				f"Unable to read a BTU Task Schedule '{each_instance.task_schedule_id}' from SQL database."
+			)
+		# 2. Skip the Task Schedule if disabled (this should be a rare scenario, but definitely worth checking.)
+		elif not task_schedule.enabled:
+			get_logger().warning(
+				f"Task Schedule {task_schedule.id} is disabled in SQL database; BTU will neither execute nor re-queue."
+			)
+		else:
+			dispatchable.append(each_instance)
+	if not dispatchable:
 		return
 
-	# 2. Exit early if the Task Schedule is disabled (this should be a rare scenario, but definitely worth checking.)
-	if not task_schedule.enabled:
-		get_logger().warning(
-			f"Task Schedule {task_schedule.id} is disabled in SQL database; BTU will neither execute nor re-queue."
-		)
+	# Asked only now, when there is something to send: a half-open breaker's single trial must record an outcome.
+	breaker = get_frappe_circuit_breaker()
+	if use_frappe and not breaker.allow():
+		get_logger().debug("Circuit breaker is open; leaving %s due Task Schedule instances in Redis.", len(dispatchable))
 		return
 
-	try:
-		task_schedule.enqueue_for_next_available_worker()
-	except Exception as ex:
-		get_logger().error(f"Error while attempting to queue job for execution: {ex}")
+	# 3. Enqueue them: either ask Frappe (blocking HTTP, so it runs in a thread executor), or write the RQ Jobs
+	#    directly to Redis from cached payloads (see direct_rq.py).
+	#    Under the "fire_all" misfire policy, every overdue instance of a Task Schedule is enqueued; otherwise
+	#    instances of the same Task Schedule share one enqueue.
+	frappe_started = time.perf_counter()
+	fire_all = btu_py.get_config_data().get("misfire_policy", "coalesce") == "fire_all"
+	results_by_instance: dict[int, dict] = {}  # id(instance) --> result
+	for each_round in _enqueue_rounds(dispatchable, one_per_instance=fire_all):
+		unique_keys = list(dict.fromkeys(each.task_schedule_id for each in each_round))
+		try:
+			if use_frappe:
+				results = await asyncio.to_thread(get_frappe_client().enqueue_many, unique_keys)
+			else:
+				results = await enqueue_direct([task_schedules[each_key] for each_key in unique_keys])
+		except Exception as ex:
+			get_logger().error(f"Error while attempting to queue jobs for execution: {ex}")
+			if use_frappe:
+				breaker.record_failure()
+			if not results_by_instance:
+				await _retry_later(redis_conn, dispatchable, internal_queue)
+				return
+			break  # instances of the earlier rounds were enqueued; the others are retried below
+		for each_instance in each_round:
+			results_by_instance[id(each_instance)] = results.get(each_instance.task_schedule_id, {})
+	frappe_secs = time.perf_counter() - frappe_started
+	if use_frappe and len(results_by_instance) == len(dispatchable):
+		# Errors returned by Frappe are per Task Schedule; only an unreachable web server counts against the breaker.
+		if any(each.get("unreachable") for each in results_by_instance.values()):
+			breaker.record_failure()
+		else:
+			breaker.record_success()
+
+	enqueued = []
+	failed = []
+	for each_instance in dispatchable:
+		result = results_by_instance.get(id(each_instance), {"status": "error", "error": "Not attempted."})
+		if result.get("status") != "ok":
+			get_logger().error(
+				"Error while attempting to queue Task Schedule %s for execution: %s",
+				each_instance.task_schedule_id,
+				result.get("error", result),
+			)
+			failed.append(each_instance)
+			continue
+		enqueued.append(each_instance)
+		try:
+			get_lateness_tracker().record_dispatch(
+				each_instance.task_schedule_id,
+				each_instance.next_execution_as_unix_timestamp,
+				dispatch_started,
+				sql_secs,
+				frappe_secs,
+				time.time(),
+			)
+		except Exception as ex:
+			# Never let bookkeeping interfere with dispatch.
+			get_logger().warning(
+				f"Unable to record dispatch lateness for Task Schedule {each_instance.task_schedule_id}: {ex}"
+			)
+	await _retry_later(redis_conn, failed, internal_queue)
+	if not enqueued:
 		return
 
-	# IMPORTANT: Remove this Task from the BTU Schedule Key (so it doesn't accidentally get executed twice)
-	redis_result = redis_conn.zrem(RQ_KEY_SCHEDULED_TASKS, str(task_schedule_instance.to_tsik()))
-	if redis_result != 1:
-		get_logger().error(
-			f"Unable to remove Task Schedule Instance using 'zrem'.  Response from Redis = {redis_result}"
+	# IMPORTANT: Remove these Tasks from the BTU Schedule Key (so they don't accidentally get executed twice)
+	# A retried instance is in the retry set instead; remove it there, and forget its failed attempts.
+	pipeline = redis_conn.pipeline(transaction=False)
+	store = get_scheduled_task_store()
+	for each_instance in enqueued:
+		store.remove(pipeline, str(each_instance.to_tsik()))
+		clear_retry_state(pipeline, str(each_instance.to_tsik()))
+	redis_results = pipeline.execute()
+	for index, each_instance in enumerate(enqueued):
+		redis_result = redis_results[3 * index] + redis_results[3 * index + 1]  # ZREM from either sorted set
+		if redis_result != 1:
+			get_logger().error(
+				f"Unable to remove Task Schedule Instance {each_instance.to_tsik()} using 'zrem'.  "
+				f"Response from Redis = {redis_result}"
+			)
+			continue
+
+		# Finally, recalculate the next Run Time.
+		# Easy enough; just push the Task Schedule ID back into the -Internal- Queue!
+		# It will get processed automatically during the next thread cycle.
+		await internal_queue.put(each_instance.task_schedule_id, lane=LANE_RESCHEDULE)
+
+
+def _enqueue_rounds(instances: list[RQScheduledTask], one_per_instance: bool) -> list[list[RQScheduledTask]]:
+	"""
+	Split instances into rounds of enqueue requests.  With 'one_per_instance', the Nth instance of each Task Schedule
+	goes into round N, so no round holds a Task Schedule twice; otherwise there is a single round.
+	"""
+	if not one_per_instance:
+		return [instances]
+	rounds: list[list[RQScheduledTask]] = []
+	counts: dict[str, int] = {}
+	for each_instance in instances:
+		index = counts.get(each_instance.task_schedule_id, 0)
+		counts[each_instance.task_schedule_id] = index + 1
+		if index == len(rounds):
+			rounds.append([])
+		rounds[index].append(each_instance)
+	return rounds
+
+
+async def _retry_later(redis_conn, failed_instances: list[RQScheduledTask], internal_queue: object):
+	"""
+	Move Task Schedule instances that could not be enqueued to the retry (or dead-letter) set, and reschedule their
+	Task Schedules forward, so the next regular run is not held up.
+	"""
+	if not failed_instances:
+		return
+	tsiks = list(dict.fromkeys(str(each.to_tsik()) for each in failed_instances))
+	try:
+		outcomes = schedule_retries(
+			redis_conn, tsiks, get_scheduled_task_store(), RetryPolicy.from_config(), time.time()
 		)
+	except Exception as ex:
+		get_logger().error(f"Unable to schedule retries for {len(tsiks)} Task Schedule instances: {ex}")
 		return
-
-	# Finally, recalculate the next Run Time.
-	# Easy enough; just push the Task Schedule ID back into the -Internal- Queue!
-	# It will get processed automatically during the next thread cycle.
-	await internal_queue.put(task_schedule_instance.task_schedule_id)
+	for each_tsik, (outcome, value) in outcomes.items():
+		if outcome == "dead":
+			get_logger().error(
+				"Task Schedule instance %s failed %s times; moved to the dead-letter set.", each_tsik, value
+			)
+		else:
+			get_logger().warning(
+				"Task Schedule instance %s will be retried at %s.",
+				each_tsik,
+				DateTimeType.fromtimestamp(value, ZoneInfo("UTC")),
+			)
+	for each_id in dict.fromkeys(each.task_schedule_id for each in failed_instances):
+		await internal_queue.put(each_id, lane=LANE_RESCHEDULE)
 
 
 def rq_get_scheduled_tasks() -> list[RQScheduledTask]:
 	"""
-	Query Redis for the values held in key RQ_KEY_SCHEDULED_TASKS
+	Query Redis for the scheduled TSIKs (see task_store.py for where they are kept).
 	"""
 	redis_conn = create_connection()
 	if not redis_conn:
 		get_logger().warning("In lieu of a Redis Connection, returning an empty vector.")
 		return []
 
-	redis_result: tuple = redis_conn.zscan(
-		RQ_KEY_SCHEDULED_TASKS
-	)  # (0, [('TS-000007|1742607180', 1742607180.0), ('TS-000007|1742607360', 1742607360.0) ])
-	list_of_tsik_string = [each[0] for each in redis_result[1]]
+	# [('TS-000007|1742607180', 1742607180.0), ('TS-000007|1742607360', 1742607360.0), ...]
+	list_of_tsik_string = [each[0] for each in get_scheduled_task_store().scan(redis_conn)]
 
 	wrapped_result = [
 		RQScheduledTask.from_tsik(TSIK(each)) for each in list_of_tsik_string
@@ -313,22 +602,18 @@ def rq_get_scheduled_tasks() -> list[RQScheduledTask]:
 	return wrapped_result
 
 
-def rq_cancel_scheduled_task(task_schedule_id: str) -> tuple:
+def rq_count_scheduled_tasks() -> int:
 	"""
-	Remove a Task Schedule from the Redis database, to prevent it from executing in the future.
+	Count the scheduled task instances.
 	"""
-	# As of changes made May 21st 2022, the members in the Ordered Set 'btu_scheduler:task_execution_times'
-	# are not just Task Schedule ID's.  The Unix Time is a suffix.  Removing members now requires some "starts_with" logic.
+	return get_scheduled_task_store().count(create_connection())
 
-	with create_connection() as redis_conn:
-		# First, list all the keys using 'zrange btu_scheduler:task_execution_times 0 -1'
-		all_task_schedules = redis_conn.zrange(RQ_KEY_SCHEDULED_TASKS, 0, -1)
-		removed: bool = False
 
-		for each_row in all_task_schedules:
-			if each_row.startswith(task_schedule_id):
-				_ = redis_conn.zrem(RQ_KEY_SCHEDULED_TASKS, each_row)
-				removed = True
+def rq_cancel_scheduled_task(task_schedule_id: str) -> tuple:
+	"""
+	Remove a Task Schedule from the Redis database, to prevent it from executing in the future.
+	"""
+	removed: bool = bool(rq_cancel_scheduled_tasks([task_schedule_id])[task_schedule_id])
 
 	if removed:
 		get_logger().info("Scheduled Task successfully removed from Redis Queue.")
@@ -336,15 +621,72 @@ def rq_cancel_scheduled_task(task_schedule_id: str) -> tuple:
 		get_logger().info("Scheduled Task not found in Redis Queue.")
 
 
+def rq_cancel_scheduled_tasks(task_schedule_ids: list[str]) -> dict[str, int]:
+	"""
+	Remove many Task Schedules from the Redis database, using one scan of the sorted set(s) and a ZREM per key.
+	Their lateness histograms are discarded too.  Returns the number of scheduled instances removed, per Task
+	Schedule identifier.
+	"""
+	# As of changes made May 21st 2022, the members in the Ordered Set 'btu_scheduler:task_execution_times'
+	# are not just Task Schedule ID's.  The Unix Time is a suffix, so members are matched on the prefix before '|'.
+	wanted = set(task_schedule_ids)
+	removed_counts = dict.fromkeys(task_schedule_ids, 0)
+
+	store = get_scheduled_task_store()
+	with create_connection() as redis_conn:
+		# First, list all the members (e.g. 'zrange btu_scheduler:task_execution_times 0 -1')
+		members_to_remove = []
+		for each_row, _ in store.scan(redis_conn):
+			task_schedule_id = TSIK(each_row).task_schedule_id()
+			if task_schedule_id in wanted:
+				members_to_remove.append(each_row)
+				removed_counts[task_schedule_id] += 1
+
+		if members_to_remove:
+			store.remove_many(redis_conn, members_to_remove)
+
+	lateness_tracker = get_lateness_tracker()
+	for each_id in wanted:
+		lateness_tracker.forget(each_id)
+	return removed_counts
+
+
 def rq_print_scheduled_tasks(to_stdout: bool):
+	logger = get_logger()
+	if not to_stdout and not logger.isEnabledFor(logging.INFO):
+		return  # nothing would be written, so skip the Redis scan entirely
 	tasks: list[RQScheduledTask] = rq_get_scheduled_tasks()
 	for result in sorted(tasks, key=lambda x: x.task_schedule_id):
 		next_datetime_local = result.next_execution_as_datetime_local()
-		message: str = f"Task Schedule {result.task_schedule_id} is scheduled to occur later at {next_datetime_local}"
 		if to_stdout:
-			print(f"{message}")
+			print(f"Task Schedule {result.task_schedule_id} is scheduled to occur later at {next_datetime_local}")
 		else:
-			get_logger().info(message)
+			logger.info("Task Schedule %s is scheduled to occur later at %s", result.task_schedule_id, next_datetime_local)
+
+
+_listing_loggers: dict[str | None, ScheduledTaskListingLogger] = {}
+
+
+def rq_log_scheduled_tasks() -> dict:
+	"""
+	Log the scheduled tasks once per cycle, according to configuration 'scheduled_tasks_log_mode'.
+	Returns the cycle's summary (counts, earliest and latest next run, changes since the last cycle).
+	"""
+	listing_logger = per_site(
+		_listing_loggers,
+		lambda: ScheduledTaskListingLogger(
+			btu_py.get_logger,
+			mode=btu_py.get_config_data().get("scheduled_tasks_log_mode", "summary"),
+			item_logger=new_item_logger_from_config(),
+		),
+	)
+
+	local_timezone = btu_py.get_config().timezone()
+
+	def format_time(unix_time: int) -> str:
+		return str(DateTimeType.fromtimestamp(unix_time, tz=local_timezone))
+
+	return listing_logger.log_cycle(rq_get_scheduled_tasks(), format_time)
 
 
 def clear_all_scheduled_tasks() -> bool:
@@ -355,7 +697,9 @@ def clear_all_scheduled_tasks() -> bool:
 	if not redis_conn:
 		get_logger().error("clear_all_scheduled_tasks(): Cannot establish connection to Redis database.")
 		return False
-	redis_conn.zremrangebyrank(RQ_KEY_SCHEDULED_TASKS, 0, -1)
+	get_scheduled_task_store().clear(redis_conn)
+	# Pending retries, but not the dead-letter set.
+	redis_conn.delete(site_key(RQ_KEY_RETRY_TASKS), site_key(RQ_KEY_RETRY_ATTEMPTS))
 	return True
 
 
@@ -365,6 +709,7 @@ async def queue_full_refill(internal_queue: object) -> int:
 	"""
 	# btu_py.get_logger().debug(f"  * before refill, the queue contains {internal_queue.qsize()} values.")
 	rows_added = 0
+	rows_already_waiting = 0
 	enabled_schedules = await get_enabled_task_schedules()
 	if not enabled_schedules:
 		btu_py.get_logger().debug("queue_full_refill() : No enabled Task Schedules found in the database.")
@@ -372,12 +717,16 @@ async def queue_full_refill(internal_queue: object) -> int:
 
 	# btu_py.get_logger().debug(f"  * queue_full_refill() found {len(enabled_schedules)} enabled Task Schedules.")
 	for each_row in enabled_schedules:  # each_row is a dictionary with 2 keys: 'name' and 'desc_short'
-		await internal_queue.put(
-			each_row["schedule_key"]
-		)  # add the schedule_key ('name') of a BTU Task Schedule document.
+		# Add the schedule_key ('name') of a BTU Task Schedule document.  put() returns False if it was already waiting.
+		if not await internal_queue.put(each_row["schedule_key"], lane=LANE_REFILL):
+			rows_already_waiting += 1
 		rows_added += 1
 	if rows_added:
-		btu_py.get_logger().debug(f"  * filled internal queue with {rows_added} Task Schedule identifiers.")
+		btu_py.get_logger().debug(
+			"  * filled internal queue with %s Task Schedule identifiers (%s were already waiting).",
+			rows_added,
+			rows_already_waiting,
+		)
 	return rows_added
 
 
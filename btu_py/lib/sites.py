@@ -0,0 +1,108 @@
+"""btu_py/lib/sites.py"""
+
+# Multi-site mode: one daemon serving several Frappe sites.
+#
+# The configuration file may contain one table per site.  Each site's settings are the top-level settings, overridden
+# by its own table:
+#
+#     sql_database = "_1bd3e0294da19198"        # top-level settings, shared by every site unless overridden
+#     ...
+#     [sites.erp]
+#     sql_database = "_5e5899d8398b5f7b"
+#     webserver_host_header = "erp.example.com"
+#     jobs_site_prefix = "erp.example.com"
+#
+# Every site runs its own scheduler pipeline (internal queue, consumer, producer, dispatch loop, reconciliation) in
+# its own copy of the context, where 'btu_py.shared_config' holds that site's AppConfig.  Whatever reads the
+# configuration therefore sees the site's settings, and the per-process objects created from it (SQL database, Frappe
+# client, task store, metrics, ...) are kept per site, using per_site().  Redis keys written by BTU are prefixed with
+# the site's 'redis_key_namespace' (by default, its name).  The process, the event loop, the HTTP session and the
+# control listeners are shared.
+#
+# Without a [sites] table, the daemon runs a single pipeline with the top-level settings, as before.
+
+import asyncio
+import contextlib
+import contextvars
+
+import btu_py
+
+_site_contexts: dict[str, contextvars.Context] = {}
+_dispatch_turns: asyncio.Semaphore | None = None
+
+
+def current_site_name() -> str | None:
+	"""
+	The name of the site whose context this is; None in single-site mode.
+	"""
+	return btu_py.get_config_data().get("site_name")
+
+
+def per_site(registry: dict, factory):
+	"""
+	Return the current site's object from 'registry', creating it with 'factory()' on first use.
+	"""
+	site_name = current_site_name()
+	instance = registry.get(site_name)
+	if instance is None:
+		instance = registry[site_name] = factory()
+	return instance
+
+
+def site_key(key: str) -> str:
+	"""
+	A BTU Redis key, in the current site's namespace.  Unchanged in single-site mode.
+	"""
+	namespace = btu_py.get_config_data().get("redis_key_namespace")
+	return f"{namespace}:{key}" if namespace else key
+
+
+def create_site_contexts(app_config) -> dict[str, contextvars.Context]:
+	"""
+	Create a context per configured site, holding that site's AppConfig.  In single-site mode, there is one context,
+	named "default", holding 'app_config' itself.
+	"""
+	_site_contexts.clear()
+	site_names = app_config.site_names()
+	if not site_names:
+		context = contextvars.copy_context()
+		context.run(btu_py.shared_config.set, app_config)
+		_site_contexts["default"] = context
+	for each_name in site_names:
+		context = contextvars.copy_context()
+		context.run(btu_py.shared_config.set, app_config.for_site(each_name))
+		_site_contexts[each_name] = context
+	return dict(_site_contexts)
+
+
+def get_site_context(site_name: str) -> contextvars.Context | None:
+	return _site_contexts.get(site_name)
+
+
+def site_context(app_config, site_name: str | None) -> contextvars.Context:
+	"""
+	A context for a command-line tool: holds the AppConfig of 'site_name', or 'app_config' itself when it is None.
+	"""
+	context = contextvars.copy_context()
+	context.run(btu_py.shared_config.set, app_config.for_site(site_name) if site_name else app_config)
+	return context
+
+
+def is_multi_site() -> bool:
+	return current_site_name() is not None
+
+
+def dispatch_turn():
+	"""
+	An async context manager, held while a batch of due Task Schedule instances is dispatched.
+
+	In multi-site mode, at most 'site_dispatch_concurrency' sites (default 1) dispatch at the same time.  Waiting
+	sites are served in order of arrival, and each turn is a single batch (at most 'frappe_enqueue_batch_size'
+	instances), so a busy site cannot starve the others.  In single-site mode, this does nothing.
+	"""
+	global _dispatch_turns
+	if not is_multi_site():
+		return contextlib.nullcontext()
+	if _dispatch_turns is None:
+		_dispatch_turns = asyncio.Semaphore(btu_py.get_config_data().get("site_dispatch_concurrency", 1))
+	return _dispatch_turns
@@ -1,11 +1,11 @@
 """btu_py/lib/sql.py"""
 
-from databases import Database
-
 from btu_py import get_config
 
-# Global database instance (initialized on first use)
-_database_instance: Database = None
+# Database instances, per site (see btu_py/lib/sites.py), initialized on first use:
+# site name --> (the connection string it was created with, databases.Database)
+# The 'databases' library (and SQLAlchemy) is imported on first use.
+_databases: dict[str | None, tuple] = {}
 
 
 def _quote_identifier(identifier: str, db_type: str) -> str:
@@ -34,20 +34,27 @@ def quote(sql_object):
 	return _quote_identifier(sql_object, get_config().get_sql_type())
 
 
-async def get_database() -> Database:
+async def get_database():
 	"""
-	Get or create the database connection instance.
-	The database instance is created once and reused.
+	Get or create the site's database connection instance.
+	The database instance is created once and reused, until a configuration reload changes the connection settings.
 	"""
-	global _database_instance
+	from btu_py.lib.sites import current_site_name
+
+	site_name = current_site_name()
+	connection_string = get_config().get_sql_connection_string()
+	if site_name in _databases and _databases[site_name][0] != connection_string:
+		_, previous_instance = _databases.pop(site_name)
+		await previous_instance.disconnect()
+
+	if site_name not in _databases:
+		from databases import Database
 
-	if _database_instance is None:
-		config = get_config()
-		connection_string = config.get_sql_connection_string()
-		_database_instance = Database(connection_string)
-		await _database_instance.connect()
+		database_instance = Database(connection_string)
+		_databases[site_name] = (connection_string, database_instance)
+		await database_instance.connect()
 
-	return _database_instance
+	return _databases[site_name][1]
 
 
 async def create_connection():
@@ -59,12 +66,11 @@ async def create_connection():
 	return await get_database()
 
 
-async def get_task_schedule_by_id(task_schedule_id: str) -> dict:
+def _task_schedule_select_clause() -> str:
 	"""
-	Returns a single Task Schedule row from the Frappe SQL database.
+	The SELECT and FROM clauses shared by the Task Schedule queries below.
 	"""
-
-	query_string = f"""
+	return f"""
 		SELECT
 			 TaskSchedule.name
 			,TaskSchedule.task
@@ -87,7 +93,16 @@ async def get_task_schedule_by_id(task_schedule_id: str) -> dict:
 		ON
 			Configuration.doctype = 'BTU Configuration'
 		AND Configuration.{quote("field")} = 'cron_time_zone'
+		"""
+
+
+async def get_task_schedule_by_id(task_schedule_id: str) -> dict:
+	"""
+	Returns a single Task Schedule row from the Frappe SQL database.
+	"""
 
+	query_string = f"""
+		{_task_schedule_select_clause()}
 		WHERE
 			TaskSchedule.name = :task_schedule_id
 
@@ -99,6 +114,59 @@ async def get_task_schedule_by_id(task_schedule_id: str) -> dict:
 	return sql_row
 
 
+async def get_task_schedules_by_ids(task_schedule_ids: list[str]) -> list:
+	"""
+	Returns the Task Schedule rows for many primary keys, using a single query.
+	Identifiers that do not exist are simply absent from the result.
+	"""
+	if not task_schedule_ids:
+		return []
+
+	# The 'databases' library does not expand lists, so bind one named parameter per identifier.
+	values = {f"task_schedule_id_{index}": each_id for index, each_id in enumerate(task_schedule_ids)}
+	placeholders = ", ".join(f":{each_name}" for each_name in values)
+
+	query_string = f"""
+		{_task_schedule_select_clause()}
+		WHERE
+			TaskSchedule.name IN ({placeholders});
+		"""
+
+	database = await get_database()
+	sql_rows = await database.fetch_all(query_string, values=values)
+	return sql_rows
+
+
+async def get_enabled_task_schedule_rows() -> list:
+	"""
+	Returns the complete rows of every enabled Task Schedule, using a single query.
+	"""
+	query_string = f"""
+		{_task_schedule_select_clause()}
+		WHERE
+			TaskSchedule.enabled = 1;
+		"""
+
+	database = await get_database()
+	sql_rows = await database.fetch_all(query_string)
+	return sql_rows
+
+
+async def iterate_enabled_task_schedule_rows():
+	"""
+	Yields the complete rows of every enabled Task Schedule, one at a time, without loading the whole result set.
+	"""
+	query_string = f"""
+		{_task_schedule_select_clause()}
+		WHERE
+			TaskSchedule.enabled = 1;
+		"""
+
+	database = await get_database()
+	async for each_row in database.iterate(query_string):
+		yield each_row
+
+
 async def get_task_by_id(task_id: str) -> dict:
 	"""
 	Returns a single BTU Task row from the Frappe SQL database.
@@ -5,14 +5,9 @@ from datetime import datetime as DateTimeType
 from typing import Union
 from zoneinfo import ZoneInfo
 
-import requests
-
-from btu_py import get_config_data, get_logger
-from btu_py.lib import btu_cron
 from btu_py.lib.btu_rq import RQJobWrapper
-from btu_py.lib.sql import get_task_by_id, get_task_schedule_by_id
+from btu_py.lib.sql import get_task_by_id, get_task_schedule_by_id, get_task_schedules_by_ids
 from btu_py.lib.structs.sanchez import get_pickled_function_from_web
-from btu_py.lib.utils import get_frappe_base_url
 
 NoneType = type(None)
 
@@ -47,7 +42,7 @@ class BtuTask:
 		"""
 		wrapped_job = RQJobWrapper.new_with_defaults()
 		wrapped_job.description = self.desc_short
-		byte_result = get_pickled_function_from_web(self.task_key, None)
+		byte_result = await get_pickled_function_from_web(self.task_key, None)
 		wrapped_job.data = byte_result
 		wrapped_job.timeout = self.max_task_duration
 		return wrapped_job
@@ -72,6 +67,19 @@ class BtuTaskSchedule:
 		if not schedule_data:
 			raise IOError(f"No SQL row returned by get_task_schedule_by_id() for primary key = '{schedule_key}'")
 
+		return BtuTaskSchedule.from_sql_row(schedule_data)
+
+	@staticmethod
+	async def init_from_schedule_keys(schedule_keys: list[str]) -> dict:
+		"""
+		Read many Task Schedules with a single SQL query.  Returns a dictionary keyed by schedule key;
+		keys without a matching SQL row are omitted.
+		"""
+		sql_rows = await get_task_schedules_by_ids(list(dict.fromkeys(schedule_keys)))
+		return {each_row["name"]: BtuTaskSchedule.from_sql_row(each_row) for each_row in sql_rows}
+
+	@staticmethod
+	def from_sql_row(schedule_data) -> object:
 		return BtuTaskSchedule(
 			id=schedule_data["name"],
 			task_key=schedule_data["task"],
@@ -98,6 +106,8 @@ class BtuTaskSchedule:
 		return wrapped_job
 
 	def get_next_runtimes(self, from_utc_datetime=None, number_results=1) -> list[DateTimeType]:
+		from btu_py.lib import btu_cron
+
 		return btu_cron.tz_cron_to_utc_datetimes(
 			self.cron_string, self.cron_timezone, from_utc_datetime, number_results
 		)
@@ -106,23 +116,6 @@ class BtuTaskSchedule:
 		"""
 		Call Frappe website to immediately enqueue a Task as an RQ Job.
 		"""
+		from btu_py.lib.frappe_client import get_frappe_client
 
-		config_data = get_config_data()
-		url = f"{get_frappe_base_url()}/api/method/btu.btu_api.endpoints.enqueue_for_next_available_worker"
-		headers = {
-			"Authorization": config_data.webserver_token,
-			"Content-Type": "application/json",
-		}
-		# If Frappe is running via gunicorn, in DNS Multi-tenancy mode, then we have to pass a "Host" header.
-		if config_data.webserver_host_header:
-			headers["Host"] = config_data.webserver_host_header
-
-		response = requests.post(url=url, headers=headers, params={"task_schedule_key": self.id}, timeout=30)
-
-		get_logger().debug(
-			f"Response from Frappe to Enqueue: Status Code = {response.status_code}, Data = {response.json()}"
-		)
-		if response.status_code == 200:
-			get_logger().info(f"Successfully enqueued Task Schedule: '{self.id}'")
-		else:
-			raise IOError(f"Unexpected response code from Frappe Framework web server: {response.json()}")
+		get_frappe_client().enqueue_for_next_available_worker(self.id)
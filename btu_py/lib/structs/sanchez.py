@@ -3,10 +3,7 @@
 import json
 from typing import Union
 
-import requests
-
-from btu_py import get_config_data
-from btu_py.lib.utils import get_frappe_base_url
+from btu_py import get_config_data, get_logger
 
 NoneType = type(None)
 
@@ -15,15 +12,11 @@ async def get_pickled_function_from_web(task_id: str, task_schedule_id: Union[st
 	"""
 	Call Frappe REST API and acquire pickled Python function as bytes.
 	"""
+	import requests
+
 	config_data = get_config_data()
-	url = f"{get_frappe_base_url()}/api/method/btu.btu_api.endpoints.get_pickled_task"
-	headers = {
-		"Authorization": config_data.webserver_token,
-		"Content-Type": "application/octet-stream",
-	}
-	# If Frappe is running via gunicorn, in DNS Multi-tenancy mode, then we have to pass a "Host" header.
-	if config_data.webserver_host_header:
-		headers["Host"] = config_data.webserver_host_header
+	url = f"{config_data.frappe_base_url}/api/method/btu.btu_api.endpoints.get_pickled_task"
+	headers = {**config_data.frappe_headers, "Content-Type": "application/octet-stream"}
 
 	response = requests.get(
 		url=url,
@@ -44,7 +37,5 @@ async def get_pickled_function_from_web(task_id: str, task_schedule_id: Union[st
 
 	response_bytes = bytes(response_integer_array)
 
-	print("Response Bytes:")
-	print(response_bytes)
-
+	get_logger().debug("Pickled function for Task '%s': %s bytes", task_id, len(response_bytes))
 	return response_bytes
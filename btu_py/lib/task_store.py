@@ -0,0 +1,230 @@
+"""btu_py/lib/task_store.py"""
+
+# Where scheduled Task Schedule instances (TSIKs) are kept in Redis.
+#
+# The default layout ("single") is one sorted set, 'btu_scheduler:task_execution_times', scored by Unix time.  With a
+# very large number of Task Schedules that key becomes huge: it cannot be spread across a Redis Cluster, and every
+# ZRANGEBYSCORE of the dispatch loop competes with the refill's writes.
+#
+# The bucketed layouts ("hourly" and "daily") keep one sorted set per period instead:
+#
+#     btu_scheduler:task_execution_times:hourly:1742486400     TSIKs due from 16:00 to 16:59 UTC
+#     btu_scheduler:task_execution_buckets:hourly              index: bucket start --> bucket start
+#
+# A TSIK carries its own Unix time, so the bucket of any TSIK is known without a lookup.  The dispatch loop reads
+# only the buckets in the index that have started; a bucket whose TSIKs have all been dispatched no longer exists in
+# Redis, and is simply removed from the index.
+#
+# The layout is chosen with 'scheduled_tasks_layout'.  To change it, stop the daemon, run 'btu-py migrate-layout',
+# then update the configuration and start the daemon again.
+
+from collections.abc import Iterator
+
+from btu_py.lib.sites import per_site
+
+RQ_KEY_SCHEDULED_TASKS = "btu_scheduler:task_execution_times"
+RQ_KEY_SCHEDULED_BUCKETS = "btu_scheduler:task_execution_buckets"
+
+LAYOUT_SINGLE = "single"
+BUCKET_SECS = {"hourly": 3600, "daily": 86400}
+LAYOUTS = (LAYOUT_SINGLE, *BUCKET_SECS)
+
+SCAN_COUNT = 1000  # members per ZSCAN page
+
+
+def _unix_time(tsik: str) -> int:
+	return int(tsik.rsplit("|", 1)[1])
+
+
+class SingleKeyStore:
+	"""
+	All TSIKs in one sorted set.  In multi-site mode, keys are prefixed with the site's 'namespace' (see sites.py).
+	"""
+
+	layout = LAYOUT_SINGLE
+
+	def __init__(self, namespace: str | None = None):
+		self.key = f"{namespace}:{RQ_KEY_SCHEDULED_TASKS}" if namespace else RQ_KEY_SCHEDULED_TASKS
+
+	def key_for(self, tsik: str) -> str:
+		return self.key
+
+	def add(self, redis_conn, members: dict[str, int], nx: bool = False) -> int:
+		"""
+		Add TSIKs (TSIK --> Unix time).  Returns the number of TSIKs that were not already present.
+		"""
+		if not members:
+			return 0
+		return redis_conn.zadd(self.key, members, nx=nx)
+
+	def remove(self, redis_conn, tsik: str) -> None:
+		"""
+		Remove one TSIK with a single ZREM (so a pipeline's results stay one-per-call).
+		"""
+		redis_conn.zrem(self.key_for(tsik), tsik)
+
+	def remove_many(self, redis_conn, tsiks: list[str]) -> None:
+		keys: dict[str, list[str]] = {}
+		for each_tsik in tsiks:
+			keys.setdefault(self.key_for(each_tsik), []).append(each_tsik)
+		for each_key, each_tsiks in keys.items():
+			redis_conn.zrem(each_key, *each_tsiks)
+
+	def due(self, redis_conn, before: float) -> list[str]:
+		"""
+		TSIKs scheduled at or before Unix time 'before', earliest first.
+		"""
+		return redis_conn.zrangebyscore(self.key, 0, before)
+
+	def scan(self, redis_conn) -> Iterator[tuple[str, float]]:
+		"""
+		Every (TSIK, Unix time), a page at a time.
+		"""
+		yield from redis_conn.zscan_iter(self.key, count=SCAN_COUNT)
+
+	def count(self, redis_conn) -> int:
+		return redis_conn.zcard(self.key)
+
+	def prune(self, redis_conn, before: float) -> int:
+		return 0
+
+	def clear(self, redis_conn) -> None:
+		redis_conn.delete(self.key)
+
+
+class BucketedStore(SingleKeyStore):
+	"""
+	TSIKs in one sorted set per hour or day, plus an index of the buckets.
+	"""
+
+	def __init__(self, layout: str, namespace: str | None = None):
+		if layout not in BUCKET_SECS:
+			raise ValueError(f"Unknown bucketed layout '{layout}'; expected one of {', '.join(BUCKET_SECS)}.")
+		super().__init__(namespace)
+		self.layout = layout
+		self.bucket_secs = BUCKET_SECS[layout]
+		self.index_key = f"{RQ_KEY_SCHEDULED_BUCKETS}:{layout}"
+		if namespace:
+			self.index_key = f"{namespace}:{self.index_key}"
+
+	def _bucket_start(self, unix_time: float) -> int:
+		return int(unix_time) - int(unix_time) % self.bucket_secs
+
+	def _bucket_key(self, bucket_start: int) -> str:
+		return f"{self.key}:{self.layout}:{bucket_start}"
+
+	def key_for(self, tsik: str) -> str:
+		return self._bucket_key(self._bucket_start(_unix_time(tsik)))
+
+	def _bucket_starts(self, redis_conn, before: float | str = "+inf") -> list[int]:
+		return [int(each) for each in redis_conn.zrangebyscore(self.index_key, 0, before)]
+
+	def add(self, redis_conn, members: dict[str, int], nx: bool = False) -> int:
+		if not members:
+			return 0
+		buckets: dict[int, dict[str, int]] = {}
+		for each_tsik, unix_time in members.items():
+			buckets.setdefault(self._bucket_start(unix_time), {})[each_tsik] = unix_time
+		# Buckets first, then the index: a bucket is never listed before it exists, except by an add in progress.
+		pipeline = redis_conn.pipeline(transaction=False)
+		for bucket_start, bucket_members in buckets.items():
+			pipeline.zadd(self._bucket_key(bucket_start), bucket_members, nx=nx)
+		pipeline.zadd(self.index_key, {str(each): each for each in buckets})
+		return sum(pipeline.execute()[: len(buckets)])
+
+	def due(self, redis_conn, before: float) -> list[str]:
+		bucket_starts = self._bucket_starts(redis_conn, before)
+		if not bucket_starts:
+			return []
+		pipeline = redis_conn.pipeline(transaction=False)
+		for each_start in bucket_starts:
+			pipeline.zrangebyscore(self._bucket_key(each_start), 0, before)
+		return [each_tsik for each_bucket in pipeline.execute() for each_tsik in each_bucket]
+
+	def scan(self, redis_conn) -> Iterator[tuple[str, float]]:
+		for each_start in self._bucket_starts(redis_conn):
+			yield from redis_conn.zscan_iter(self._bucket_key(each_start), count=SCAN_COUNT)
+
+	def count(self, redis_conn) -> int:
+		pipeline = redis_conn.pipeline(transaction=False)
+		for each_start in self._bucket_starts(redis_conn):
+			pipeline.zcard(self._bucket_key(each_start))
+		return sum(pipeline.execute())
+
+	def prune(self, redis_conn, before: float) -> int:
+		"""
+		Remove buckets that ended before Unix time 'before' and are empty (Redis deletes an empty sorted set) from the
+		index.  Returns the number removed.
+		"""
+		ended = self._bucket_starts(redis_conn, before - self.bucket_secs)
+		if not ended:
+			return 0
+		pipeline = redis_conn.pipeline(transaction=False)
+		for each_start in ended:
+			pipeline.exists(self._bucket_key(each_start))
+		empty = [str(each_start) for each_start, exists in zip(ended, pipeline.execute()) if not exists]
+		if empty:
+			redis_conn.zrem(self.index_key, *empty)
+		return len(empty)
+
+	def clear(self, redis_conn) -> None:
+		bucket_keys = [self._bucket_key(each_start) for each_start in self._bucket_starts(redis_conn)]
+		pipeline = redis_conn.pipeline(transaction=False)
+		for each_key in bucket_keys:
+			pipeline.delete(each_key)  # one key per command, so this also works on a Redis Cluster
+		pipeline.delete(self.index_key)
+		pipeline.execute()
+
+
+def new_store(layout: str, namespace: str | None = None) -> SingleKeyStore:
+	return SingleKeyStore(namespace) if layout == LAYOUT_SINGLE else BucketedStore(layout, namespace)
+
+
+_stores: dict[str | None, SingleKeyStore] = {}
+
+
+def get_scheduled_task_store() -> SingleKeyStore:
+	"""
+	Return the site's store of scheduled TSIKs (see sites.py), creating it from the application configuration on first
+	use.  The layout is not changed by a configuration reload; see 'btu-py migrate-layout'.
+	"""
+	import btu_py
+
+	def new_site_store() -> SingleKeyStore:
+		config_data = btu_py.get_config_data()
+		layout = config_data.get("scheduled_tasks_layout", LAYOUT_SINGLE)
+		return new_store(layout, config_data.get("redis_key_namespace"))
+
+	return per_site(_stores, new_site_store)
+
+
+def migrate_layout(redis_conn, target_layout: str, chunk_size: int = 1000, namespace: str | None = None) -> dict:
+	"""
+	Move every TSIK held in any other layout into 'target_layout'.  Returns the number moved, per source layout.
+	The daemon should be stopped first, so nothing is written to the old layout meanwhile.
+	"""
+	target = new_store(target_layout, namespace)
+	moved = {}
+	for each_layout in LAYOUTS:
+		if each_layout == target_layout:
+			continue
+		source = new_store(each_layout, namespace)
+		moved[each_layout] = 0
+		chunk: dict[str, int] = {}
+		for each_tsik, score in source.scan(redis_conn):
+			chunk[each_tsik] = int(score)
+			if len(chunk) >= chunk_size:
+				moved[each_layout] += _move_chunk(redis_conn, source, target, chunk)
+				chunk = {}
+		if chunk:
+			moved[each_layout] += _move_chunk(redis_conn, source, target, chunk)
+		source.clear(redis_conn)  # also drops the source's index, if it has one
+	return moved
+
+
+def _move_chunk(redis_conn, source: SingleKeyStore, target: SingleKeyStore, chunk: dict[str, int]) -> int:
+	target.add(redis_conn, chunk, nx=True)  # copy first: an interrupted migration never loses a TSIK
+	pipeline = redis_conn.pipeline(transaction=False)
+	source.remove_many(pipeline, list(chunk))
+	pipeline.execute()
+	return len(chunk)
@@ -63,22 +63,15 @@ def test_frappe_ping(debug_mode=False):
 	import requests
 
 	import btu_py
-	from btu_py.lib.utils import get_frappe_base_url
 
 	btu_py.initialize_shared_config()
 	config_data = btu_py.get_config_data()
 
-	url = f"{get_frappe_base_url()}/api/method/btu.btu_api.endpoints.test_ping"
+	url = f"{config_data.frappe_base_url}/api/method/btu.btu_api.endpoints.test_ping"
 	if debug_mode:
 		print(f"URL for ping = {url}")
 
-	headers = {
-		"Authorization": config_data.webserver_token,
-		"Content-Type": "application/json",
-	}
-	# If Frappe is running via gunicorn, in DNS Multi-tenancy mode, then we have to pass a "Host" header.
-	if config_data.webserver_host_header:
-		headers["Host"] = config_data.webserver_host_header
+	headers = {**config_data.frappe_headers, "Content-Type": "application/json"}
 
 	response = requests.get(url=url, headers=headers, timeout=30)
 	print(f"Response Status Code: {response.status_code}")
@@ -95,17 +88,10 @@ def test_pickler(debug_mode: bool = True):
 	import requests
 
 	import btu_py
-	from btu_py.lib.utils import get_frappe_base_url
 
 	config_data = btu_py.get_config_data()
-	url = f"{get_frappe_base_url()}/api/method/btu.btu_api.endpoints.test_function_ping_now_bytes"
-	headers = {
-		"Authorization": config_data.webserver_token,
-		"Content-Type": "application/json",
-	}
-	# If Frappe is running via gunicorn, in DNS Multi-tenancy mode, then we have to pass a "Host" header.
-	if config_data.webserver_host_header:
-		headers["Host"] = config_data.webserver_host_header
+	url = f"{config_data.frappe_base_url}/api/method/btu.btu_api.endpoints.test_function_ping_now_bytes"
+	headers = {**config_data.frappe_headers, "Content-Type": "application/json"}
 
 	response = requests.get(
 		url=url,
@@ -194,6 +180,7 @@ def test_unix_socket_sync():
 	"""
 	Send a message to the Unix socket listener synchronously and print the response.
 	"""
+	import json
 	import pathlib
 	import socket
 
@@ -212,7 +199,7 @@ def test_unix_socket_sync():
 		sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
 		sock.connect(str(socket_path))
 
-		message = "Hello Mars\n"
+		message = json.dumps({"request_type": "echo", "request_content": "Hello Mars"}) + "\n"
 		sock.sendall(message.encode())
 
 		response = sock.recv(1024)
@@ -230,6 +217,7 @@ def test_unix_socket_sync():
 async def test_unix_socket_async():
 	"""Send a message to the Unix socket listener and print the response."""
 	import asyncio
+	import json
 	import pathlib
 
 	import btu_py
@@ -245,7 +233,7 @@ async def test_unix_socket_async():
 
 	try:
 		reader, writer = await asyncio.open_unix_connection(str(socket_path))
-		message = "Hello Mars\n"
+		message = json.dumps({"request_type": "echo", "request_content": "Hello Mars"}) + "\n"
 		writer.write(message.encode())
 		await writer.drain()
 
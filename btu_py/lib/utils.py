@@ -3,13 +3,9 @@
 # NOTE: Functions here should not depend on other btu_py modules or namespaces.
 
 import inspect
-import ssl
 import time
 from datetime import datetime as DateTimeType
 
-# Third Party
-from slack_sdk.webhook import WebhookClient
-
 
 def validate_datatype(argument_name, argument_value, expected_type, mandatory=False):
 	"""
@@ -70,6 +66,10 @@ def send_message_to_slack(app_config, message_string: str) -> bool:
 	"""
 	if "slack_webhook_url" not in app_config.as_dictionary():
 		raise RuntimeError("Cannot send message to Slack: Configuration file is missing an entry 'slack_webhook_url'")
+	import ssl
+
+	from slack_sdk.webhook import WebhookClient  # imported here; most commands never send to Slack
+
 	webhook_url = app_config.as_dictionary()["slack_webhook_url"]
 	webhook = WebhookClient(url=webhook_url, ssl=ssl._create_unverified_context())
 	response = webhook.send(text=message_string)
@@ -188,8 +188,4 @@ def utc_to_rq_string(datetime_utc: DateTimeType) -> str:
 def get_frappe_base_url() -> str:
 	import btu_py
 
-	config_data = btu_py.get_config_data()
-
-	if config_data.webserver_port == 443:
-		return f"https://{config_data.webserver_ip}"
-	return f"http://{config_data.webserver_ip}:{config_data.webserver_port}"
+	return btu_py.get_config_data().frappe_base_url  # calculated once, when the configuration is read
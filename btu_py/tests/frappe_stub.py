@@ -0,0 +1,91 @@
+"""
+A local stand-in for the Frappe web server's BTU endpoints, for tests.
+
+	with FrappeStubServer(supports_bulk=True) as stub:
+		client = FrappeClient(stub.base_url, {"Authorization": "token abc:def"})
+"""
+
+import json
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from btu_py.lib.frappe_client import ENDPOINT_ENQUEUE, ENDPOINT_ENQUEUE_BULK, ENDPOINT_PICKLED_TASK
+
+
+class FrappeStubServer:
+
+	def __init__(self, supports_bulk: bool = True, failing_keys: set = frozenset()):
+		self.supports_bulk = supports_bulk
+		self.failing_keys = set(failing_keys)
+		self.requests: list[tuple[str, object]] = []  # (endpoint, task_schedule_key or list of keys)
+		self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+		self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+	@property
+	def base_url(self) -> str:
+		return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+	def _handler_class(self):
+		stub = self
+
+		class Handler(BaseHTTPRequestHandler):
+			def log_message(self, *args):
+				pass  # keep test output quiet
+
+			def _reply(self, status: int, body: dict):
+				encoded = json.dumps(body).encode("utf-8")
+				self.send_response(status)
+				self.send_header("Content-Type", "application/json")
+				self.send_header("Content-Length", str(len(encoded)))
+				self.end_headers()
+				self.wfile.write(encoded)
+
+			def do_POST(self):
+				url = urllib.parse.urlsplit(self.path)
+				endpoint = url.path.removeprefix("/api/method/")
+				body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+				if endpoint == ENDPOINT_ENQUEUE:
+					key = urllib.parse.parse_qs(url.query)["task_schedule_key"][0]
+					stub.requests.append((endpoint, key))
+					if key in stub.failing_keys:
+						return self._reply(417, {"exc_type": "ValidationError", "exception": f"Cannot enqueue {key}"})
+					return self._reply(200, {"message": f"Enqueued {key}"})
+
+				if endpoint == ENDPOINT_ENQUEUE_BULK and stub.supports_bulk:
+					keys = json.loads(body)["task_schedule_keys"]
+					stub.requests.append((endpoint, keys))
+					results = {
+						each_key: {"status": "error", "error": f"Cannot enqueue {each_key}"}
+						if each_key in stub.failing_keys
+						else {"status": "ok", "job_id": f"job-{each_key}"}
+						for each_key in keys
+					}
+					return self._reply(200, {"message": results})
+
+				stub.requests.append((endpoint, None))
+				return self._reply(404, {"exc_type": "DoesNotExistError"})
+
+			def do_GET(self):
+				url = urllib.parse.urlsplit(self.path)
+				endpoint = url.path.removeprefix("/api/method/")
+				if endpoint == ENDPOINT_PICKLED_TASK:
+					task_key = urllib.parse.parse_qs(url.query)["task_id"][0]
+					stub.requests.append((endpoint, task_key))
+					if task_key in stub.failing_keys:
+						return self._reply(417, {"exc_type": "DoesNotExistError"})
+					return self._reply(200, {"message": list(f"pickled {task_key}".encode())})
+				stub.requests.append((endpoint, None))
+				return self._reply(404, {"exc_type": "DoesNotExistError"})
+
+		return Handler
+
+	def __enter__(self):
+		self._thread.start()
+		return self
+
+	def __exit__(self, *args):
+		self._server.shutdown()
+		self._server.server_close()
+		self._thread.join()
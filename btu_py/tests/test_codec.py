@@ -0,0 +1,60 @@
+"""
+Unit tests for btu_py.lib.codec.
+
+Run with:  python -m pytest btu_py/tests/test_codec.py -v
+"""
+
+import unittest
+
+from btu_py.lib import codec
+
+REQUEST = {"request_type": "cancel_task_schedules", "request_content": ["TS-000001", "TS-000002"]}
+
+
+class TestJsonCodec(unittest.TestCase):
+
+	def test_message_round_trip(self):
+		self.assertEqual(codec.decode_message(codec.encode_message(REQUEST)), (REQUEST, codec.JSON))
+
+	def test_text_message_is_json(self):
+		self.assertEqual(codec.decode_message('{"a": 1}'), ({"a": 1}, codec.JSON))
+
+	def test_invalid_json_raises_codec_error(self):
+		with self.assertRaises(codec.CodecError):
+			codec.decode_message(b"not json")
+
+	def test_frames_are_newline_terminated(self):
+		buffer = codec.encode_frame(REQUEST) + codec.encode_frame({"b": 2})
+		frame, frame_codec, buffer = codec.split_frame(buffer)
+		self.assertEqual((frame_codec.loads(frame), frame_codec), (REQUEST, codec.JSON))
+		frame, _, buffer = codec.split_frame(buffer)
+		self.assertEqual(codec.JSON.loads(frame), {"b": 2})
+		self.assertEqual(codec.split_frame(buffer)[0], None)
+
+	def test_content_type_selects_response_codec(self):
+		self.assertIs(codec.response_codec({"content_type": "application/json"}, codec.MSGPACK), codec.JSON)
+		self.assertIs(codec.response_codec({"content_type": "unknown"}, codec.JSON), codec.JSON)
+
+
+@unittest.skipUnless(codec.msgpack_available(), "msgpack is not installed")
+class TestMsgpackCodec(unittest.TestCase):
+
+	def test_message_round_trip(self):
+		encoded = codec.encode_message(REQUEST, codec.MSGPACK)
+		self.assertEqual(encoded[:1], codec.MSGPACK_MAGIC)
+		self.assertEqual(codec.decode_message(encoded), (REQUEST, codec.MSGPACK))
+
+	def test_partial_frame_waits_for_more_data(self):
+		encoded = codec.encode_frame(REQUEST, codec.MSGPACK)
+		self.assertEqual(codec.split_frame(encoded[:3])[0], None)
+		self.assertEqual(codec.split_frame(encoded[:-1])[0], None)
+		self.assertEqual(codec.pending_frame_size(encoded[:-1]), len(encoded) - 5)
+		frame, frame_codec, remainder = codec.split_frame(encoded + b"{")
+		self.assertEqual((frame_codec.loads(frame), remainder), (REQUEST, b"{"))
+
+	def test_json_request_may_ask_for_msgpack_response(self):
+		self.assertIs(codec.response_codec({"content_type": "msgpack"}, codec.JSON), codec.MSGPACK)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,70 @@
+"""
+Unit tests for btu_py.daemon.command_pool (executing control-plane commands on a pool of workers).
+
+Run with:  python -m pytest btu_py/tests/test_command_pool.py -v
+"""
+
+import asyncio
+import unittest
+
+from btu_py.daemon.command_pool import CommandWorkerPool
+
+
+class TestCommandWorkerPool(unittest.IsolatedAsyncioTestCase):
+
+	async def asyncSetUp(self):
+		self.log = []
+		self.release_bulk = asyncio.Event()
+
+		async def handler(name):
+			self.log.append(f"{name} start")
+			if name == "bulk":
+				await self.release_bulk.wait()
+			else:
+				await asyncio.sleep(0.01)
+			self.log.append(f"{name} end")
+			return name
+
+		self.pool = CommandWorkerPool(handler, worker_count=3)
+		runner = asyncio.create_task(self.pool.run())
+		self.addCleanup(runner.cancel)
+
+	async def test_same_key_runs_in_order(self):
+		done = []
+		for each in ("first", "second", "third"):
+			await self.pool.submit("TS-1", each, on_done=done.append)
+		while len(done) < 3:
+			await asyncio.sleep(0.01)
+		self.assertEqual(done, ["first", "second", "third"])
+		self.assertEqual(
+			self.log, ["first start", "first end", "second start", "second end", "third start", "third end"]
+		)
+
+	async def test_exclusive_command_does_not_block_the_caller(self):
+		finished = []
+		for each in range(3):
+			await self.pool.submit(f"TS-{each}", f"before-{each}")
+		await asyncio.wait_for(self.pool.submit_exclusive("bulk"), 1)  # returns while the bulk command is pending
+		for each in range(3):
+			await self.pool.submit(f"TS-{each}", f"after-{each}", on_done=finished.append)
+
+		while "bulk start" not in self.log:
+			await asyncio.sleep(0.01)
+		# Everything received before the bulk command has finished; nothing received after it has started.
+		self.assertEqual(sum(each.endswith(" end") for each in self.log), 3)
+		self.assertFalse(any(each.startswith("after") for each in self.log))
+
+		self.release_bulk.set()
+		while len(finished) < 3:
+			await asyncio.sleep(0.01)
+		self.assertLess(self.log.index("bulk end"), min(self.log.index(f"after-{each} start") for each in range(3)))
+
+	async def test_exclusive_command_reports_its_result(self):
+		self.release_bulk.set()
+		done = asyncio.get_running_loop().create_future()
+		await self.pool.submit_exclusive("bulk", on_done=done.set_result)
+		self.assertEqual(await asyncio.wait_for(done, 1), "bulk")
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,168 @@
+"""
+Unit tests for btu_py.daemon.control_protocol (framing, pipelining and limits).
+
+Run with:  python -m pytest btu_py/tests/test_control_protocol.py -v
+"""
+
+import asyncio
+import functools
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from btu_py.daemon import control_protocol
+from btu_py.daemon.control_protocol import ConnectionLimits, serve_control_connection
+from btu_py.lib import codec
+from btu_py.lib.control_client import ControlClient
+
+
+class TestControlConnection(unittest.IsolatedAsyncioTestCase):
+
+	async def _start_server(self, max_clients=4, **limits):
+		handler = functools.partial(
+			serve_control_connection,
+			transport_name="Test Socket",
+			client_slots=asyncio.Semaphore(max_clients),
+			limits=ConnectionLimits(**limits),
+		)
+		server = await asyncio.start_server(handler, "127.0.0.1", 0)
+		self.addAsyncCleanup(server.wait_closed)
+		self.addCleanup(server.close)
+		return server.sockets[0].getsockname()[1]
+
+	async def test_persistent_connection_answers_many_requests(self):
+		port = await self._start_server()
+		reader, writer = await asyncio.open_connection("127.0.0.1", port)
+		for request_id in range(3):
+			request = {"request_type": "echo", "request_content": request_id, "request_id": request_id}
+			writer.write((json.dumps(request) + "\n").encode())
+			await writer.drain()
+			response = json.loads(await reader.readline())
+			self.assertEqual(response["data"], request_id)
+			self.assertEqual(response["request_id"], request_id)
+		writer.close()
+		await writer.wait_closed()
+
+	async def test_pipelined_requests_echo_request_id(self):
+		port = await self._start_server()
+		reader, writer = await asyncio.open_connection("127.0.0.1", port)
+		frames = [
+			json.dumps({"request_type": "ping", "request_content": None, "request_id": f"r{each}"}) for each in range(5)
+		]
+		writer.write(("\n".join(frames) + "\n").encode())
+		await writer.drain()
+		responses = [json.loads(await reader.readline()) for _ in frames]
+		self.assertEqual(sorted(each["request_id"] for each in responses), [f"r{each}" for each in range(5)])
+		writer.close()
+		await writer.wait_closed()
+
+	@unittest.skipUnless(codec.msgpack_available(), "msgpack is not installed")
+	async def test_msgpack_request_gets_msgpack_response(self):
+		port = await self._start_server()
+		reader, writer = await asyncio.open_connection("127.0.0.1", port)
+		request = {"request_type": "echo", "request_content": [1, 2], "request_id": 7}
+		writer.write(codec.encode_frame(request, codec.MSGPACK))
+		await writer.drain()
+		self.assertEqual(await reader.readexactly(1), codec.MSGPACK_MAGIC)
+		length = int.from_bytes(await reader.readexactly(4), "big")
+		response = codec.MSGPACK.loads(await reader.readexactly(length))
+		self.assertEqual((response["data"], response["request_id"]), ([1, 2], 7))
+		writer.close()
+		await writer.wait_closed()
+
+	async def test_legacy_request_without_newline_closes_connection(self):
+		port = await self._start_server()
+		reader, writer = await asyncio.open_connection("127.0.0.1", port)
+		writer.write(json.dumps({"request_type": "ping", "request_content": None}).encode())
+		await writer.drain()
+		response = json.loads(await reader.readline())
+		self.assertEqual(response["data"], "pong")
+		self.assertEqual(await reader.read(), b"")  # closed by the daemon
+		writer.close()
+
+	async def test_newline_sent_separately_keeps_connection(self):
+		port = await self._start_server()
+		reader, writer = await asyncio.open_connection("127.0.0.1", port)
+		with mock.patch.object(control_protocol, "LEGACY_REQUEST_WAIT_SECS", 5):
+			writer.write(json.dumps({"request_type": "echo", "request_content": 1}).encode())
+			await writer.drain()
+			await asyncio.sleep(0.1)
+			writer.write(b"\n")
+			await writer.drain()
+			self.assertEqual(json.loads(await reader.readline())["data"], 1)
+			writer.write(b'{"request_type": "echo", "request_content": 2}\n')  # the connection is still open
+			await writer.drain()
+			self.assertEqual(json.loads(await reader.readline())["data"], 2)
+		writer.close()
+		await writer.wait_closed()
+
+	async def test_invalid_json_is_reported_and_connection_kept(self):
+		port = await self._start_server()
+		reader, writer = await asyncio.open_connection("127.0.0.1", port)
+		writer.write(b"not json\n")
+		writer.write(b'{"request_type": "ping", "request_content": null}\n')
+		await writer.drain()
+		responses = [json.loads(await reader.readline()) for _ in range(2)]  # order is not guaranteed
+		self.assertIn("Request body must be valid JSON.", [each.get("error") for each in responses])
+		self.assertIn("pong", [each.get("data") for each in responses])
+		writer.close()
+		await writer.wait_closed()
+
+	async def test_oversized_request_is_rejected(self):
+		port = await self._start_server(max_request_bytes=1024)
+		reader, writer = await asyncio.open_connection("127.0.0.1", port)
+		writer.write(b'{"request_type": "echo", "request_content": "' + b"x" * 70000)
+		await writer.drain()
+		response = json.loads(await reader.readline())
+		self.assertIn("exceeds 1024 bytes", response["error"])
+		writer.close()
+
+	async def test_idle_connection_is_closed(self):
+		port = await self._start_server(idle_timeout_secs=0.1)
+		reader, writer = await asyncio.open_connection("127.0.0.1", port)
+		self.assertEqual(await asyncio.wait_for(reader.read(), 2), b"")
+		writer.close()
+
+	async def test_too_many_clients_are_refused(self):
+		port = await self._start_server(max_clients=1)
+		_, first_writer = await asyncio.open_connection("127.0.0.1", port)
+		await asyncio.sleep(0.05)
+		reader, writer = await asyncio.open_connection("127.0.0.1", port)
+		response = json.loads(await reader.readline())
+		self.assertIn("Too many concurrent clients", response["error"])
+		writer.close()
+		first_writer.close()
+
+
+class TestUnixSocketConnection(unittest.IsolatedAsyncioTestCase):
+
+	async def test_persistent_client_over_unix_socket(self):
+		socket_dir = tempfile.TemporaryDirectory()
+		self.addCleanup(socket_dir.cleanup)
+		socket_path = os.path.join(socket_dir.name, "btu.sock")
+		handler = functools.partial(
+			serve_control_connection,
+			transport_name="Test Unix Socket",
+			client_slots=asyncio.Semaphore(4),
+			limits=ConnectionLimits(),
+		)
+		server = await asyncio.start_unix_server(handler, socket_path)
+		self.addAsyncCleanup(server.wait_closed)
+		self.addCleanup(server.close)
+
+		def run_client():
+			with ControlClient.unix(socket_path) as client:
+				pings = [client.request("ping")["data"] for _ in range(100)]
+				return pings, client.request("status")
+
+		with mock.patch("btu_py.lib.scheduler.rq_count_scheduled_tasks", return_value=5):
+			pings, status = await asyncio.get_running_loop().run_in_executor(None, run_client)
+		self.assertEqual(pings, ["pong"] * 100)
+		self.assertEqual(status["data"]["scheduled_tasks"], 5)
+		self.assertEqual(status["data"]["pid"], os.getpid())
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,183 @@
+"""
+Unit tests for btu_py.lib.direct_rq (the "direct_rq" dispatch mode).
+
+Run with:  python -m pytest btu_py/tests/test_direct_rq.py -v
+"""
+
+import asyncio
+import pickle
+import threading
+import unittest
+import zlib
+from types import SimpleNamespace
+from unittest import mock
+
+import requests
+
+from btu_py.lib import direct_rq
+from btu_py.lib.direct_rq import PayloadCache, enqueue_direct
+from btu_py.lib.retry import CircuitBreaker
+from btu_py.lib.structs import BtuTaskSchedule
+
+PICKLED = pickle.dumps(("btu.manual_tests.ping_now", None, (), {}))
+
+
+def make_schedule(schedule_id: str, task_key: str = "TASK-0001") -> BtuTaskSchedule:
+	return BtuTaskSchedule(
+		id=schedule_id,
+		task_key=task_key,
+		task_description="Ping",
+		enabled=True,
+		queue_name="short",
+		argument_overrides=None,
+		schedule_description="Every minute",
+		cron_string="* * * * *",
+		cron_timezone="UTC",
+	)
+
+
+class FakeClock:
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+
+class RecordingPipeline:
+	"""
+	Records the commands queued on a Redis pipeline.
+	"""
+
+	def __init__(self, transaction=True):
+		self.transaction = transaction
+		self.commands = []
+		self.executed = False
+
+	def __getattr__(self, command):
+		return lambda *args, **kwargs: self.commands.append((command, args, kwargs))
+
+	def execute(self):
+		self.executed = True
+
+
+class RecordingConnection:
+	def __init__(self):
+		self.pipelines = []
+
+	def pipeline(self, transaction=True):
+		self.pipelines.append(RecordingPipeline(transaction))
+		return self.pipelines[-1]
+
+
+class TestDirectRQ(unittest.TestCase):
+
+	def setUp(self):
+		self.fetches = []
+		self.failing = {}  # Task Schedule ID --> exception raised when fetching its payload
+
+		def fake_fetch(task_key, task_schedule_id):
+			self.fetches.append(task_schedule_id)
+			if task_schedule_id in self.failing:
+				raise self.failing[task_schedule_id]
+			return PICKLED
+
+		async def fake_task(task_key):
+			return SimpleNamespace(max_task_duration=900)
+
+		fake_config = SimpleNamespace(jobs_site_prefix="erp.example.com", get=lambda key, default=None: default)
+		self.clock = FakeClock()
+		self.cache = PayloadCache(ttl_secs=60, clock=self.clock)
+		self.breaker = CircuitBreaker("test", failure_threshold=2, reset_secs=60, clock=self.clock)
+		self.client = SimpleNamespace(get_pickled_task=fake_fetch)
+		patches = [
+			mock.patch.object(direct_rq, "get_frappe_client", lambda: self.client),
+			mock.patch.object(direct_rq, "get_frappe_circuit_breaker", lambda: self.breaker),
+			mock.patch.object(direct_rq.BtuTask, "init_from_task_key", staticmethod(fake_task)),
+			mock.patch.object(direct_rq, "get_payload_cache", lambda: self.cache),
+			mock.patch("btu_py.lib.btu_rq.get_config_data", lambda: fake_config),
+		]
+		for each in patches:
+			each.start()
+			self.addCleanup(each.stop)
+
+	def test_payload_is_cached_until_ttl(self):
+		schedule = make_schedule("TS-000001")
+		payload = asyncio.run(self.cache.get(schedule))
+		self.assertEqual(zlib.decompress(payload.data), PICKLED)
+		self.assertEqual(payload.timeout, 900)
+		asyncio.run(self.cache.get(schedule))
+		self.assertEqual(self.fetches, ["TS-000001"])
+		self.clock.now += 61
+		asyncio.run(self.cache.get(schedule))
+		self.assertEqual(self.fetches, ["TS-000001", "TS-000001"])
+
+	def test_stale_payload_used_when_refresh_fails(self):
+		schedule = make_schedule("TS-000001")
+		first = asyncio.run(self.cache.get(schedule))
+		self.clock.now += 61
+		self.failing = {"TS-000001": OSError("Frappe web server is offline")}
+		self.assertIs(asyncio.run(self.cache.get(schedule)), first)
+		# A different Task means the cached payload is wrong, not just old.
+		with self.assertRaises(IOError):
+			asyncio.run(self.cache.get(make_schedule("TS-000001", task_key="TASK-0002")))
+
+	def test_enqueue_writes_all_jobs_in_one_transaction(self):
+		self.failing = {"TS-000002": OSError("Frappe web server is offline")}
+		conn = RecordingConnection()
+		results = asyncio.run(
+			enqueue_direct([make_schedule("TS-000001"), make_schedule("TS-000002"), make_schedule("TS-000003")], conn)
+		)
+		self.assertEqual(results["TS-000002"]["status"], "error")
+		self.assertEqual(results["TS-000001"]["status"], "ok")
+
+		self.assertEqual(len(conn.pipelines), 1)
+		pipeline = conn.pipelines[0]
+		self.assertTrue(pipeline.transaction and pipeline.executed)
+		self.assertEqual([each[0] for each in pipeline.commands], ["hset", "sadd", "rpush"] * 2)
+
+		_, (job_hash_key,), kwargs = pipeline.commands[0]
+		job_id = results["TS-000001"]["job_id"]
+		self.assertEqual(job_hash_key, f"rq:job:{job_id}")
+		self.assertTrue(job_id.startswith("erp.example.com|"))
+		mapping = kwargs["mapping"]
+		self.assertEqual((mapping["origin"], mapping["status"], mapping["timeout"]), ("short", "queued", 900))
+		self.assertEqual(zlib.decompress(mapping["data"]), PICKLED)
+		self.assertEqual(pipeline.commands[2][1], ("rq:queue:short", job_id))
+
+	def test_missing_payloads_are_fetched_concurrently(self):
+		all_fetching = threading.Barrier(3, timeout=5)  # broken, unless the three fetches overlap
+
+		def fetch_together(task_key, task_schedule_id):
+			all_fetching.wait()
+			return PICKLED
+
+		self.client.get_pickled_task = fetch_together
+		schedules = [make_schedule(f"TS-00000{each}") for each in range(3)]
+		results = asyncio.run(enqueue_direct(schedules, RecordingConnection()))
+		self.assertEqual([each["status"] for each in results.values()], ["ok"] * 3)
+
+	def test_unreachable_web_server_opens_the_circuit_breaker(self):
+		schedule = make_schedule("TS-000001")
+		first = asyncio.run(self.cache.get(schedule))
+		self.clock.now += 61
+		self.failing = {"TS-000001": requests.ConnectionError("Connection refused")}
+		for _ in range(2):
+			self.assertIs(asyncio.run(self.cache.get(schedule)), first)
+		self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+		# While open, the stale payload is used without asking the web server.
+		self.assertIs(asyncio.run(self.cache.get(schedule)), first)
+		self.assertEqual(self.fetches, ["TS-000001"] * 3)
+		with self.assertRaises(OSError):
+			asyncio.run(self.cache.get(make_schedule("TS-000002")))
+
+		# Errors returned by the web server do not count against it.
+		self.clock.now += 60
+		self.failing = {"TS-000001": OSError("Unexpected response code from Frappe Framework web server: 500")}
+		self.assertIs(asyncio.run(self.cache.get(schedule)), first)
+		self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+
+if __name__ == "__main__":
+	unittest.main()
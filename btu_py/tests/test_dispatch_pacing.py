@@ -0,0 +1,77 @@
+"""
+Unit tests for btu_py.lib.dispatch_pacing.
+
+Run with:  python -m pytest btu_py/tests/test_dispatch_pacing.py -v
+"""
+
+import time
+import unittest
+from types import SimpleNamespace
+
+from btu_py.lib.dispatch_pacing import DispatchPacer, TokenBucket, jitter_offset
+
+
+def _task(task_schedule_id: str, unix_time: int):
+	"""Stand-in for RQScheduledTask; only these two attributes are used."""
+	return SimpleNamespace(task_schedule_id=task_schedule_id, next_execution_as_unix_timestamp=unix_time)
+
+
+class FakeClock:
+	def __init__(self):
+		self.now = 0.0
+
+	def __call__(self):
+		return self.now
+
+
+class TestJitter(unittest.TestCase):
+
+	def test_offset_is_deterministic_and_within_window(self):
+		offsets = [jitter_offset(f"TS-{each:06d}", 30) for each in range(500)]
+		self.assertEqual(offsets, [jitter_offset(f"TS-{each:06d}", 30) for each in range(500)])
+		self.assertTrue(all(0 <= each < 30 for each in offsets))
+		self.assertGreater(len({int(each) for each in offsets}), 20)  # spread across the window
+
+	def test_zero_window_means_no_jitter(self):
+		self.assertEqual(jitter_offset("TS-000001", 0), 0.0)
+
+	def test_due_defers_until_offset_has_passed(self):
+		pacer = DispatchPacer(jitter_window_secs=30, max_lateness_secs=60)
+		tasks = [_task(f"TS-{each}", 1000) for each in range(50)]
+		due_now = pacer.due(tasks, now=1000)
+		self.assertLess(len(due_now), len(tasks))
+		self.assertEqual(len(pacer.due(tasks, now=1030)), len(tasks))
+
+	def test_due_never_defers_past_the_lateness_bound(self):
+		pacer = DispatchPacer(jitter_window_secs=30, max_lateness_secs=30)
+		tasks = [_task(f"TS-{each}", 1000) for each in range(50)]
+		self.assertEqual(len(pacer.due(tasks, now=1001, next_poll_in_secs=60)), len(tasks))
+
+	def test_jitter_window_is_capped_by_lateness_bound(self):
+		self.assertEqual(DispatchPacer(jitter_window_secs=300, max_lateness_secs=20).jitter_window_secs, 20)
+
+
+class TestTokenBucket(unittest.TestCase):
+
+	def test_burst_then_rate(self):
+		clock = FakeClock()
+		bucket = TokenBucket(rate_per_sec=2, burst=3, clock=clock)
+		self.assertEqual([bucket.try_acquire() for _ in range(4)], [True, True, True, False])
+		self.assertAlmostEqual(bucket.seconds_until_available(), 0.5)
+		clock.now = 0.5
+		self.assertTrue(bucket.try_acquire())
+		self.assertFalse(bucket.try_acquire())
+
+
+class TestWaitForTurn(unittest.IsolatedAsyncioTestCase):
+
+	async def test_bound_reached_dispatches_without_waiting(self):
+		pacer = DispatchPacer(rate_limit_per_sec=0.001, burst=1, max_lateness_secs=5)
+		await pacer.wait_for_turn(time.time())  # uses the only token
+		started = time.monotonic()
+		await pacer.wait_for_turn(time.time() - 10)  # already later than the bound
+		self.assertLess(time.monotonic() - started, 0.5)
+
+
+if __name__ == "__main__":
+	unittest.main()
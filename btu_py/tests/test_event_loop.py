@@ -0,0 +1,49 @@
+"""
+Unit tests for btu_py.lib.event_loop (choosing and tuning the daemon's event loop).
+
+Run with:  python -m pytest btu_py/tests/test_event_loop.py -v
+"""
+
+import asyncio
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from btu_py.lib import event_loop
+
+
+class TestEventLoop(unittest.TestCase):
+
+	def test_loop_factory(self):
+		self.assertIsNone(event_loop.loop_factory("asyncio"))
+		with self.assertRaises(ValueError):
+			event_loop.loop_factory("trio")
+
+	def test_uvloop_falls_back_to_asyncio_when_not_installed(self):
+		fake_config = SimpleNamespace(get=lambda key, default=None: {"event_loop": "uvloop"}.get(key, default))
+		with (
+			mock.patch.object(event_loop, "uvloop_available", return_value=False),
+			mock.patch("btu_py.get_config_data", lambda: fake_config),
+			mock.patch("btu_py.get_logger") as get_logger,
+		):
+			self.assertEqual(event_loop.resolve_loop_name(None), "asyncio")
+			self.assertEqual(event_loop.resolve_loop_name("ASYNCIO"), "asyncio")
+		get_logger.return_value.warning.assert_called_once()
+
+	def test_run_sizes_the_default_executor(self):
+		async def thread_name():
+			return await asyncio.to_thread(lambda: threading.current_thread().name)
+
+		self.assertTrue(event_loop.run(thread_name(), executor_workers=2).startswith("btu-executor"))
+		self.assertFalse(event_loop.run(thread_name()).startswith("btu-executor"))
+
+	def test_benchmark_measures_both_workloads(self):
+		result = event_loop.benchmark_loop("asyncio", connections=2, requests_per_connection=20)
+		self.assertEqual(result["loop"], "asyncio")
+		self.assertGreater(result["tcp_requests_per_sec"], 0)
+		self.assertGreater(result["executor_calls_per_sec"], 0)
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,53 @@
+"""
+Unit tests for btu_py.lib.frappe_client, against a local stub of the Frappe web server.
+
+Run with:  python -m pytest btu_py/tests/test_frappe_client.py -v
+"""
+
+import unittest
+
+from btu_py.lib.frappe_client import ENDPOINT_ENQUEUE, ENDPOINT_ENQUEUE_BULK, ENDPOINT_PICKLED_TASK, FrappeClient
+from btu_py.tests.frappe_stub import FrappeStubServer
+
+KEYS = [f"TS-{each:06d}" for each in range(300)]
+
+
+class TestFrappeClient(unittest.TestCase):
+
+	def test_bulk_endpoint_sends_one_request(self):
+		with FrappeStubServer(supports_bulk=True, failing_keys={"TS-000007"}) as stub:
+			results = FrappeClient(stub.base_url, {}).enqueue_many(KEYS)
+		self.assertEqual(stub.requests, [(ENDPOINT_ENQUEUE_BULK, KEYS)])
+		self.assertEqual(results["TS-000001"]["status"], "ok")
+		self.assertEqual(results["TS-000007"]["status"], "error")
+
+	def test_falls_back_to_one_request_per_key(self):
+		with FrappeStubServer(supports_bulk=False, failing_keys={"TS-000002"}) as stub:
+			client = FrappeClient(stub.base_url, {})
+			results = client.enqueue_many(KEYS[:3])
+			self.assertFalse(client.bulk_supported)
+			client.enqueue_many(KEYS[3:5])  # the unsupported endpoint is not tried again
+		self.assertEqual(
+			stub.requests,
+			[(ENDPOINT_ENQUEUE_BULK, None)] + [(ENDPOINT_ENQUEUE, each) for each in KEYS[:5]],
+		)
+		self.assertEqual([results[each]["status"] for each in KEYS[:3]], ["ok", "ok", "error"])
+
+	def test_single_enqueue_raises_on_error(self):
+		with FrappeStubServer(failing_keys={"TS-000001"}) as stub:
+			client = FrappeClient(stub.base_url, {})
+			client.enqueue_for_next_available_worker("TS-000000")
+			with self.assertRaises(IOError):
+				client.enqueue_for_next_available_worker("TS-000001")
+
+	def test_pickled_task(self):
+		with FrappeStubServer(failing_keys={"TASK-0002"}) as stub:
+			client = FrappeClient(stub.base_url, {})
+			self.assertEqual(client.get_pickled_task("TASK-0001", "TS-000001"), b"pickled TASK-0001")
+			with self.assertRaises(OSError):
+				client.get_pickled_task("TASK-0002")
+		self.assertEqual(stub.requests, [(ENDPOINT_PICKLED_TASK, "TASK-0001"), (ENDPOINT_PICKLED_TASK, "TASK-0002")])
+
+
+if __name__ == "__main__":
+	unittest.main()
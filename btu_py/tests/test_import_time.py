@@ -0,0 +1,62 @@
+"""
+Import-time budget for the btu-py CLI, measured with 'python -X importtime' in a fresh interpreter.
+
+The budget (milliseconds) can be changed with the environment variable BTU_IMPORT_BUDGET_MS, e.g. on slow CI machines.
+
+Run with:  python -m pytest btu_py/tests/test_import_time.py -v
+"""
+
+import os
+import subprocess
+import sys
+import unittest
+
+DEFAULT_BUDGET_MS = 150
+
+# Third-party libraries that cheap commands (e.g. 'btu-py about' or 'btu-py list-scheduled-tasks') must not load.
+HEAVY_MODULES = ("databases", "sqlalchemy", "requests", "rq", "slack_sdk", "croniter")
+
+
+def _cumulative_import_us(module_name: str) -> int:
+	"""
+	The cumulative import time of 'module_name', in microseconds, according to '-X importtime'.
+	"""
+	completed = subprocess.run(
+		[sys.executable, "-X", "importtime", "-c", f"import {module_name}"],
+		capture_output=True,
+		text=True,
+		check=True,
+	)
+	for line in completed.stderr.splitlines():
+		# import time: self [us] | cumulative | imported package
+		columns = line.split("|")
+		if len(columns) == 3 and columns[2].strip() == module_name:
+			return int(columns[1])
+	raise AssertionError(f"'-X importtime' did not report module '{module_name}'.")
+
+
+def _modules_loaded_by(module_name: str) -> set[str]:
+	code = f"import sys, {module_name}; print(' '.join(sys.modules))"
+	completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+	return set(completed.stdout.split())
+
+
+class TestImportTime(unittest.TestCase):
+
+	def test_cli_cold_start_within_budget(self):
+		budget_ms = float(os.environ.get("BTU_IMPORT_BUDGET_MS", DEFAULT_BUDGET_MS))
+		best_ms = min(_cumulative_import_us("btu_py.cli") for _ in range(3)) / 1000  # best of 3 runs, to reduce noise
+		message = f"Importing btu_py.cli took {best_ms:.1f} ms; the budget is {budget_ms} ms."
+		self.assertLessEqual(best_ms, budget_ms, message)
+
+	def test_cli_does_not_load_heavy_dependencies(self):
+		loaded = _modules_loaded_by("btu_py.cli")
+		self.assertEqual([each for each in HEAVY_MODULES + ("redis", "importlib.metadata") if each in loaded], [])
+
+	def test_scheduler_does_not_load_heavy_dependencies(self):
+		loaded = _modules_loaded_by("btu_py.lib.scheduler")
+		self.assertEqual([each for each in HEAVY_MODULES if each in loaded], [])
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,118 @@
+"""
+Unit tests for btu_py.lib.internal_queue.
+
+Run with:  python -m pytest btu_py/tests/test_internal_queue.py -v
+"""
+
+import asyncio
+import unittest
+
+from btu_py.lib.internal_queue import LANE_INTERACTIVE, LANE_REFILL, LANE_RESCHEDULE, CoalescingQueue
+
+
+class TestCoalescingQueue(unittest.IsolatedAsyncioTestCase):
+
+	async def test_duplicates_are_coalesced_in_order(self):
+		queue = CoalescingQueue()
+		for each in ("TS-1", "TS-2", "TS-1", "TS-3", "TS-2"):
+			await queue.put(each)
+		self.assertEqual(queue.qsize(), 3)
+		self.assertEqual(queue.coalesced, 2)
+		self.assertEqual([await queue.get() for _ in range(3)], ["TS-1", "TS-2", "TS-3"])
+		self.assertTrue(queue.empty())
+
+	async def test_taken_item_can_be_queued_again(self):
+		queue = CoalescingQueue()
+		self.assertTrue(await queue.put("TS-1"))
+		self.assertEqual(await queue.get(), "TS-1")
+		self.assertTrue(await queue.put("TS-1"))
+		self.assertEqual(queue.coalesced, 0)
+
+	async def test_get_waits_for_put(self):
+		queue = CoalescingQueue()
+		getter = asyncio.create_task(queue.get())
+		await asyncio.sleep(0)
+		self.assertFalse(getter.done())
+		queue.put_nowait("TS-9")
+		self.assertEqual(await asyncio.wait_for(getter, 1), "TS-9")
+
+	async def test_get_nowait_on_empty_queue_raises(self):
+		with self.assertRaises(asyncio.QueueEmpty):
+			CoalescingQueue().get_nowait()
+
+
+class TestPriorityLanes(unittest.IsolatedAsyncioTestCase):
+
+	async def test_higher_lanes_are_served_first(self):
+		queue = CoalescingQueue()
+		for each in range(1000):
+			queue.put_nowait(f"TS-{each}", LANE_REFILL)
+		queue.put_nowait("TS-R", LANE_RESCHEDULE)
+		queue.put_nowait("TS-I", LANE_INTERACTIVE)
+		self.assertEqual(queue.lane_depths(), {LANE_INTERACTIVE: 1, LANE_RESCHEDULE: 1, LANE_REFILL: 1000})
+		self.assertEqual([await queue.get() for _ in range(3)], ["TS-I", "TS-R", "TS-0"])
+
+	async def test_put_in_higher_lane_promotes(self):
+		queue = CoalescingQueue()
+		queue.put_nowait("TS-1", LANE_REFILL)
+		queue.put_nowait("TS-2", LANE_REFILL)
+		self.assertTrue(queue.put_nowait("TS-2", LANE_INTERACTIVE))
+		self.assertFalse(queue.put_nowait("TS-2", LANE_REFILL))  # already waiting in a higher lane
+		self.assertEqual((queue.qsize(), queue.promoted, queue.coalesced), (2, 1, 1))
+		self.assertEqual(await queue.get(), "TS-2")
+
+	async def test_get_batch_takes_what_is_waiting(self):
+		queue = CoalescingQueue()
+		for each in ("TS-1", "TS-2", "TS-3"):
+			queue.put_nowait(each, LANE_REFILL)
+		self.assertEqual(await queue.get_batch(2), ["TS-1", "TS-2"])
+		self.assertEqual(await queue.get_batch(10), ["TS-3"])
+
+	async def test_requeue_puts_taken_items_back_in_front(self):
+		queue = CoalescingQueue(capacity=3)
+		queue.put_nowait("TS-I", LANE_INTERACTIVE)
+		for each in ("TS-1", "TS-2"):
+			queue.put_nowait(each, LANE_REFILL)
+		lanes = {}
+		self.assertEqual(await queue.get_batch(10, lanes), ["TS-I", "TS-1", "TS-2"])
+		self.assertEqual(lanes, {"TS-I": LANE_INTERACTIVE, "TS-1": LANE_REFILL, "TS-2": LANE_REFILL})
+
+		queue.put_nowait("TS-2", LANE_RESCHEDULE)  # waiting again: left where it is
+		await queue.put("TS-3", LANE_REFILL)
+		self.assertEqual(queue.requeue(lanes), 2)
+		self.assertEqual(
+			queue.items_by_lane(), {LANE_INTERACTIVE: ["TS-I"], LANE_RESCHEDULE: ["TS-2"], LANE_REFILL: ["TS-1", "TS-3"]}
+		)
+		self.assertTrue(queue.full())
+
+	def test_unknown_lane_is_rejected(self):
+		with self.assertRaises(ValueError):
+			CoalescingQueue().put_nowait("TS-1", "urgent")
+
+
+class TestCapacity(unittest.IsolatedAsyncioTestCase):
+
+	async def test_refill_waits_for_space(self):
+		queue = CoalescingQueue(capacity=2)
+		await queue.put("TS-1", LANE_REFILL)
+		await queue.put("TS-2", LANE_REFILL)
+		blocked = asyncio.create_task(queue.put("TS-3", LANE_REFILL))
+		await asyncio.sleep(0)
+		self.assertFalse(blocked.done())
+		self.assertEqual(queue.saturated, 1)
+		self.assertEqual(await queue.get(), "TS-1")
+		await asyncio.wait_for(blocked, 1)
+		self.assertEqual(queue.lane_depths()[LANE_REFILL], 2)
+
+	async def test_interactive_and_duplicates_bypass_capacity(self):
+		queue = CoalescingQueue(capacity=1)
+		await queue.put("TS-1", LANE_REFILL)
+		self.assertFalse(await queue.put("TS-1", LANE_REFILL))  # coalesced, so no space needed
+		self.assertTrue(await queue.put("TS-2", LANE_INTERACTIVE))
+		self.assertEqual((queue.qsize(), queue.high_water), (2, 2))
+		with self.assertRaises(asyncio.QueueFull):
+			queue.put_nowait("TS-3", LANE_REFILL)
+
+
+if __name__ == "__main__":
+	unittest.main()
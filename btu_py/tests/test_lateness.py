@@ -0,0 +1,72 @@
+"""
+Unit tests for btu_py.lib.lateness.
+
+Run with:  python -m pytest btu_py/tests/test_lateness.py -v
+
+All timestamps are passed explicitly, so no configuration file or running services are required.
+"""
+
+import unittest
+
+from btu_py.lib.lateness import LatenessTracker, RollingHistogram
+
+NOW = 1_800_000_000.0  # an arbitrary, fixed Unix time
+
+
+class TestRollingHistogram(unittest.TestCase):
+
+	def test_statistics_of_recorded_samples(self):
+		histogram = RollingHistogram(window_secs=600, slice_count=6)
+		for value in (0.2, 0.4, 3.0, 45.0):
+			histogram.record(value, NOW)
+		self.assertEqual(histogram.count(NOW), 4)
+		self.assertEqual(histogram.maximum(NOW), 45.0)
+		self.assertAlmostEqual(histogram.mean(NOW), 12.15)
+		self.assertEqual(histogram.percentile(50, NOW), 0.5)  # bucket upper bound
+		self.assertEqual(histogram.percentile(99, NOW), 45.0)  # clamped to the observed maximum
+
+	def test_samples_age_out_of_the_window(self):
+		histogram = RollingHistogram(window_secs=600, slice_count=6)
+		histogram.record(10.0, NOW)
+		histogram.record(1.0, NOW + 500)
+		self.assertEqual(histogram.count(NOW + 500), 2)
+		self.assertEqual(histogram.count(NOW + 700), 1)
+		self.assertEqual(histogram.maximum(NOW + 700), 1.0)
+
+	def test_recycled_slice_is_cleared(self):
+		histogram = RollingHistogram(window_secs=600, slice_count=6)
+		histogram.record(10.0, NOW)
+		histogram.record(2.0, NOW + 600)  # lands in the same slice index, one full window later
+		self.assertEqual(histogram.count(NOW + 600), 1)
+		self.assertEqual(histogram.maximum(NOW + 600), 2.0)
+
+	def test_negative_values_are_clamped(self):
+		histogram = RollingHistogram()
+		histogram.record(-3.0, NOW)
+		self.assertEqual(histogram.maximum(NOW), 0.0)
+
+
+class TestLatenessTracker(unittest.TestCase):
+
+	def test_record_dispatch_splits_phases(self):
+		tracker = LatenessTracker(window_secs=600)
+		samples = tracker.record_dispatch("TS-000001", 1000, 1012.0, 0.05, 0.75, 1013.0)
+		self.assertEqual(samples, {"lateness": 12.0, "sql": 0.05, "frappe": 0.75, "end_to_end": 13.0})
+
+	def test_worst_offenders_are_ranked_highest_first(self):
+		tracker = LatenessTracker(window_secs=600)
+		tracker.record("TS-000001", "lateness", 2.0, NOW)
+		tracker.record("TS-000002", "lateness", 40.0, NOW)
+		tracker.record("TS-000003", "frappe", 9.0, NOW)
+		offenders = tracker.worst_offenders("lateness", "max", limit=5, now=NOW)
+		self.assertEqual([each["task_schedule_id"] for each in offenders], ["TS-000002", "TS-000001"])
+		self.assertEqual(offenders[0]["lateness"]["max"], 40.0)
+
+	def test_unknown_metric_is_rejected(self):
+		tracker = LatenessTracker()
+		with self.assertRaises(ValueError):
+			tracker.record("TS-000001", "bogus", 1.0, NOW)
+
+
+if __name__ == "__main__":
+	unittest.main()
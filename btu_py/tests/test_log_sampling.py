@@ -0,0 +1,86 @@
+"""
+Unit tests for btu_py.lib.log_sampling.
+
+Run with:  python -m pytest btu_py/tests/test_log_sampling.py -v
+"""
+
+import logging
+import unittest
+from types import SimpleNamespace
+
+from btu_py.lib.log_sampling import SampledLogger, ScheduledTaskListingLogger, summarize_scheduled_tasks
+
+LOGGER = logging.getLogger("btu_py.tests.log_sampling")
+LOGGER.setLevel(logging.DEBUG)
+
+
+def _task(task_schedule_id: str, unix_time: int):
+	"""Stand-in for RQScheduledTask; only these two attributes are used."""
+	return SimpleNamespace(task_schedule_id=task_schedule_id, next_execution_as_unix_timestamp=unix_time)
+
+
+class TestSampledLogger(unittest.TestCase):
+
+	def test_sample_rate_writes_one_of_every_n(self):
+		sampler = SampledLogger(lambda: LOGGER, sample_rate=3, max_per_interval=100, interval_secs=3600)
+		with self.assertLogs(LOGGER, logging.DEBUG) as captured:
+			written = [sampler.debug("item %s", each) for each in range(7)]
+		self.assertEqual(written, [True, False, False, True, False, False, True])
+		self.assertEqual(len(captured.records), 3)
+
+	def test_max_per_interval_caps_output(self):
+		sampler = SampledLogger(lambda: LOGGER, sample_rate=1, max_per_interval=2, interval_secs=3600)
+		with self.assertLogs(LOGGER, logging.DEBUG) as captured:
+			for each in range(5):
+				sampler.debug("item %s", each)
+		self.assertEqual(len(captured.records), 2)
+
+	def test_suppressed_count_is_reported_when_interval_ends(self):
+		sampler = SampledLogger(lambda: LOGGER, sample_rate=1, max_per_interval=0, interval_secs=0)
+		with self.assertLogs(LOGGER, logging.DEBUG) as captured:
+			sampler.debug("dropped")
+			sampler.debug("dropped again")
+		self.assertIn("1 similar messages suppressed", captured.records[-1].getMessage())
+
+
+class TestSummarizeScheduledTasks(unittest.TestCase):
+
+	def test_first_cycle_reports_counts_only(self):
+		summary, snapshot = summarize_scheduled_tasks([_task("TS-1", 200), _task("TS-1", 100), _task("TS-2", 300)], None)
+		self.assertEqual(summary["count"], 3)
+		self.assertEqual(summary["schedules"], 2)
+		self.assertEqual((summary["min_next_run"], summary["max_next_run"]), (100, 300))
+		self.assertEqual(summary["added"], [])
+		self.assertEqual(snapshot, {"TS-1": 100, "TS-2": 300})
+
+	def test_changes_since_previous_cycle(self):
+		previous = {"TS-1": 100, "TS-2": 300}
+		summary, _ = summarize_scheduled_tasks([_task("TS-1", 160), _task("TS-3", 400)], previous)
+		self.assertEqual(summary["added"], ["TS-3"])
+		self.assertEqual(summary["removed"], ["TS-2"])
+		self.assertEqual(summary["changed"], ["TS-1"])
+
+
+class TestScheduledTaskListingLogger(unittest.TestCase):
+
+	def test_summary_mode_writes_a_single_line(self):
+		listing = ScheduledTaskListingLogger(lambda: LOGGER, mode="summary")
+		with self.assertLogs(LOGGER, logging.INFO) as captured:
+			listing.log_cycle([_task(f"TS-{each}", 100 + each) for each in range(50)])
+		self.assertEqual(len(captured.records), 1)
+
+	def test_diff_mode_logs_only_changes(self):
+		listing = ScheduledTaskListingLogger(lambda: LOGGER, mode="diff")
+		listing.log_cycle([_task("TS-1", 100), _task("TS-2", 200)])
+		with self.assertLogs(LOGGER, logging.INFO) as captured:
+			listing.log_cycle([_task("TS-1", 100), _task("TS-2", 260)])
+		self.assertEqual(len(captured.records), 2)  # the summary, plus one line for TS-2
+		self.assertIn("TS-2 changed", captured.records[1].getMessage())
+
+	def test_unknown_mode_is_rejected(self):
+		with self.assertRaises(ValueError):
+			ScheduledTaskListingLogger(lambda: LOGGER, mode="verbose")
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,52 @@
+"""
+Unit tests for btu_py.lib.misfire (what to do with instances missed during downtime).
+
+Run with:  python -m pytest btu_py/tests/test_misfire.py -v
+"""
+
+import unittest
+
+from btu_py.lib.misfire import MISFIRE_COALESCE, MISFIRE_FIRE_ALL, MISFIRE_SKIP_STALE, apply_misfire_policy
+from btu_py.lib.scheduler import RQScheduledTask
+
+NOW = 1_742_490_000
+
+
+def _task(task_schedule_id: str, minutes_late: int) -> RQScheduledTask:
+	return RQScheduledTask.from_tuple(task_schedule_id, NOW - 60 * minutes_late)
+
+
+def _tsiks(scheduled_tasks: list) -> list[str]:
+	return [str(each.to_tsik()) for each in scheduled_tasks]
+
+
+class TestMisfirePolicy(unittest.TestCase):
+
+	def setUp(self):
+		# An hourly job missed three times, and a job that is only slightly late.
+		self.due = [_task("TS-1", 180), _task("TS-1", 120), _task("TS-2", 1), _task("TS-1", 60)]
+
+	def test_coalesce_keeps_latest_instance_per_schedule(self):
+		keep, discard = apply_misfire_policy(self.due, NOW, MISFIRE_COALESCE)
+		self.assertEqual(_tsiks(keep), _tsiks([self.due[2], self.due[3]]))
+		self.assertEqual(_tsiks(discard), _tsiks(self.due[:2]))
+
+	def test_skip_stale_discards_instances_outside_grace_period(self):
+		keep, discard = apply_misfire_policy(self.due, NOW, MISFIRE_SKIP_STALE, grace_secs=3600)
+		self.assertEqual(_tsiks(keep), _tsiks([self.due[2], self.due[3]]))
+		keep, discard = apply_misfire_policy(self.due, NOW, MISFIRE_SKIP_STALE, grace_secs=300)
+		self.assertEqual(_tsiks(keep), _tsiks([self.due[2]]))
+		self.assertEqual(len(discard), 3)
+
+	def test_fire_all_keeps_everything(self):
+		keep, discard = apply_misfire_policy(self.due, NOW, MISFIRE_FIRE_ALL)
+		self.assertEqual(_tsiks(keep), _tsiks(self.due))
+		self.assertEqual(discard, [])
+
+	def test_unknown_policy(self):
+		with self.assertRaises(ValueError):
+			apply_misfire_policy(self.due, NOW, "sometimes")
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,87 @@
+"""
+Unit tests for btu_py.lib.reconcile (repairing the scheduled-tasks sorted set).
+
+Run with:  python -m pytest btu_py/tests/test_reconcile.py -v
+"""
+
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from btu_py.daemon import coroutines, snapshot
+from btu_py.lib.lateness import LatenessTracker
+from btu_py.lib.reconcile import ReconcileReport, diff_scheduled_tasks
+
+NOW = 1_742_490_000
+
+
+class TestDiffScheduledTasks(unittest.TestCase):
+
+	def setUp(self):
+		self.expected = {
+			"TS-1": ("TS-1|1742493600", 1742493600),  # unchanged
+			"TS-2": ("TS-2|1742490300", 1742490300),  # cron string changed
+			"TS-3": ("TS-3|1742497200", 1742497200),  # never scheduled
+			"TS-4": ("TS-4|1742493600", 1742493600),  # due now; its next execution is not written yet
+			"TS-5": None,  # next execution unknown (e.g. an invalid cron string)
+		}
+		self.members = [
+			("TS-1|1742493600", 1742493600),
+			("TS-2|1742493600", 1742493600),
+			("TS-4|1742490000", 1742490000),
+			("TS-5|1742493600", 1742493600),
+			("TS-9|1742493600", 1742493600),
+		]
+
+	def test_counts_and_repairs(self):
+		report = diff_scheduled_tasks(self.expected, self.members, ["TS-9|1742480000", "TS-1|1742480000"], NOW + 60)
+		self.assertEqual((report.scanned, report.orphans, report.stale, report.missing), (5, 1, 1, 1))
+		self.assertEqual(report.retry_orphans, 1)
+		self.assertEqual(report.to_remove, ["TS-2|1742493600", "TS-9|1742493600"])
+		self.assertEqual(report.retry_to_remove, ["TS-9|1742480000"])
+		self.assertEqual(report.to_add, {"TS-2|1742490300": 1742490300, "TS-3|1742497200": 1742497200})
+		self.assertEqual(report.orphan_ids, {"TS-9"})
+
+	def test_nothing_to_do(self):
+		members = [("TS-1|1742493600", 1742493600)]
+		report = diff_scheduled_tasks({"TS-1": ("TS-1|1742493600", 1742493600)}, members, [], NOW)
+		self.assertEqual((report.orphans, report.stale, report.missing), (0, 0, 0))
+		self.assertEqual((report.to_remove, report.to_add), ([], {}))
+
+
+class TestPeriodicReconcile(unittest.IsolatedAsyncioTestCase):
+
+	async def test_orphans_are_forgotten(self):
+		catalog, tracker = snapshot.ScheduleCatalog(), LatenessTracker()
+		for each_id in ("TS-1", "TS-9"):
+			catalog.entries[each_id] = {}
+			tracker.record(each_id, "lateness", 1.5, now=NOW)
+		passes = []
+
+		async def one_pass(seconds):
+			if passes:
+				raise asyncio.CancelledError
+			passes.append(seconds)
+
+		async def reconcile():
+			return ReconcileReport(orphans=1, orphan_ids={"TS-9"})
+
+		fake_config = SimpleNamespace(get=lambda key, default=None: default)
+		with (
+			mock.patch("btu_py.get_config_data", lambda: fake_config),
+			mock.patch("btu_py.get_logger"),
+			mock.patch.object(coroutines, "get_schedule_catalog", lambda: catalog),
+			mock.patch.object(coroutines, "get_lateness_tracker", lambda: tracker),
+			mock.patch.object(coroutines.asyncio, "sleep", one_pass),
+			mock.patch("btu_py.lib.reconcile.reconcile_scheduled_tasks", reconcile),
+			self.assertRaises(asyncio.CancelledError),
+		):
+			await coroutines.reconcile_scheduled_tasks_periodically()
+
+		self.assertEqual(list(catalog.entries), ["TS-1"])
+		self.assertEqual([each["task_schedule_id"] for each in tracker.worst_offenders(now=NOW)], ["TS-1"])
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,136 @@
+"""
+Unit tests for the Redis RPC listener (btu_py.daemon.coroutines): popping, decoding and acknowledging commands.
+
+Run with:  python -m pytest btu_py/tests/test_redis_rpc.py -v
+"""
+
+import json
+import unittest
+from unittest import mock
+
+import redis
+
+from btu_py.daemon import coroutines
+from btu_py.lib import btu_rq, codec
+
+
+class FakeRawRedis:
+	"""
+	The list commands used by the listener, on a connection created with 'decode_responses=False': whatever is
+	pushed is stored, and returned, as bytes.
+	"""
+
+	def __init__(self, rpop_count_supported: bool = True):
+		self.lists = {}
+		self.rpop_count_supported = rpop_count_supported
+
+	@staticmethod
+	def _as_bytes(value) -> bytes:
+		return value.encode("utf-8") if isinstance(value, str) else value
+
+	def lpush(self, key, *values):
+		self.lists.setdefault(key, []).extend(self._as_bytes(each) for each in values)
+
+	def expire(self, key, seconds):
+		pass
+
+	def brpop(self, keys, timeout=0):
+		for each_key in keys:
+			if self.lists.get(each_key):
+				return self._as_bytes(each_key), self.lists[each_key].pop(0)
+		return None
+
+	def rpop(self, key, count=None):
+		if count is not None and not self.rpop_count_supported:
+			raise redis.exceptions.ResponseError("wrong number of arguments for 'rpop' command")
+		values = self.lists.get(key, [])
+		popped = [values.pop(0) for _ in range(min(count or 1, len(values)))]
+		return popped or None
+
+	def pipeline(self, transaction=True):
+		return FakePipeline(self)
+
+
+class FakePipeline:
+	def __init__(self, connection):
+		self.connection = connection
+		self.commands = []
+
+	def __len__(self):
+		return len(self.commands)
+
+	def __getattr__(self, name):
+		return lambda *args: self.commands.append((name, args))
+
+	def execute(self):
+		return [getattr(self.connection, name)(*args) for name, args in self.commands]
+
+
+class TestPopAndAckCommands(unittest.TestCase):
+
+	def setUp(self):
+		patcher = mock.patch.object(coroutines, "get_logger")
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		self.addCleanup(setattr, coroutines, "_rpop_count_supported", True)
+		self.redis = FakeRawRedis()
+
+	def send(self, command: dict, encoding=codec.JSON):
+		# As the Frappe application does: LPUSH, so the oldest command is at the right.
+		payload = json.dumps(command) if encoding is codec.JSON else codec.encode_message(command, encoding)
+		self.redis.lpush(coroutines.REDIS_COMMAND_QUEUE, payload)
+
+	def acks(self, response_key: str) -> list:
+		return [codec.decode_message(each) for each in self.redis.lists.get(response_key, [])]
+
+	def test_json_commands_are_decoded_and_acknowledged(self):
+		self.send({"request_type": "create_task_schedule", "request_content": "TS-1", "response_key": "rpc:1"})
+		self.send({"request_type": "cancel_task_schedule", "request_content": "TS-2"})
+		self.redis.lpush(coroutines.REDIS_COMMAND_QUEUE, b"not json")
+
+		commands = coroutines._pop_and_ack_commands(self.redis, batch_size=10)
+		self.assertEqual([each["request_content"] for each in commands], ["TS-1", "TS-2"])
+		self.assertEqual({each["content_type"] for each in commands}, {codec.JSON.content_type})
+		((ack, ack_codec),) = self.acks("rpc:1")
+		self.assertEqual((ack["status"], ack["request_type"], ack_codec), ("ok", "create_task_schedule", codec.JSON))
+		self.assertFalse(self.redis.lists[coroutines.REDIS_COMMAND_QUEUE])
+
+	@unittest.skipUnless(codec.msgpack_available(), "msgpack is not installed")
+	def test_msgpack_commands_are_acknowledged_in_msgpack(self):
+		self.send({"request_type": "ping", "request_content": None, "response_key": "rpc:1"}, codec.MSGPACK)
+		self.send({"request_type": "ping", "request_content": None, "response_key": "rpc:2", "content_type": "json"})
+
+		commands = coroutines._pop_and_ack_commands(self.redis, batch_size=10)
+		self.assertEqual([each["content_type"] for each in commands], [codec.MSGPACK.content_type, "application/json"])
+		self.assertEqual(self.acks("rpc:1")[0][1], codec.MSGPACK)
+		self.assertEqual(self.acks("rpc:2")[0][1], codec.JSON)
+
+	def test_falls_back_to_one_pop_without_rpop_count(self):
+		self.redis.rpop_count_supported = False
+		for each in ("TS-1", "TS-2"):
+			self.send({"request_type": "create_task_schedule", "request_content": each})
+		self.assertEqual(len(coroutines._pop_and_ack_commands(self.redis, batch_size=10)), 1)
+		self.assertEqual(len(coroutines._pop_and_ack_commands(self.redis, batch_size=10)), 1)
+		self.assertFalse(coroutines._rpop_count_supported)
+
+	def test_nothing_to_pop(self):
+		self.assertEqual(coroutines._pop_and_ack_commands(self.redis, batch_size=10), [])
+
+
+class TestRawConnection(unittest.TestCase):
+
+	def test_replies_are_not_decoded(self):
+		fake_config = mock.Mock(rq_host="127.0.0.1", rq_port=6379)
+		with (
+			mock.patch.object(btu_rq, "get_config"),
+			mock.patch.object(btu_rq, "get_config_data", lambda: fake_config),
+			mock.patch.dict(btu_rq._connection_pools, clear=True),
+		):
+			encoder = btu_rq.create_raw_connection().connection_pool.get_encoder()
+		payload = codec.MSGPACK_MAGIC + b"\x81\xa1a\x01"  # not UTF-8
+		self.assertEqual(encoder.decode(payload), payload)
+		self.assertEqual(encoder.encode("btu:scheduler:rpc:1"), b"btu:scheduler:rpc:1")
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,77 @@
+"""
+Unit tests for btu_py.lib.refresh_offload (calculating next execution times in a pool of workers).
+
+Run with:  python -m pytest btu_py/tests/test_refresh_offload.py -v
+"""
+
+import asyncio
+import concurrent.futures
+import unittest
+from datetime import datetime as DateTimeType
+from types import SimpleNamespace
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+from btu_py.lib import refresh_offload
+from btu_py.lib.btu_cron import tz_cron_to_utc_datetimes
+
+ANCHOR = 1742486400  # 2025-03-20 16:00:00 UTC
+
+
+def make_schedule(task_schedule_id: str, cron_string: str = "0 18 * * *", cron_timezone="America/New_York"):
+	return SimpleNamespace(id=task_schedule_id, cron_string=cron_string, cron_timezone=cron_timezone)
+
+
+class TestNextEpochs(unittest.TestCase):
+
+	def test_matches_inline_calculation(self):
+		jobs = [("0 18 * * *", "America/New_York", ANCHOR), ("*/15 * * * *", "UTC", ANCHOR)]
+		anchor = DateTimeType.fromtimestamp(ANCHOR, tz=ZoneInfo("UTC"))
+		expected = [int(tz_cron_to_utc_datetimes(cron, tz, anchor)[0].timestamp()) for cron, tz, _ in jobs]
+		self.assertEqual(list(refresh_offload.next_epochs(jobs)), expected)
+
+	def test_invalid_cron_is_reported_as_no_epoch(self):
+		self.assertEqual(list(refresh_offload.next_epochs([("not a cron", "UTC", ANCHOR)])), [refresh_offload.NO_EPOCH])
+
+
+class TestNextExecutionEpochs(unittest.TestCase):
+
+	def setUp(self):
+		self.settings = {"refresh_offload_workers": 2, "refresh_offload_threshold": 3}
+		fake_config = SimpleNamespace(
+			time_zone=ZoneInfo("America/Los_Angeles"), get=lambda key, default=None: self.settings.get(key, default)
+		)
+		executor = concurrent.futures.ThreadPoolExecutor(2)
+		self.addCleanup(executor.shutdown)
+		patches = [
+			mock.patch.object(refresh_offload.btu_py, "get_config_data", lambda: fake_config),
+			mock.patch.object(refresh_offload, "_executor", executor),
+			mock.patch.object(refresh_offload.time, "time", return_value=ANCHOR),
+		]
+		for each in patches:
+			each.start()
+			self.addCleanup(each.stop)
+
+	def test_small_batches_stay_inline(self):
+		schedules = [make_schedule("TS-1"), make_schedule("TS-2")]
+		self.assertEqual(asyncio.run(refresh_offload.next_execution_epochs(schedules)), {})
+
+	def test_disabled_without_workers(self):
+		self.settings["refresh_offload_workers"] = 0
+		schedules = [make_schedule(f"TS-{each}") for each in range(5)]
+		self.assertEqual(asyncio.run(refresh_offload.next_execution_epochs(schedules)), {})
+
+	def test_large_batches_are_offloaded(self):
+		schedules = [make_schedule(f"TS-{each}") for each in range(5)]
+		schedules.append(make_schedule("TS-default-zone", cron_timezone=None))
+		schedules.append(make_schedule("TS-invalid", cron_string="not a cron"))
+		results = asyncio.run(refresh_offload.next_execution_epochs(schedules))
+
+		anchor = DateTimeType.fromtimestamp(ANCHOR, tz=ZoneInfo("UTC"))
+		new_york = int(tz_cron_to_utc_datetimes("0 18 * * *", "America/New_York", anchor)[0].timestamp())
+		los_angeles = int(tz_cron_to_utc_datetimes("0 18 * * *", "America/Los_Angeles", anchor)[0].timestamp())
+		self.assertEqual({f"TS-{each}": new_york for each in range(5)} | {"TS-default-zone": los_angeles}, results)
+
+
+if __name__ == "__main__":
+	unittest.main()
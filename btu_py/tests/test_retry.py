@@ -0,0 +1,130 @@
+"""
+Unit tests for btu_py.lib.retry (retry backoff, dead-letter set, and circuit breaker).
+
+Run with:  python -m pytest btu_py/tests/test_retry.py -v
+"""
+
+import unittest
+
+from btu_py.lib.retry import (
+	RQ_KEY_DEAD_LETTER,
+	RQ_KEY_RETRY_ATTEMPTS,
+	RQ_KEY_RETRY_TASKS,
+	CircuitBreaker,
+	RetryPolicy,
+	schedule_retries,
+)
+from btu_py.lib.task_store import RQ_KEY_SCHEDULED_TASKS, SingleKeyStore
+
+SCHEDULED = RQ_KEY_SCHEDULED_TASKS
+
+
+class FakeRedis:
+	"""
+	Just enough of redis.Redis for schedule_retries(): sorted sets and hashes, with pipelines that run immediately.
+	"""
+
+	def __init__(self):
+		self.data = {}
+		self._results = []
+
+	def pipeline(self, transaction=True):
+		self._results = []
+		return self
+
+	def execute(self):
+		return self._results
+
+	def zadd(self, key, mapping):
+		self.data.setdefault(key, {}).update(mapping)
+		self._results.append(len(mapping))
+
+	def zrem(self, key, member):
+		self._results.append(1 if self.data.get(key, {}).pop(member, None) is not None else 0)
+
+	def hincrby(self, key, field, amount):
+		values = self.data.setdefault(key, {})
+		values[field] = values.get(field, 0) + amount
+		self._results.append(values[field])
+
+	def hdel(self, key, field):
+		self._results.append(1 if self.data.get(key, {}).pop(field, None) is not None else 0)
+
+
+class FakeClock:
+	def __init__(self):
+		self.now = 1000.0
+
+	def __call__(self):
+		return self.now
+
+
+class TestRetry(unittest.TestCase):
+
+	def test_backoff_doubles_up_to_maximum(self):
+		policy = RetryPolicy(max_attempts=10, base_delay_secs=30, max_delay_secs=200)
+		self.assertEqual([policy.delay_for(each) for each in range(1, 6)], [30, 60, 120, 200, 200])
+
+	def test_failed_instance_moves_to_retry_then_dead_letter(self):
+		redis_conn = FakeRedis()
+		tsik = "TS-000001|1742489940"
+		redis_conn.zadd(SCHEDULED, {tsik: 1742489940})
+		policy = RetryPolicy(max_attempts=3, base_delay_secs=10, max_delay_secs=100)
+
+		self.assertEqual(schedule_retries(redis_conn, [tsik], SingleKeyStore(), policy, 5000), {tsik: ("retry", 5010)})
+		self.assertNotIn(tsik, redis_conn.data[SCHEDULED])
+		self.assertEqual(redis_conn.data[RQ_KEY_RETRY_TASKS][tsik], 5010)
+
+		self.assertEqual(schedule_retries(redis_conn, [tsik], SingleKeyStore(), policy, 6000), {tsik: ("retry", 6020)})
+		self.assertEqual(schedule_retries(redis_conn, [tsik], SingleKeyStore(), policy, 7000), {tsik: ("dead", 3)})
+		self.assertNotIn(tsik, redis_conn.data[RQ_KEY_RETRY_TASKS])
+		self.assertNotIn(tsik, redis_conn.data[RQ_KEY_RETRY_ATTEMPTS])
+		self.assertEqual(redis_conn.data[RQ_KEY_DEAD_LETTER][tsik], 7000)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+	def setUp(self):
+		self.clock = FakeClock()
+		self.breaker = CircuitBreaker("test", failure_threshold=3, reset_secs=60, clock=self.clock)
+
+	def test_opens_after_consecutive_failures(self):
+		self.breaker.record_failure()
+		self.breaker.record_failure()
+		self.breaker.record_success()  # resets the count
+		self.breaker.record_failure()
+		self.breaker.record_failure()
+		self.assertTrue(self.breaker.allow())
+		self.breaker.record_failure()
+		self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+		self.assertFalse(self.breaker.allow())
+
+	def test_half_open_allows_one_trial(self):
+		for _ in range(3):
+			self.breaker.record_failure()
+		self.clock.now += 60
+		self.assertTrue(self.breaker.allow())
+		self.assertFalse(self.breaker.allow())  # only one trial at a time
+		self.breaker.record_failure()
+		self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+		self.clock.now += 60
+		self.assertTrue(self.breaker.allow())
+		self.breaker.record_success()
+		self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+		self.assertTrue(self.breaker.allow())
+
+	def test_trial_without_an_outcome_is_allowed_again(self):
+		for _ in range(3):
+			self.breaker.record_failure()
+		self.clock.now += 60
+		self.assertTrue(self.breaker.allow())  # a trial that never records its outcome
+		self.clock.now += 59
+		self.assertFalse(self.breaker.allow())
+		self.clock.now += 1
+		self.assertTrue(self.breaker.allow())
+		self.assertEqual(self.breaker.state, CircuitBreaker.HALF_OPEN)
+
+
+if __name__ == "__main__":
+	unittest.main()
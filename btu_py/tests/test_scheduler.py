@@ -0,0 +1,222 @@
+"""
+Unit tests for btu_py.lib.scheduler (dispatching due Task Schedule instances).
+
+Run with:  python -m pytest btu_py/tests/test_scheduler.py -v
+"""
+
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from btu_py.lib import scheduler
+from btu_py.lib.dispatch_pacing import DispatchPacer
+from btu_py.lib.frappe_client import FrappeClient
+from btu_py.lib.lateness import LatenessTracker
+from btu_py.lib.retry import RQ_KEY_RETRY_TASKS, CircuitBreaker
+from btu_py.lib.scheduler import RQScheduledTask
+from btu_py.lib.task_store import RQ_KEY_SCHEDULED_TASKS, SingleKeyStore
+from btu_py.tests.test_task_store import FakeRedis as FakeSortedSetRedis
+
+DUE = 1_742_486_400  # 2025-03-20 16:00:00 UTC
+
+
+class FakeRedis(FakeSortedSetRedis):
+	"""
+	Sorted sets and hashes, with pipelines that run each command immediately.
+	"""
+
+	def hincrby(self, key, field, amount):
+		values = self.data.setdefault(key, {})
+		values[field] = values.get(field, 0) + amount
+		return values[field]
+
+	def hdel(self, key, *fields):
+		return sum(1 for each in fields if self.data.get(key, {}).pop(each, None) is not None)
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		return False
+
+
+class FakeQueue:
+	def __init__(self):
+		self.items = []
+
+	async def put(self, item, lane=None):
+		self.items.append(item)
+
+
+def make_schedule(task_schedule_id: str):
+	return SimpleNamespace(id=task_schedule_id, enabled=True)
+
+
+class DispatchTestCase(unittest.TestCase):
+	"""
+	Runs the scheduler against a fake Redis and fake SQL; 'self.settings' are the configuration.
+	"""
+
+	def setUp(self):
+		self.settings = {"frappe_enqueue_batch_size": 100, "scheduler_polling_interval": 60}
+		self.redis = FakeRedis()
+		self.queue = FakeQueue()
+		self.breaker = CircuitBreaker("test", failure_threshold=2, reset_secs=60)
+		fake_config = SimpleNamespace(
+			scheduler_polling_interval=60, get=lambda key, default=None: self.settings.get(key, default)
+		)
+
+		async def fake_read(keys):
+			return {each_key: make_schedule(each_key) for each_key in keys}
+
+		patches = [
+			mock.patch("btu_py.get_config_data", lambda: fake_config),
+			mock.patch.object(scheduler, "create_connection", lambda: self.redis),
+			mock.patch.object(scheduler, "get_scheduled_task_store", SingleKeyStore),
+			mock.patch.object(scheduler, "get_frappe_circuit_breaker", lambda: self.breaker),
+			mock.patch.object(scheduler, "get_lateness_tracker"),
+			mock.patch.object(scheduler.BtuTaskSchedule, "init_from_schedule_keys", staticmethod(fake_read)),
+		]
+		for each in patches:
+			each.start()
+			self.addCleanup(each.stop)
+
+	def schedule(self, *tsiks: tuple[str, int]) -> list[RQScheduledTask]:
+		self.redis.zadd(RQ_KEY_SCHEDULED_TASKS, {f"{each_id}|{unix_time}": unix_time for each_id, unix_time in tsiks})
+		return [RQScheduledTask.from_tuple(each_id, unix_time) for each_id, unix_time in tsiks]
+
+
+class TestUnreachableFrappe(DispatchTestCase):
+
+	def test_connection_failures_open_the_circuit_breaker(self):
+		client = FrappeClient("http://127.0.0.1:1", {}, timeout=2)  # nothing listens on port 1
+		with mock.patch.object(scheduler, "get_frappe_client", lambda: client):
+			for attempt in range(2):
+				due = self.schedule((f"TS-{attempt}", DUE))
+				asyncio.run(scheduler.run_immediate_scheduled_tasks(due, self.queue))
+
+		self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+		self.assertEqual(set(self.redis.data[RQ_KEY_RETRY_TASKS]), {f"TS-0|{DUE}", f"TS-1|{DUE}"})
+		self.assertNotIn(RQ_KEY_SCHEDULED_TASKS, self.redis.data)
+
+	def test_errors_returned_by_frappe_do_not_count(self):
+		client = mock.Mock()
+		client.enqueue_many.return_value = {"TS-1": {"status": "error", "error": "ValidationError"}}
+		with mock.patch.object(scheduler, "get_frappe_client", lambda: client):
+			for _ in range(2):
+				asyncio.run(scheduler.run_immediate_scheduled_tasks(self.schedule(("TS-1", DUE)), self.queue))
+		self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+
+class TestHalfOpenTrial(DispatchTestCase):
+	"""
+	A half-open breaker's single trial is only spent on a batch that is actually sent to Frappe.
+	"""
+
+	def setUp(self):
+		super().setUp()
+		self.now = 1000.0
+		self.breaker = CircuitBreaker("test", failure_threshold=1, reset_secs=60, clock=lambda: self.now)
+		self.breaker.record_failure()
+		self.now += 60  # the next allow() starts the trial
+		self.client = mock.Mock()
+		self.client.enqueue_many.return_value = {"TS-1": {"status": "ok"}}
+		patcher = mock.patch.object(scheduler, "get_frappe_client", lambda: self.client)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def assert_trial_is_still_available(self):
+		self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)  # the early exit did not spend the trial
+		self.client.enqueue_many.assert_not_called()
+		asyncio.run(scheduler.run_immediate_scheduled_tasks(self.schedule(("TS-1", DUE)), self.queue))
+		self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+	def test_disabled_schedule(self):
+		async def read_disabled(keys):
+			return {each_key: SimpleNamespace(id=each_key, enabled=False) for each_key in keys}
+
+		with mock.patch.object(scheduler.BtuTaskSchedule, "init_from_schedule_keys", staticmethod(read_disabled)):
+			asyncio.run(scheduler.run_immediate_scheduled_tasks(self.schedule(("TS-1", DUE)), self.queue))
+		self.assert_trial_is_still_available()
+
+	def test_missing_schedule_and_sql_error(self):
+		async def read_nothing(keys):
+			return {}
+
+		async def read_fails(keys):
+			raise OSError("SQL server has gone away")
+
+		for each_read in (read_nothing, read_fails):
+			with mock.patch.object(scheduler.BtuTaskSchedule, "init_from_schedule_keys", staticmethod(each_read)):
+				asyncio.run(scheduler.run_immediate_scheduled_tasks(self.schedule(("TS-1", DUE)), self.queue))
+		self.assert_trial_is_still_available()
+
+	def test_no_redis_connection(self):
+		with mock.patch.object(scheduler, "create_connection", lambda: None):
+			asyncio.run(scheduler.run_immediate_scheduled_tasks(self.schedule(("TS-1", DUE)), self.queue))
+		self.assert_trial_is_still_available()
+
+
+class TestPacedBatches(DispatchTestCase):
+
+	def test_instances_holding_tokens_are_not_held_for_a_full_batch(self):
+		now = int(time.time())
+		self.schedule(*((f"TS-{each}", now - 1) for each in range(5)))
+		pacer = DispatchPacer(rate_limit_per_sec=20, burst=2, max_lateness_secs=60)
+		dispatched = []
+
+		async def record(batch, internal_queue):
+			dispatched.append([each.task_schedule_id for each in batch])
+
+		with (
+			mock.patch.object(scheduler, "get_dispatch_pacer", lambda: pacer),
+			mock.patch.object(scheduler, "run_immediate_scheduled_tasks", record),
+		):
+			asyncio.run(scheduler.check_and_run_eligible_task_schedules(self.queue))
+
+		# The burst goes out at once; after that, each instance as soon as it has its token.
+		self.assertEqual([len(each) for each in dispatched], [2, 1, 1, 1])
+		self.assertEqual(sorted(each_id for each in dispatched for each_id in each), [f"TS-{each}" for each in range(5)])
+
+
+class TestFireAll(DispatchTestCase):
+
+	def test_every_overdue_instance_is_enqueued(self):
+		self.settings["misfire_policy"] = "fire_all"
+		due = self.schedule(("TS-1", DUE - 120), ("TS-1", DUE - 60), ("TS-1", DUE), ("TS-2", DUE))
+		client = mock.Mock()
+		client.enqueue_many.side_effect = lambda keys: {each_key: {"status": "ok"} for each_key in keys}
+		with mock.patch.object(scheduler, "get_frappe_client", lambda: client):
+			asyncio.run(scheduler.run_immediate_scheduled_tasks(due, self.queue))
+
+		calls = [each.args[0] for each in client.enqueue_many.call_args_list]
+		self.assertEqual(calls, [["TS-1", "TS-2"], ["TS-1"], ["TS-1"]])
+		self.assertNotIn(RQ_KEY_SCHEDULED_TASKS, self.redis.data)  # all four instances were dispatched
+
+	def test_other_policies_share_one_enqueue(self):
+		due = self.schedule(("TS-1", DUE - 60), ("TS-1", DUE))
+		client = mock.Mock()
+		client.enqueue_many.return_value = {"TS-1": {"status": "ok"}}
+		with mock.patch.object(scheduler, "get_frappe_client", lambda: client):
+			asyncio.run(scheduler.run_immediate_scheduled_tasks(due, self.queue))
+		client.enqueue_many.assert_called_once_with(["TS-1"])
+
+
+class TestCancel(DispatchTestCase):
+
+	def test_cancelled_schedules_are_forgotten(self):
+		tracker = LatenessTracker()
+		scheduler.get_lateness_tracker.return_value = tracker
+		self.schedule(("TS-1", DUE), ("TS-1", DUE + 60), ("TS-2", DUE))
+		for each_id in ("TS-1", "TS-2", "TS-3"):
+			tracker.record(each_id, "lateness", 1.5, now=DUE)
+
+		self.assertEqual(scheduler.rq_cancel_scheduled_tasks(["TS-1", "TS-3"]), {"TS-1": 2, "TS-3": 0})
+		self.assertEqual([each["task_schedule_id"] for each in tracker.worst_offenders(now=DUE)], ["TS-2"])
+		self.assertEqual(list(self.redis.data[RQ_KEY_SCHEDULED_TASKS]), [f"TS-2|{DUE}"])
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,152 @@
+"""
+Unit tests for btu_py.lib.sites (multi-site mode).
+
+Run with:  python -m pytest btu_py/tests/test_sites.py -v
+"""
+
+import asyncio
+import contextlib
+import json
+import pathlib
+import tempfile
+import unittest
+from unittest import mock
+
+import toml
+
+from btu_py.daemon import control_protocol, coroutines
+from btu_py.daemon.command_pool import CommandWorkerPool
+from btu_py.lib import sites
+from btu_py.lib.config import AppConfig
+from btu_py.tests.test_config import SETTINGS
+
+SITES = {
+	"erp": {"sql_database": "erp_db", "webserver_host_header": "erp.example.com"},
+	"shop": {"sql_database": "shop_db", "redis_key_namespace": "store", "site_dispatch_concurrency": 2},
+}
+
+
+class TestSites(unittest.TestCase):
+
+	def setUp(self):
+		directory = tempfile.TemporaryDirectory()
+		self.addCleanup(directory.cleanup)
+		self.path = pathlib.Path(directory.name) / "btu_scheduler.toml"
+		self.path.write_text(toml.dumps({**SETTINGS, "sites": SITES}), encoding="utf-8")
+		patcher = mock.patch.object(AppConfig, "_AppConfig__config_file_path", self.path)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		self.config = AppConfig()
+		self.config._AppConfig__logger = mock.Mock()
+		self.addCleanup(sites._site_contexts.clear)
+
+	def test_site_settings_overlay_the_top_level(self):
+		self.assertEqual(self.config.site_names(), ["erp", "shop"])
+		erp = self.config.for_site("erp").data
+		self.assertEqual((erp.site_name, erp.sql_database, erp.redis_key_namespace), ("erp", "erp_db", "erp"))
+		self.assertEqual(erp.rq_port, SETTINGS["rq_port"])
+		self.assertEqual(self.config.for_site("shop").data.redis_key_namespace, "store")
+		with self.assertRaises(KeyError):
+			self.config.for_site("missing")
+
+	def test_reload_keeps_the_site(self):
+		shop = self.config.for_site("shop")
+		self.path.write_text(
+			toml.dumps({**SETTINGS, "sites": {**SITES, "shop": {**SITES["shop"], "sql_database": "shop_v2"}}}),
+			encoding="utf-8",
+		)
+		self.assertEqual(shop.reload(), ["sql_database"])
+		self.assertEqual((shop.data.site_name, shop.data.sql_database), ("shop", "shop_v2"))
+
+	def test_each_context_sees_its_own_site(self):
+		contexts = sites.create_site_contexts(self.config)
+		self.assertEqual(list(contexts), ["erp", "shop"])
+		self.assertEqual(contexts["erp"].run(sites.site_key, "btu_scheduler:retry"), "erp:btu_scheduler:retry")
+		self.assertEqual(contexts["shop"].run(sites.site_key, "btu_scheduler:retry"), "store:btu_scheduler:retry")
+		self.assertIs(sites.get_site_context("shop"), contexts["shop"])
+
+		registry = {}
+		erp_object = contexts["erp"].run(sites.per_site, registry, object)
+		shop_object = contexts["shop"].run(sites.per_site, registry, object)
+		self.assertIsNot(erp_object, shop_object)
+		self.assertIs(contexts["erp"].run(sites.per_site, registry, object), erp_object)
+
+	def test_single_site_mode_is_unchanged(self):
+		self.path.write_text(toml.dumps(SETTINGS), encoding="utf-8")
+		config = AppConfig()
+		contexts = sites.create_site_contexts(config)
+		self.assertEqual(list(contexts), ["default"])
+		self.assertIsNone(contexts["default"].run(sites.current_site_name))
+		self.assertEqual(contexts["default"].run(sites.site_key, "btu_scheduler:retry"), "btu_scheduler:retry")
+		self.assertIsInstance(contexts["default"].run(sites.dispatch_turn), contextlib.nullcontext)
+
+	def test_sites_take_turns_to_dispatch(self):
+		contexts = sites.create_site_contexts(self.config)
+		self.addCleanup(setattr, sites, "_dispatch_turns", None)
+		sites._dispatch_turns = None
+		order = []
+
+		async def dispatch(name):
+			async with sites.dispatch_turn():
+				order.append(f"{name} start")
+				await asyncio.sleep(0.01)
+				order.append(f"{name} end")
+
+		async def main():
+			await asyncio.gather(
+				asyncio.create_task(dispatch("erp"), context=contexts["erp"]),
+				asyncio.create_task(dispatch("shop"), context=contexts["shop"]),
+			)
+
+		asyncio.run(main())
+		self.assertEqual(order, ["erp start", "erp end", "shop start", "shop end"])
+
+	def test_control_request_for_an_unknown_site(self):
+		contexts = sites.create_site_contexts(self.config)
+		request = {"request_type": "ping", "request_content": None, "site": "nowhere"}
+		response = contexts["erp"].run(asyncio.run, control_protocol.process_control_request(request))
+		self.assertEqual(response, {"status": "error", "error": "Unknown site 'nowhere'."})
+		request["site"] = "shop"
+		response = contexts["erp"].run(asyncio.run, control_protocol.process_control_request(request))
+		self.assertEqual(response["data"], "pong")
+
+	def test_redis_command_for_another_site(self):
+		contexts = sites.create_site_contexts(self.config)
+		self.addCleanup(control_protocol._tcp_internal_queues.clear)
+		queues = {}
+		for each_name, each_context in contexts.items():
+			queues[each_name] = mock.AsyncMock()
+			each_context.run(control_protocol.set_tcp_internal_queue, queues[each_name])
+
+		async def listener():
+			# Runs in the first site's context, as the daemon's Redis RPC listener does.
+			pool = CommandWorkerPool(coroutines._dispatch_redis_command, worker_count=2)
+			worker = asyncio.create_task(pool.run())
+			for each_site in ("shop", None, "nowhere"):
+				command = {"request_type": "create_task_schedule", "request_content": "TS-1", "site": each_site}
+				await coroutines._submit_redis_command(pool, command)
+			done = asyncio.get_running_loop().create_future()
+			await pool.submit_exclusive("ping", None, on_done=done.set_result)  # runs after the commands above
+			await done
+			worker.cancel()
+
+		with mock.patch.object(coroutines, "get_logger"):
+			contexts["erp"].run(asyncio.run, listener())
+		queues["shop"].put.assert_awaited_once_with("TS-1", lane=coroutines.LANE_INTERACTIVE)
+		queues["erp"].put.assert_awaited_once_with("TS-1", lane=coroutines.LANE_INTERACTIVE)
+
+	def test_redis_command_for_an_unknown_site_is_refused_on_receipt(self):
+		sites.create_site_contexts(self.config)
+		redis_conn = mock.MagicMock()
+		commands = [
+			{"request_type": "ping", "response_key": "rpc:1", "site": "nowhere"},
+			{"request_type": "ping", "response_key": "rpc:2", "site": "shop"},
+		]
+		coroutines._ack_redis_commands(redis_conn, commands)
+		pushed = {each.args[0]: json.loads(each.args[1]) for each in redis_conn.pipeline.return_value.lpush.call_args_list}
+		self.assertEqual(pushed["rpc:1"]["error"], "Unknown site 'nowhere'.")
+		self.assertEqual(pushed["rpc:2"]["status"], "ok")
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,141 @@
+"""
+Unit tests for btu_py.daemon.snapshot (warm restarts).
+
+Run with:  python -m pytest btu_py/tests/test_snapshot.py -v
+"""
+
+import asyncio
+import pathlib
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from btu_py.daemon import coroutines, snapshot
+from btu_py.lib.internal_queue import LANE_INTERACTIVE, LANE_REFILL, CoalescingQueue
+from btu_py.lib.structs import BtuTaskSchedule
+
+
+def make_schedule(schedule_id: str, cron_string: str = "0 * * * *") -> BtuTaskSchedule:
+	return BtuTaskSchedule(
+		id=schedule_id,
+		task_key="TASK-0001",
+		task_description="Ping",
+		enabled=True,
+		queue_name="erpnext-mybench:short",
+		argument_overrides=None,
+		schedule_description="Hourly",
+		cron_string=cron_string,
+		cron_timezone="UTC",
+	)
+
+
+def sql_row(schedule_id: str, cron_string: str = "0 * * * *") -> dict:
+	return {
+		"name": schedule_id,
+		"task": "TASK-0001",
+		"queue_name": "erpnext-mybench:short",
+		"cron_string": cron_string,
+		"cron_timezone": "UTC",
+	}
+
+
+class FakeRedis:
+	def __init__(self):
+		self.sorted_set = {}
+
+	def zadd(self, key, mapping, nx=False):
+		for member, score in mapping.items():
+			if not (nx and member in self.sorted_set):
+				self.sorted_set[member] = score
+
+
+class TestScheduleCatalog(unittest.TestCase):
+
+	def test_compare_with_sql(self):
+		catalog = snapshot.ScheduleCatalog()
+		catalog.record(make_schedule("TS-1"))
+		catalog.record(make_schedule("TS-2"))
+		catalog.record(make_schedule("TS-3"))
+		changed, removed = catalog.compare([sql_row("TS-1"), sql_row("TS-2", "*/5 * * * *"), sql_row("TS-4")])
+		self.assertEqual(changed, ["TS-2", "TS-4"])
+		self.assertEqual(removed, ["TS-3"])
+
+
+class TestSnapshotRoundTrip(unittest.TestCase):
+
+	def setUp(self):
+		directory = tempfile.TemporaryDirectory()
+		self.addCleanup(directory.cleanup)
+		self.path = pathlib.Path(directory.name) / "snapshot.json.gz"
+		self.redis = FakeRedis()
+		patches = [
+			mock.patch.object(snapshot, "_snapshot_settings", lambda: ("file", str(self.path))),
+			mock.patch.dict(snapshot._catalogs, clear=True),
+			mock.patch("btu_py.lib.btu_rq.create_connection", lambda **kwargs: self.redis),
+		]
+		for each in patches:
+			each.start()
+			self.addCleanup(each.stop)
+
+	def test_restore_queue_catalog_and_scheduled_tasks(self):
+		async def scenario():
+			queue = CoalescingQueue()
+			queue.put_nowait("TS-1", lane=LANE_INTERACTIVE)
+			queue.put_nowait("TS-2", lane=LANE_REFILL)
+			catalog = snapshot.ScheduleCatalog()
+			catalog.record(make_schedule("TS-3"))
+			snapshot.write_snapshot(snapshot.build_snapshot(queue, catalog, {"TS-3|1742490000": 1742490000}))
+
+			self.redis.sorted_set["TS-3|1742490000"] = 1  # already in Redis: left alone
+			restored_queue = CoalescingQueue()
+			snapshot.restore_snapshot(snapshot.read_snapshot(max_age_secs=60), restored_queue)
+			return restored_queue
+
+		restored_queue = asyncio.run(scenario())
+		self.assertEqual(restored_queue.items_by_lane()[LANE_INTERACTIVE], ["TS-1"])
+		self.assertEqual(restored_queue.items_by_lane()[LANE_REFILL], ["TS-2"])
+		self.assertEqual(self.redis.sorted_set, {"TS-3|1742490000": 1})
+		self.assertEqual(list(snapshot.get_schedule_catalog().entries), ["TS-3"])
+
+	def test_old_or_corrupt_snapshot_is_ignored(self):
+		snapshot.write_snapshot(snapshot.build_snapshot(CoalescingQueue(), snapshot.ScheduleCatalog(), {}))
+		with mock.patch.object(snapshot.time, "time", return_value=snapshot.time.time() + 120):
+			self.assertIsNone(snapshot.read_snapshot(max_age_secs=60))
+		self.path.write_bytes(b"not gzip")
+		self.assertIsNone(snapshot.read_snapshot(max_age_secs=60))
+
+
+class TestShutdownMidBatch(unittest.IsolatedAsyncioTestCase):
+
+	async def test_cancelled_batch_is_in_the_snapshot(self):
+		reading = asyncio.Event()
+
+		async def read_forever(schedule_keys):
+			reading.set()
+			await asyncio.Event().wait()  # e.g. a slow SQL query, when the daemon is asked to stop
+
+		fake_config = SimpleNamespace(get=lambda key, default=None: {"internal_queue_batch_size": 2}.get(key, default))
+		queue = CoalescingQueue()
+		queue.put_nowait("TS-1", lane=LANE_INTERACTIVE)
+		queue.put_nowait("TS-2", lane=LANE_REFILL)
+		queue.put_nowait("TS-3", lane=LANE_REFILL)
+		with (
+			mock.patch("btu_py.get_config_data", lambda: fake_config),
+			mock.patch.object(coroutines, "get_logger"),
+			mock.patch.object(BtuTaskSchedule, "init_from_schedule_keys", read_forever),
+		):
+			consumer = asyncio.create_task(coroutines.internal_queue_consumer(queue))
+			await asyncio.wait_for(reading.wait(), 1)
+			self.assertEqual(queue.items_by_lane()[LANE_REFILL], ["TS-3"])  # TS-1 and TS-2 are in the batch
+			consumer.cancel()
+			with self.assertRaises(asyncio.CancelledError):
+				await consumer
+
+		saved = snapshot.build_snapshot(queue, snapshot.ScheduleCatalog(), {})["internal_queue"]
+		self.assertEqual(saved[LANE_INTERACTIVE], ["TS-1"])
+		self.assertEqual(saved[LANE_REFILL], ["TS-2", "TS-3"])
+
+
+if __name__ == "__main__":
+	unittest.main()
@@ -0,0 +1,129 @@
+"""
+Unit tests for btu_py.lib.task_store (single-key and time-bucketed layouts of the scheduled TSIKs).
+
+Run with:  python -m pytest btu_py/tests/test_task_store.py -v
+"""
+
+import unittest
+
+from btu_py.lib.task_store import RQ_KEY_SCHEDULED_TASKS, BucketedStore, SingleKeyStore, migrate_layout
+
+HOUR = 1_742_486_400  # 2025-03-20 16:00:00 UTC
+
+
+class FakePipeline:
+	def __init__(self, redis_conn):
+		self._redis = redis_conn
+		self._results = []
+
+	def __getattr__(self, name):
+		def command(*args, **kwargs):
+			self._results.append(getattr(self._redis, name)(*args, **kwargs))
+
+		return command
+
+	def execute(self):
+		results, self._results = self._results, []
+		return results
+
+
+class FakeRedis:
+	"""
+	Just enough of redis.Redis for the stores: sorted sets, with pipelines that run each command immediately.
+	"""
+
+	def __init__(self):
+		self.data = {}
+
+	def pipeline(self, transaction=True):
+		return FakePipeline(self)
+
+	def zadd(self, key, mapping, nx=False):
+		sorted_set = self.data.setdefault(key, {})
+		added = 0
+		for member, score in mapping.items():
+			if member not in sorted_set:
+				added += 1
+			if not (nx and member in sorted_set):
+				sorted_set[member] = score
+		return added
+
+	def zrem(self, key, *members):
+		sorted_set = self.data.get(key, {})
+		removed = sum(1 for each in members if sorted_set.pop(each, None) is not None)
+		if key in self.data and not sorted_set:
+			del self.data[key]  # like Redis, an empty sorted set no longer exists
+		return removed
+
+	def zrangebyscore(self, key, low, high):
+		high = float(high)
+		members = sorted(self.data.get(key, {}).items(), key=lambda item: item[1])
+		return [member for member, score in members if low <= score <= high]
+
+	def zscan_iter(self, key, count=None):
+		return iter(list(self.data.get(key, {}).items()))
+
+	def zcard(self, key):
+		return len(self.data.get(key, {}))
+
+	def exists(self, key):
+		return int(key in self.data)
+
+	def delete(self, *keys):
+		return sum(1 for each in keys if self.data.pop(each, None) is not None)
+
+
+def tsik(task_schedule_id: str, unix_time: int) -> str:
+	return f"{task_schedule_id}|{unix_time}"
+
+
+class TestBucketedStore(unittest.TestCase):
+
+	def setUp(self):
+		self.redis = FakeRedis()
+		self.store = BucketedStore("hourly")
+		self.members = {tsik("TS-1", HOUR + 60): HOUR + 60, tsik("TS-2", HOUR + 3660): HOUR + 3660}
+
+	def test_tsiks_are_sharded_by_hour(self):
+		self.assertEqual(self.store.add(self.redis, self.members), 2)
+		first_bucket = self.redis.data[f"{RQ_KEY_SCHEDULED_TASKS}:hourly:{HOUR}"]
+		self.assertEqual(first_bucket, {tsik("TS-1", HOUR + 60): HOUR + 60})
+		self.assertEqual(list(self.redis.data[self.store.index_key]), [str(HOUR), str(HOUR + 3600)])
+		self.assertEqual(self.store.count(self.redis), 2)
+		self.assertEqual(dict(self.store.scan(self.redis)), self.members)
+
+	def test_due_reads_only_started_buckets(self):
+		self.store.add(self.redis, self.members)
+		self.assertEqual(self.store.due(self.redis, HOUR + 120), [tsik("TS-1", HOUR + 60)])
+		self.assertEqual(self.store.due(self.redis, HOUR + 30), [])
+
+	def test_empty_past_buckets_are_pruned(self):
+		self.store.add(self.redis, self.members)
+		self.store.remove(self.redis, tsik("TS-1", HOUR + 60))
+		self.assertEqual(self.store.prune(self.redis, HOUR + 3600), 1)
+		self.assertEqual(list(self.redis.data[self.store.index_key]), [str(HOUR + 3600)])
+		self.assertEqual(self.store.prune(self.redis, HOUR + 3600), 0)
+
+	def test_clear(self):
+		self.store.add(self.redis, self.members)
+		self.store.clear(self.redis)
+		self.assertEqual(self.redis.data, {})
+
+
+class TestMigrateLayout(unittest.TestCase):
+
+	def test_single_key_to_daily_and_back(self):
+		redis_conn = FakeRedis()
+		members = {tsik(f"TS-{each}", HOUR + each * 7200): HOUR + each * 7200 for each in range(30)}
+		SingleKeyStore().add(redis_conn, members)
+
+		self.assertEqual(migrate_layout(redis_conn, "daily", chunk_size=7), {"single": 30, "hourly": 0})
+		self.assertNotIn(RQ_KEY_SCHEDULED_TASKS, redis_conn.data)
+		self.assertEqual(dict(BucketedStore("daily").scan(redis_conn)), members)
+
+		self.assertEqual(migrate_layout(redis_conn, "single"), {"hourly": 0, "daily": 30})
+		self.assertEqual(redis_conn.data, {RQ_KEY_SCHEDULED_TASKS: members})
+
+
+if __name__ == "__main__":
+	unittest.main()